@@ -0,0 +1,549 @@
+from Board_and_moves import BoardRep, CAPTURE, CASTLE, EN_PASSANT, DOUBLE_PUSH, SNAPSHOT_SIZE, move_to_uci
+
+# Square and piece conventions are shared with the mailbox BoardRep:
+#   a1 = 0, b1 = 1, ..., h8 = 63 and pieces indexed by their position in 'PNBRQKpnbrqk'
+NUM_TO_SQUARE = BoardRep.NUM_TO_SQUARE
+SQUARE_TO_NUM = BoardRep.SQUARE_TO_NUM
+PIECES = BoardRep.PIECES
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+
+# Moves use the packed int encoding of Board_and_moves (from, to, promotion and flag bits; the moving and captured
+# piece bits are left empty, since the bitboards are searched for those when the move is made).
+
+# Castling rights as bit mask: 1 = white short, 2 = white long, 4 = black short, 8 = black long.
+# A move from or to a square keeps only the rights in CASTLE_KEEP for that square.
+CASTLE_KEEP = [15] * 64
+CASTLE_KEEP[0] = 15 & ~2
+CASTLE_KEEP[4] = 15 & ~3
+CASTLE_KEEP[7] = 15 & ~1
+CASTLE_KEEP[56] = 15 & ~8
+CASTLE_KEEP[60] = 15 & ~12
+CASTLE_KEEP[63] = 15 & ~4
+
+
+def _leaper_table(deltas):
+    table = []
+    for sq in range(64):
+        r, f = divmod(sq, 8)
+        bb = 0
+        for dr, df in deltas:
+            if 0 <= r + dr < 8 and 0 <= f + df < 8:
+                bb |= 1 << ((r + dr) * 8 + f + df)
+        table.append(bb)
+    return table
+
+
+def _ray_table(dr, df):
+    table = []
+    for sq in range(64):
+        r, f = divmod(sq, 8)
+        bb = 0
+        r, f = r + dr, f + df
+        while 0 <= r < 8 and 0 <= f < 8:
+            bb |= 1 << (r * 8 + f)
+            r, f = r + dr, f + df
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _leaper_table([(1, -1), (1, 0), (1, 1), (0, -1), (0, 1), (-1, -1), (-1, 0), (-1, 1)])
+PAWN_ATTACKS = [_leaper_table([(1, -1), (1, 1)]), _leaper_table([(-1, -1), (-1, 1)])]  # [white, black]
+
+# Directions 0-3 increase the square number, 4-7 decrease it. The nearest blocker on a ray is then the
+# lowest set bit for 0-3 and the highest set bit for 4-7.
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1), (-1, 0), (0, -1), (-1, -1), (-1, 1)]
+RAYS = [_ray_table(dr, df) for dr, df in DIRECTIONS]
+ROOK_DIRECTIONS = (0, 1, 4, 5)
+BISHOP_DIRECTIONS = (2, 3, 6, 7)
+
+
+def slider_attacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if d < 4:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[d][first]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return slider_attacks(sq, occupied, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(sq, occupied):
+    return slider_attacks(sq, occupied, BISHOP_DIRECTIONS)
+
+
+class BitboardRep:
+    # Castling squares that have to be empty, and squares the king passes over (which may not be attacked)
+    CASTLE_PATHS = [
+        (1, 4, 6, 0x60, 5),  # (right, from, to, empty mask, passed square) white short
+        (2, 4, 2, 0x0E, 3),  # white long
+        (4, 60, 62, 0x60 << 56, 61),  # black short
+        (8, 60, 58, 0x0E << 56, 59),  # black long
+    ]
+
+    def __init__(self):
+        """ Bitboard alternative to the square_list/piece_list representation of BoardRep.
+
+        Parameters:
+        bitboards -- List of twelve 64-bit ints, one per piece in 'PNBRQKpnbrqk'
+        occupancy -- [white pieces, black pieces] as 64-bit ints
+        occupied -- All occupied squares
+        side_to_move -- (False = white, True = black)
+        castling -- Castling rights as mask (1 = white short, 2 = white long, 4 = black short, 8 = black long)
+        en_passant_square -- Target square for en passant capture ((0-63) or None)
+        half_move_count -- Counts half moves since last capture or pawn push
+        full_move_count -- Counts full moves after black moves
+        pseudolegal_moves -- Packed int moves for the side to move
+        move_sequence -- Packed int moves played with do_move
+        undo_sequence -- Irreversible state per made move (captured piece, castling, en passant, half moves)
+
+        """
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.side_to_move = False
+        self.castling = 15
+        self.en_passant_square = None
+        self.half_move_count = 0
+        self.full_move_count = 1
+
+        self.pseudolegal_moves = []
+        self.move_sequence = []
+        self.undo_sequence = []
+
+    @classmethod
+    def read_fen(cls, fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"):
+        board = cls()
+        lines = fen.split()
+        ranks = lines[0].split("/")
+        r = 7
+        for rank in ranks:
+            f = 0
+            for piece in rank:
+                if piece in PIECES:
+                    bit = 1 << (r * 8 + f)
+                    board.bitboards[PIECES.index(piece)] |= bit
+                    board.occupancy[piece.islower()] |= bit
+                    f += 1
+                else:
+                    f += int(piece)
+            r -= 1
+        board.occupied = board.occupancy[0] | board.occupancy[1]
+
+        board.side_to_move = (lines[1] == 'b')
+
+        board.castling = 0
+        for i, opt in enumerate('KQkq'):
+            if opt in lines[2]:
+                board.castling |= 1 << i
+
+        board.en_passant_square = SQUARE_TO_NUM[lines[3]]
+        try:
+            board.half_move_count = int(lines[4])
+            board.full_move_count = int(lines[5])
+        except IndexError:
+            board.half_move_count = 0
+            board.full_move_count = 1
+
+        board.pseudolegal_moves = board.generate_pseudolegal_moves()
+        return board
+
+    def snapshot(self):
+        # Same bytes as BoardRep.snapshot, so snapshots can be passed between the backends
+        squares = bytearray(SNAPSHOT_SIZE)
+        for code, bb in enumerate(self.bitboards, 1):
+            while bb:
+                low = bb & -bb
+                squares[low.bit_length() - 1] = code
+                bb ^= low
+        squares[64] = self.side_to_move
+        squares[65] = self.castling
+        squares[66] = 64 if self.en_passant_square is None else self.en_passant_square
+        squares[67:69] = min(self.half_move_count, 65535).to_bytes(2, 'little')
+        squares[69:71] = min(self.full_move_count, 65535).to_bytes(2, 'little')
+        return bytes(squares)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        if len(snapshot) != SNAPSHOT_SIZE:
+            raise ValueError("Snapshot of {} bytes instead of {}".format(len(snapshot), SNAPSHOT_SIZE))
+        board = cls()
+        for sq in range(64):
+            code = snapshot[sq]
+            if code:
+                bit = 1 << sq
+                board.bitboards[code - 1] |= bit
+                board.occupancy[code > 6] |= bit
+        board.occupied = board.occupancy[0] | board.occupancy[1]
+        board.side_to_move = bool(snapshot[64])
+        board.castling = snapshot[65]
+        board.en_passant_square = None if snapshot[66] == 64 else snapshot[66]
+        board.half_move_count = snapshot[67] | (snapshot[68] << 8)
+        board.full_move_count = snapshot[69] | (snapshot[70] << 8)
+        board.pseudolegal_moves = board.generate_pseudolegal_moves()
+        return board
+
+    @property
+    def castling_rights(self):
+        # Same layout as BoardRep: [White short, white long, black short, black long]
+        return [bool(self.castling & (1 << i)) for i in range(4)]
+
+    @property
+    def piece_count(self):
+        return {p: bb.bit_count() for p, bb in zip(PIECES, self.bitboards)}
+
+    @property
+    def in_check(self):
+        return self.king_in_check(self.side_to_move)
+
+    @property
+    def square_list(self):
+        # Mailbox view: FEN character per square (empty squares have None), built on every access
+        squares = [None] * 64
+        for piece, bb in zip(PIECES, self.bitboards):
+            while bb:
+                low = bb & -bb
+                squares[low.bit_length() - 1] = piece
+                bb ^= low
+        return squares
+
+    def __str__(self):
+        squares = self.square_list
+        res = ""
+        for r in range(7, -1, -1):
+            for f in range(8):
+                if f == 0 and r < 7:
+                    res += '\n'
+                piece = squares[r * 8 + f]
+                res += '. ' if piece is None else piece + ' '
+        return res
+
+    def get_fen(self):
+        squares = self.square_list
+        ranks = []
+        for r in range(7, -1, -1):
+            res = ""
+            number_of_empty = 0
+            for f in range(8):
+                piece = squares[r * 8 + f]
+                if piece is not None:
+                    if number_of_empty > 0:
+                        res += str(number_of_empty)
+                    res += piece
+                    number_of_empty = 0
+                else:
+                    number_of_empty += 1
+            if number_of_empty > 0:
+                res += str(number_of_empty)
+            ranks.append(res)
+
+        castle = ''.join(opt for i, opt in enumerate('KQkq') if self.castling & (1 << i)) or '-'
+        ep = '-' if self.en_passant_square is None else NUM_TO_SQUARE[self.en_passant_square]
+        return "{} {} {} {} {} {}".format('/'.join(ranks), 'bw'[not self.side_to_move], castle, ep,
+                                          self.half_move_count, self.full_move_count)
+
+    def piece_on(self, sq, color):
+        # Index (0-11) of the piece of the given color on sq, or None
+        bit = 1 << sq
+        bbs = self.bitboards
+        for i in range(6 * color, 6 * color + 6):
+            if bbs[i] & bit:
+                return i
+        return None
+
+    def is_square_attacked(self, sq, by_color):
+        bbs = self.bitboards
+        c = 6 * by_color
+        if KNIGHT_ATTACKS[sq] & bbs[c + 1] or KING_ATTACKS[sq] & bbs[c + 5]:
+            return True
+        # A pawn of by_color attacks sq if it stands where a pawn of the other color on sq would attack
+        if PAWN_ATTACKS[not by_color][sq] & bbs[c]:
+            return True
+        occ = self.occupied
+        if rook_attacks(sq, occ) & (bbs[c + 3] | bbs[c + 4]):
+            return True
+        return bool(bishop_attacks(sq, occ) & (bbs[c + 2] | bbs[c + 4]))
+
+    def king_in_check(self, color):
+        # False without a king of that color (as BoardRep)
+        king = self.bitboards[6 * color + 5]
+        return bool(king) and self.is_square_attacked(king.bit_length() - 1, not color)
+
+    def find_move(self, frm_name, to_name, prom=None):
+        frm = SQUARE_TO_NUM[frm_name]
+        to = SQUARE_TO_NUM[to_name]
+        promo = 0 if prom is None else 'PNBRQK'.index(prom.upper())
+        for mv in self.pseudolegal_moves:
+            if mv & 63 == frm and (mv >> 6) & 63 == to and (mv >> 12) & 7 == promo:
+                return mv
+
+    def generate_pseudolegal_moves(self):
+        moves = []
+        us = int(self.side_to_move)
+        c = 6 * us
+        bbs = self.bitboards
+        own = self.occupancy[us]
+        enemy = self.occupancy[1 - us]
+        occ = own | enemy
+        not_own = ~own & FULL
+
+        # Pawn moves as set operations on the whole pawn bitboard (delta = to - from)
+        pawns = bbs[c]
+        empty = ~occ & FULL
+        if us == 0:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            left = ((pawns & ~FILE_A) << 7) & enemy
+            right = ((pawns & ~FILE_H) << 9) & enemy
+            deltas = (8, 16, 7, 9)
+            last_rank = RANK_8
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            left = ((pawns & ~FILE_A) >> 9) & enemy
+            right = ((pawns & ~FILE_H) >> 7) & enemy
+            deltas = (-8, -16, -9, -7)
+            last_rank = RANK_1
+
+        for targets, delta, flags in ((single, deltas[0], 0), (left, deltas[2], CAPTURE),
+                                      (right, deltas[3], CAPTURE)):
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                to = low.bit_length() - 1
+                mv = (to - delta) | (to << 6) | flags
+                if low & last_rank:
+                    for promo in (4, 3, 2, 1):
+                        moves.append(mv | (promo << 12))
+                else:
+                    moves.append(mv)
+
+        while double:
+            low = double & -double
+            double ^= low
+            to = low.bit_length() - 1
+            moves.append((to - deltas[1]) | (to << 6) | DOUBLE_PUSH)
+
+        ep = self.en_passant_square
+        if ep is not None:
+            attackers = PAWN_ATTACKS[1 - us][ep] & pawns
+            while attackers:
+                low = attackers & -attackers
+                attackers ^= low
+                moves.append((low.bit_length() - 1) | (ep << 6) | CAPTURE | EN_PASSANT)
+
+        # Piece moves: attack masks restricted to squares not occupied by own pieces
+        for piece in range(1, 6):
+            bb = bbs[c + piece]
+            while bb:
+                low = bb & -bb
+                bb ^= low
+                frm = low.bit_length() - 1
+                if piece == 1:
+                    targets = KNIGHT_ATTACKS[frm]
+                elif piece == 2:
+                    targets = bishop_attacks(frm, occ)
+                elif piece == 3:
+                    targets = rook_attacks(frm, occ)
+                elif piece == 4:
+                    targets = rook_attacks(frm, occ) | bishop_attacks(frm, occ)
+                else:
+                    targets = KING_ATTACKS[frm]
+                targets &= not_own
+
+                captures = targets & enemy
+                quiets = targets ^ captures
+                while captures:
+                    low = captures & -captures
+                    captures ^= low
+                    moves.append(frm | ((low.bit_length() - 1) << 6) | CAPTURE)
+                while quiets:
+                    low = quiets & -quiets
+                    quiets ^= low
+                    moves.append(frm | ((low.bit_length() - 1) << 6))
+
+        # Castling (attacked squares are checked when the move is made)
+        for right, frm, to, path, _ in self.CASTLE_PATHS[2 * us:2 * us + 2]:
+            if self.castling & right and not occ & path:
+                moves.append(frm | (to << 6) | CASTLE)
+
+        return moves
+
+    def make_move(self, mv):
+        # Makes a pseudolegal move without any legality check
+        frm = mv & 63
+        to = (mv >> 6) & 63
+        us = int(self.side_to_move)
+        them = 1 - us
+        c = 6 * us
+        bbs = self.bitboards
+        occupancy = self.occupancy
+
+        piece = self.piece_on(frm, us)
+        captured = None
+        if mv & CAPTURE:
+            cap_sq = to
+            if mv & EN_PASSANT:
+                cap_sq = to - 8 if us == 0 else to + 8
+            captured = self.piece_on(cap_sq, them)
+            cap_bit = 1 << cap_sq
+            bbs[captured] ^= cap_bit
+            occupancy[them] ^= cap_bit
+
+        self.undo_sequence.append((mv, piece, captured, self.castling, self.en_passant_square,
+                                   self.half_move_count))
+
+        move_bits = (1 << frm) | (1 << to)
+        bbs[piece] ^= move_bits
+        occupancy[us] ^= move_bits
+
+        promo = (mv >> 12) & 7
+        if promo:
+            bbs[piece] ^= 1 << to
+            bbs[c + promo] ^= 1 << to
+
+        if mv & CASTLE:
+            if to > frm:
+                rook_bits = (1 << (to + 1)) | (1 << (to - 1))
+            else:
+                rook_bits = (1 << (to - 2)) | (1 << (to + 1))
+            bbs[c + 3] ^= rook_bits
+            occupancy[us] ^= rook_bits
+
+        self.occupied = occupancy[0] | occupancy[1]
+        self.castling &= CASTLE_KEEP[frm] & CASTLE_KEEP[to]
+        self.en_passant_square = (frm + to) >> 1 if mv & DOUBLE_PUSH else None
+
+        if captured is not None or piece == c or mv & CASTLE:
+            self.half_move_count = 0
+        else:
+            self.half_move_count += 1
+        if us:
+            self.full_move_count += 1
+        self.side_to_move = not self.side_to_move
+
+    def unmake_move(self):
+        mv, piece, captured, self.castling, self.en_passant_square, self.half_move_count = self.undo_sequence.pop()
+        self.side_to_move = not self.side_to_move
+        frm = mv & 63
+        to = (mv >> 6) & 63
+        us = int(self.side_to_move)
+        c = 6 * us
+        bbs = self.bitboards
+        occupancy = self.occupancy
+
+        if us:
+            self.full_move_count -= 1
+
+        promo = (mv >> 12) & 7
+        if promo:
+            bbs[c + promo] ^= 1 << to
+            bbs[piece] ^= 1 << to
+
+        move_bits = (1 << frm) | (1 << to)
+        bbs[piece] ^= move_bits
+        occupancy[us] ^= move_bits
+
+        if mv & CASTLE:
+            if to > frm:
+                rook_bits = (1 << (to + 1)) | (1 << (to - 1))
+            else:
+                rook_bits = (1 << (to - 2)) | (1 << (to + 1))
+            bbs[c + 3] ^= rook_bits
+            occupancy[us] ^= rook_bits
+
+        if captured is not None:
+            cap_sq = to
+            if mv & EN_PASSANT:
+                cap_sq = to - 8 if us == 0 else to + 8
+            cap_bit = 1 << cap_sq
+            bbs[captured] ^= cap_bit
+            occupancy[1 - us] ^= cap_bit
+
+        self.occupied = occupancy[0] | occupancy[1]
+
+    def make_legal_move(self, mv):
+        # Makes the move if it is legal and returns whether it was made
+        if mv & CASTLE:
+            them = not self.side_to_move
+            frm = mv & 63
+            if self.is_square_attacked(frm, them) or self.is_square_attacked((frm + ((mv >> 6) & 63)) >> 1, them):
+                return False
+        self.make_move(mv)
+        if self.king_in_check(not self.side_to_move):
+            self.unmake_move()
+            return False
+        return True
+
+    def do_move(self, mv, update_movelist=True):
+        # Same contract as BoardRep.do_move: False for illegal moves, otherwise True (or the next move list)
+        if mv not in self.pseudolegal_moves or not self.make_legal_move(mv):
+            return False
+
+        self.move_sequence.append(mv)
+        next_move_list = self.generate_pseudolegal_moves()
+        if update_movelist:
+            self.pseudolegal_moves = next_move_list
+            return True
+        else:
+            return next_move_list
+
+    def undo_move(self, regenerate_movelist=True):
+        if not self.move_sequence:
+            return
+        self.move_sequence.pop()
+        self.unmake_move()
+        if regenerate_movelist:
+            self.pseudolegal_moves = self.generate_pseudolegal_moves()
+
+    def is_legal(self, mv):
+        res = self.do_move(mv)
+        if res:
+            self.undo_move()
+        return res
+
+    def perft(self, n, split=False):
+        if n == 0:
+            return (1, {}) if split else 1
+
+        nodes = 0
+        split_dict = {}
+        for mv in self.generate_pseudolegal_moves():
+            if not self.make_legal_move(mv):
+                continue
+            add = self._perft(n - 1)
+            self.unmake_move()
+            nodes += add
+            if split:
+                split_dict[move_to_uci(mv)] = add
+
+        if split:
+            return nodes, split_dict
+        else:
+            return nodes
+
+    def _perft(self, n):
+        if n == 0:
+            return 1
+        nodes = 0
+        for mv in self.generate_pseudolegal_moves():
+            if self.make_legal_move(mv):
+                nodes += self._perft(n - 1)
+                self.unmake_move()
+        return nodes
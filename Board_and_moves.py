@@ -1,8 +1,262 @@
 import random
-from itertools import product
+from itertools import product, chain
 from contextlib import suppress
 from math import ceil
 import copy
+from array import array
+
+# Moves are packed in a single int (move lists are array('I') of those):
+#   bits  0-5   from square
+#   bits  6-11  to square
+#   bits 12-14  promotion piece (0 = none, 1-4 = N, B, R, Q, i.e. the index in 'PNBRQK')
+#   bit  15     capture
+#   bit  16     castle
+#   bit  17     en passant
+#   bit  18     double pawn push
+#   bits 19-21  moving piece (index in 'PNBRQK')
+#   bits 22-24  captured piece (index in 'PNBRQK', only meaningful with the capture flag)
+#   bit  25     moving side is black
+PROMOTION_MASK = 7 << 12
+CAPTURE = 1 << 15
+CASTLE = 1 << 16
+EN_PASSANT = 1 << 17
+DOUBLE_PUSH = 1 << 18
+PIECE_SHIFT = 19
+CAPTURED_SHIFT = 22
+BLACK = 1 << 25
+
+PIECE_TYPE = {p: 'PNBRQK'.index(p.upper()) for p in 'PNBRQKpnbrqk'}
+CAPTURE_CODE = {p: CAPTURE | (PIECE_TYPE[p] << CAPTURED_SHIFT) for p in 'PNBRQKpnbrqk'}
+PROMOTIONS = [4 << 12, 3 << 12, 2 << 12, 1 << 12]  # Q, R, B, N
+
+
+def encode_move(frm, to, piecetype, capture=None, promotion=None, is_castle=False, is_enpassant=False):
+    # piecetype, capture and promotion are FEN letters (the case of piecetype determines the moving side)
+    code = frm | (to << 6) | (PIECE_TYPE[piecetype] << PIECE_SHIFT)
+    if piecetype.islower():
+        code |= BLACK
+    if capture is not None:
+        code |= CAPTURE_CODE[capture]
+    if promotion is not None:
+        code |= PIECE_TYPE[promotion] << 12
+    if is_castle:
+        code |= CASTLE
+    if is_enpassant:
+        code |= EN_PASSANT
+    if piecetype in 'Pp' and abs(to - frm) == 16:
+        code |= DOUBLE_PUSH
+    return code
+
+
+def move_to_uci(mv):
+    res = BoardRep.NUM_TO_SQUARE[mv & 63] + BoardRep.NUM_TO_SQUARE[(mv >> 6) & 63]
+    if mv & PROMOTION_MASK:
+        res += 'pnbrq'[(mv >> 12) & 7]
+    return res
+
+
+# Zobrist keys (fixed seed, so keys are identical between runs and processes)
+_zobrist_random = random.Random(20200101)
+ZOBRIST_PIECES = {p: [_zobrist_random.getrandbits(64) for _ in range(64)] for p in 'PNBRQKpnbrqk'}
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(4)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]  # Per file
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+# Evaluation: material and piece-square values for the middlegame and the endgame (PeSTO values). BoardRep keeps the
+# sum over all pieces up to date in do_pseudolegal_move/undo_pseudolegal_move, packed in one int as
+# mg * 2**16 + eg (white positive), together with the game phase (24 = all pieces on the board, 0 = pawn ending).
+# The tables are from white's point of view with a8 first, as the board is printed.
+MG_VALUES = {'P': 82, 'N': 337, 'B': 365, 'R': 477, 'Q': 1025, 'K': 0}
+EG_VALUES = {'P': 94, 'N': 281, 'B': 297, 'R': 512, 'Q': 936, 'K': 0}
+PHASE_WEIGHTS = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0, 'p': 0, 'n': 1, 'b': 1, 'r': 2, 'q': 4, 'k': 0}
+MAX_PHASE = 24
+
+MG_TABLES = {
+    'P': [0, 0, 0, 0, 0, 0, 0, 0,
+          98, 134, 61, 95, 68, 126, 34, -11,
+          -6, 7, 26, 31, 65, 56, 25, -20,
+          -14, 13, 6, 21, 23, 12, 17, -23,
+          -27, -2, -5, 12, 17, 6, 10, -25,
+          -26, -4, -4, -10, 3, 3, 33, -12,
+          -35, -1, -20, -23, -15, 24, 38, -22,
+          0, 0, 0, 0, 0, 0, 0, 0],
+    'N': [-167, -89, -34, -49, 61, -97, -15, -107,
+          -73, -41, 72, 36, 23, 62, 7, -17,
+          -47, 60, 37, 65, 84, 129, 73, 44,
+          -9, 17, 19, 53, 37, 69, 18, 22,
+          -13, 4, 16, 13, 28, 19, 21, -8,
+          -23, -9, 12, 10, 19, 17, 25, -16,
+          -29, -53, -12, -3, -1, 18, -14, -19,
+          -105, -21, -58, -33, -17, -28, -19, -23],
+    'B': [-29, 4, -82, -37, -25, -42, 7, -8,
+          -26, 16, -18, -13, 30, 59, 18, -47,
+          -16, 37, 43, 40, 35, 50, 37, -2,
+          -4, 5, 19, 50, 37, 37, 7, -2,
+          -6, 13, 13, 26, 34, 12, 10, 4,
+          0, 15, 15, 15, 14, 27, 18, 10,
+          4, 15, 16, 0, 7, 21, 33, 1,
+          -33, -3, -14, -21, -13, -12, -39, -21],
+    'R': [32, 42, 32, 51, 63, 9, 31, 43,
+          27, 32, 58, 62, 80, 67, 26, 44,
+          -5, 19, 26, 36, 17, 45, 61, 16,
+          -24, -11, 7, 26, 24, 35, -8, -20,
+          -36, -26, -12, -1, 9, -7, 6, -23,
+          -45, -25, -16, -17, 3, 0, -5, -33,
+          -44, -16, -20, -9, -1, 11, -6, -71,
+          -19, -13, 1, 17, 16, 7, -37, -26],
+    'Q': [-28, 0, 29, 12, 59, 44, 43, 45,
+          -24, -39, -5, 1, -16, 57, 28, 54,
+          -13, -17, 7, 8, 29, 56, 47, 57,
+          -27, -27, -16, -16, -1, 17, -2, 1,
+          -9, -26, -9, -10, -2, -4, 3, -3,
+          -14, 2, -11, -2, -5, 2, 14, 5,
+          -35, -8, 11, 2, 8, 15, -3, 1,
+          -1, -18, -9, 10, -15, -25, -31, -50],
+    'K': [-65, 23, 16, -15, -56, -34, 2, 13,
+          29, -1, -20, -7, -8, -4, -38, -29,
+          -9, 24, 2, -16, -20, 6, 22, -22,
+          -17, -20, -12, -27, -30, -25, -14, -36,
+          -49, -1, -27, -39, -46, -44, -33, -51,
+          -14, -14, -22, -46, -44, -30, -15, -27,
+          1, 7, -8, -64, -43, -16, 9, 8,
+          -15, 36, 12, -54, 8, -28, 24, 14]}
+
+EG_TABLES = {
+    'P': [0, 0, 0, 0, 0, 0, 0, 0,
+          178, 173, 158, 134, 147, 132, 165, 187,
+          94, 100, 85, 67, 56, 53, 82, 84,
+          32, 24, 13, 5, -2, 4, 17, 17,
+          13, 9, -3, -7, -7, -8, 3, -1,
+          4, 7, -6, 1, 0, -5, -1, -8,
+          13, 8, 8, 10, 13, 0, 2, -7,
+          0, 0, 0, 0, 0, 0, 0, 0],
+    'N': [-58, -38, -13, -28, -31, -27, -63, -99,
+          -25, -8, -25, -2, -9, -25, -24, -52,
+          -24, -20, 10, 9, -1, -9, -19, -41,
+          -17, 3, 22, 22, 22, 11, 8, -18,
+          -18, -6, 16, 25, 16, 17, 4, -18,
+          -23, -3, -1, 15, 10, -3, -20, -22,
+          -42, -20, -10, -5, -2, -20, -23, -44,
+          -29, -51, -23, -15, -22, -18, -50, -64],
+    'B': [-14, -21, -11, -8, -7, -9, -17, -24,
+          -8, -4, 7, -12, -3, -13, -4, -14,
+          2, -8, 0, -1, -2, 6, 0, 4,
+          -3, 9, 12, 9, 14, 10, 3, 2,
+          -6, 3, 13, 19, 7, 10, -3, -9,
+          -12, -3, 8, 10, 13, 3, -7, -15,
+          -14, -18, -7, -1, 4, -9, -15, -27,
+          -23, -9, -23, -5, -9, -16, -5, -17],
+    'R': [13, 10, 18, 15, 12, 12, 8, 5,
+          11, 13, 13, 11, -3, 3, 8, 3,
+          7, 7, 7, 5, 4, -3, -5, -3,
+          4, 3, 13, 1, 2, 1, -1, 2,
+          3, 5, 8, 4, -5, -6, -8, -11,
+          -4, 0, -5, -1, -7, -12, -8, -16,
+          -6, -6, 0, 2, -9, -9, -11, -3,
+          -9, 2, 3, -1, -5, -13, 4, -20],
+    'Q': [-9, 22, 22, 27, 27, 19, 10, 20,
+          -17, 20, 32, 41, 58, 25, 30, 0,
+          -20, 6, 9, 49, 47, 35, 19, 9,
+          3, 22, 24, 45, 57, 40, 57, 36,
+          -18, 28, 19, 47, 31, 34, 39, 23,
+          -16, -27, 15, 6, 9, 17, 10, 5,
+          -22, -23, -30, -16, -16, -23, -36, -32,
+          -33, -28, -22, -43, -5, -32, -20, -41],
+    'K': [-74, -35, -18, -18, -11, 15, 4, -17,
+          -12, 17, 14, 17, 17, 38, 23, 11,
+          10, 17, 23, 15, 20, 45, 44, 13,
+          -8, 22, 24, 27, 26, 33, 26, 3,
+          -18, -4, 21, 24, 27, 23, 9, -11,
+          -19, -3, 11, 21, 23, 16, 7, -9,
+          -27, -11, 4, 13, 14, 4, -5, -17,
+          -53, -34, -21, -11, -28, -14, -24, -43]}
+
+
+# Piece values for the static exchange evaluation (BoardRep.see)
+SEE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 20000,
+              'p': 100, 'n': 320, 'b': 330, 'r': 500, 'q': 900, 'k': 20000}
+
+
+def pack_score(mg, eg):
+    return (mg << 16) + eg
+
+
+def unpack_score(score):
+    eg = ((score + 0x8000) & 0xFFFF) - 0x8000
+    return (score - eg) >> 16, eg
+
+
+# PSQT[piece][square]: packed value of the piece on the square (black pieces mirrored and negative)
+PSQT = {}
+for _p in 'PNBRQK':
+    PSQT[_p] = [pack_score(MG_VALUES[_p] + MG_TABLES[_p][sq ^ 56], EG_VALUES[_p] + EG_TABLES[_p][sq ^ 56])
+                for sq in range(64)]
+    PSQT[_p.lower()] = [-pack_score(MG_VALUES[_p] + MG_TABLES[_p][sq], EG_VALUES[_p] + EG_TABLES[_p][sq])
+                        for sq in range(64)]
+
+
+def _target_table(deltas):
+    # For each square the list of squares reached with the given (rank, file) steps
+    table = []
+    for sq in range(64):
+        r, f = divmod(sq, 8)
+        table.append([(r + dr) * 8 + f + df for dr, df in deltas if 0 <= r + dr < 8 and 0 <= f + df < 8])
+    return table
+
+
+def _ray_table(directions):
+    # For each square a list of rays (one per direction), each ray ordered outward from the square
+    table = []
+    for sq in range(64):
+        rays = []
+        for dr, df in directions:
+            ray = []
+            r, f = divmod(sq, 8)
+            r, f = r + dr, f + df
+            while 0 <= r < 8 and 0 <= f < 8:
+                ray.append(r * 8 + f)
+                r, f = r + dr, f + df
+            rays.append(ray)
+        table.append(rays)
+    return table
+
+
+def _pawn_push_table(direction, start_rank):
+    # For each square the push targets of a pawn (two on its start rank, none on the first and last rank)
+    table = []
+    for sq in range(64):
+        r = sq // 8
+        if not 0 < r < 7:
+            table.append([])
+        elif r == start_rank:
+            table.append([sq + 8 * direction, sq + 16 * direction])
+        else:
+            table.append([sq + 8 * direction])
+    return table
+
+
+# Lookup tables for move generation, attack queries and mobility (built once at import)
+#   KNIGHT_TARGETS[sq], KING_TARGETS[sq] -- Squares reached from sq
+#   PAWN_PUSHES[color][sq], PAWN_CAPTURES[color][sq] -- Push targets and capture targets of a pawn of color on sq
+#   ROOK_RAYS[sq], BISHOP_RAYS[sq], QUEEN_RAYS[sq] -- Rays (ordered outward from sq) per direction
+KNIGHT_TARGETS = _target_table([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_TARGETS = _target_table([(1, -1), (1, 0), (1, 1), (0, -1), (0, 1), (-1, -1), (-1, 0), (-1, 1)])
+PAWN_PUSHES = [_pawn_push_table(1, 1), _pawn_push_table(-1, 6)]  # [white, black]
+PAWN_CAPTURES = [_target_table([(1, -1), (1, 1)]), _target_table([(-1, -1), (-1, 1)])]  # [white, black]
+ROOK_RAYS = _ray_table([(0, 1), (0, -1), (1, 0), (-1, 0)])
+BISHOP_RAYS = _ray_table([(1, 1), (1, -1), (-1, 1), (-1, -1)])
+QUEEN_RAYS = [rook + bishop for rook, bishop in zip(ROOK_RAYS, BISHOP_RAYS)]
+
+# Position snapshots (BoardRep.snapshot) are bytes of fixed size SNAPSHOT_SIZE:
+#   bytes  0-63  piece per square (0 = empty, 1-12 = index + 1 in 'PNBRQKpnbrqk')
+#   byte   64    side to move (0 = white, 1 = black)
+#   byte   65    castling rights as mask (1 = white short, 2 = white long, 4 = black short, 8 = black long)
+#   byte   66    en passant square (64 = none)
+#   bytes 67-68  half move count (little endian, capped at 65535)
+#   bytes 69-70  full move count (little endian, capped at 65535)
+SNAPSHOT_SIZE = 71
+SNAPSHOT_PIECES = ' PNBRQKpnbrqk'
+SNAPSHOT_CODES = {p: i for i, p in enumerate(SNAPSHOT_PIECES) if p != ' '}
 
 
 class BoardRep:
@@ -32,9 +286,20 @@ class BoardRep:
         en_passant_square -- Target square for en passant capture ((0-63) or None)
         half_move_count -- Counts half moves since last capture or pawn push
         full_move_count -- Counts full moves after black moves
-        piece_list -- Simple list of piece objects that are in existence
-        piece_count -- Dict of pieces and their counts
+        pieces -- Dict of FEN letter: list of the piece objects of that color and type (Piece.index is the position
+                  in this list, so pieces are added and removed in constant time)
+        piece_list -- All piece objects (property built from pieces)
+        piece_count -- Dict of pieces and their counts (property built from pieces)
         square_list -- List of length 64 with each piece object at the square it occupies (empty squares have None)
+        kings -- [white king, black king] piece objects (their position is kept up to date by Piece.move)
+        in_check -- Whether the side to move is in check
+        zobrist_key -- 64-bit hash of pieces, side to move, castling rights and en passant square
+        psqt -- Packed material and piece-square score of all pieces (see PSQT), kept up to date incrementally
+        phase -- Game phase from the pieces on the board (MAX_PHASE at the start, 0 with only kings and pawns)
+        pseudolegal_moves -- Pseudolegal moves of the position (property, generated when first asked for)
+        move_sequence -- Moves played with do_move
+        undo_stack -- UndoState per move in move_sequence to restore the irreversible state in undo_move
+        start_fen -- FEN the board was read from (fen_sequence is replayed from here)
         attack_map
         defence_map
 
@@ -44,17 +309,32 @@ class BoardRep:
         self.en_passant_square = None
         self.half_move_count = 0
         self.full_move_count = 1
-        self.piece_list = []
-        self.piece_count = {key: 0 for key in self.PIECES}
+        self.pieces = {key: [] for key in self.PIECES}
         self.square_list = [None] * 64
+        self.kings = [None, None]
         self.in_check = False
+        self.zobrist_key = 0
+        self.psqt = 0
+        self.phase = 0
 
-        self.pseudolegal_moves = []
+        self._pseudolegal_moves = None
         self.move_sequence = []
-        self.fen_sequence = []
+        self.undo_stack = []
+        self.start_fen = None
 
     @classmethod
-    def read_fen(cls, fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"):
+    def read_fen(cls, fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", backend='mailbox'):
+        # backend = 'bitboard' returns a Bitboard.BitboardRep with the same public methods instead, backend =
+        # 'instrumented' an instrumentation.InstrumentedBoardRep (a BoardRep that counts and times its hot paths)
+        if backend == 'bitboard':
+            from Bitboard import BitboardRep
+            return BitboardRep.read_fen(fen)
+        elif backend == 'instrumented':
+            from instrumentation import InstrumentedBoardRep
+            return InstrumentedBoardRep.read_fen(fen)
+        elif backend != 'mailbox':
+            raise ValueError("Unknown board backend: " + str(backend))
+
         board = cls()
         lines = fen.split()
         ranks = lines[0].split("/")
@@ -63,11 +343,7 @@ class BoardRep:
             f = 0
             for piece in rank:
                 if piece in cls.PIECES:
-                    pos = r * 8 + f
-                    newpiece = Piece(piecetype=piece, position=pos)
-                    board.square_list[pos] = newpiece
-                    board.piece_list.append(newpiece)
-                    board.piece_count[piece] += 1
+                    board.place_piece(piece, r * 8 + f)
                     f += 1
                 else:
                     f += int(piece)
@@ -90,10 +366,9 @@ class BoardRep:
             board.half_move_count = 0
             board.full_move_count = 1
 
-        board.pseudolegal_moves = board.generate_pseudolegal_moves()
-        board.fen_sequence.append(fen)
+        board.finish_setup()
+        board.start_fen = fen
 
-        # TODO: Check if King is in check
         # TODO: Check if position is legal? [e.g. are there Kings, is the side not to move not in check?]
 
         return board
@@ -117,6 +392,66 @@ class BoardRep:
         else:
             return False
 
+    @property
+    def piece_list(self):
+        return [piece for piecetype in self.PIECES for piece in self.pieces[piecetype]]
+
+    @property
+    def pseudolegal_moves(self):
+        # Moves for do_move and find_move, generated on first use after read_fen (do_move and undo_move keep them up
+        # to date from then on, make_move and unmake_move do not touch them)
+        if self._pseudolegal_moves is None:
+            self._pseudolegal_moves = self.generate_pseudolegal_moves()
+        return self._pseudolegal_moves
+
+    @pseudolegal_moves.setter
+    def pseudolegal_moves(self, moves):
+        self._pseudolegal_moves = moves
+
+    @property
+    def piece_count(self):
+        return {piecetype: len(self.pieces[piecetype]) for piecetype in self.PIECES}
+
+    def place_piece(self, piecetype, position):
+        # Puts a new piece on an empty square while setting up a position (read_fen, from_snapshot), finish_setup
+        # computes the Zobrist key and evaluation once all pieces are placed
+        piece = Piece(piecetype=piecetype, position=position)
+        self.square_list[position] = piece
+        self.add_piece(piece)
+        if piecetype in 'Kk':
+            self.kings[piece.color] = piece
+        return piece
+
+    def finish_setup(self):
+        # Derived state of a position that was set up piece by piece (kept up to date incrementally by the moves)
+        self.in_check = self.king_in_check(self.side_to_move)
+        self.zobrist_key = self.compute_zobrist_key()
+        self.psqt, self.phase = self.compute_evaluation()
+
+    def add_piece(self, piece):
+        # Adds piece to the piece lists (not to square_list)
+        same_pieces = self.pieces[piece.piecetype]
+        piece.index = len(same_pieces)
+        same_pieces.append(piece)
+
+    def remove_piece(self, piece):
+        # Removes piece from the piece lists (not from square_list) by moving the last piece of its list into its place
+        same_pieces = self.pieces[piece.piecetype]
+        last = same_pieces.pop()
+        if last is not piece:
+            same_pieces[piece.index] = last
+            last.index = piece.index
+
+    @property
+    def fen_sequence(self):
+        # FEN of every position in the game so far. Only built on request, by replaying move_sequence from start_fen.
+        board = BoardRep.read_fen(self.start_fen)
+        res = [self.start_fen]
+        for mv in self.move_sequence:
+            board.make_move(mv)
+            res.append(board.get_fen())
+        return res
+
     def get_fen(self):
         res = ""
         for r in range(7, -1, -1):
@@ -157,378 +492,718 @@ class BoardRep:
 
         return res
 
+    def snapshot(self):
+        """ Position as immutable bytes of SNAPSHOT_SIZE (see the layout above BoardRep)
+
+        Equal positions (including the move counters) give equal snapshots, so snapshots can be hashed, compared and
+        pickled cheaply, e.g. to copy a position or to send it to a worker process. The moves played to reach the
+        position are not part of it.
+        """
+        squares = bytearray(SNAPSHOT_SIZE)
+        for piece in self.piece_list:
+            squares[piece.position] = SNAPSHOT_CODES[piece.piecetype]
+        squares[64] = self.side_to_move
+        squares[65] = sum(1 << i for i in range(4) if self.castling_rights[i])
+        squares[66] = 64 if self.en_passant_square is None else self.en_passant_square
+        squares[67:69] = min(self.half_move_count, 65535).to_bytes(2, 'little')
+        squares[69:71] = min(self.full_move_count, 65535).to_bytes(2, 'little')
+        return bytes(squares)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        # Board of a snapshot (as read_fen, without parsing a FEN)
+        if len(snapshot) != SNAPSHOT_SIZE:
+            raise ValueError("Snapshot of {} bytes instead of {}".format(len(snapshot), SNAPSHOT_SIZE))
+        board = cls()
+        for pos, code in enumerate(snapshot[:64]):
+            if code:
+                board.place_piece(SNAPSHOT_PIECES[code], pos)
+
+        board.side_to_move = bool(snapshot[64])
+        board.castling_rights = [bool(snapshot[65] & (1 << i)) for i in range(4)]
+        board.en_passant_square = None if snapshot[66] == 64 else snapshot[66]
+        board.half_move_count = snapshot[67] | (snapshot[68] << 8)
+        board.full_move_count = snapshot[69] | (snapshot[70] << 8)
+
+        board.finish_setup()
+        board.start_fen = board.get_fen()
+        return board
+
+    def state_key(self):
+        # Part of the Zobrist key that is not related to piece placement
+        key = 0
+        for i in range(4):
+            if self.castling_rights[i]:
+                key ^= ZOBRIST_CASTLING[i]
+        if self.en_passant_square is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant_square % 8]
+        if self.side_to_move:
+            key ^= ZOBRIST_SIDE
+        return key
+
+    def compute_zobrist_key(self):
+        # Full recomputation (do_move and undo_move keep self.zobrist_key up to date incrementally)
+        key = self.state_key()
+        for piece in self.piece_list:
+            key ^= ZOBRIST_PIECES[piece.piecetype][piece.position]
+        return key
+
+    def compute_evaluation(self):
+        # Full recomputation of (psqt, phase) (do_move and undo_move keep them up to date incrementally)
+        psqt = 0
+        phase = 0
+        for piece in self.piece_list:
+            psqt += PSQT[piece.piecetype][piece.position]
+            phase += PHASE_WEIGHTS[piece.piecetype]
+        return psqt, phase
+
+    def evaluate(self, verify=False):
+        """ Static evaluation in centipawns from the point of view of the side to move
+
+        Middlegame and endgame scores are blended by the game phase. Only reads the incrementally updated psqt and phase.
+
+        Parameters:
+        verify -- Compare psqt and phase with a full recomputation first (raises AssertionError when they differ)
+        """
+        if verify and (self.psqt, self.phase) != self.compute_evaluation():
+            raise AssertionError("Incremental evaluation {} differs from recomputed {} in {}".format(
+                (self.psqt, self.phase), self.compute_evaluation(), self.get_fen()))
+        mg, eg = unpack_score(self.psqt)
+        phase = min(self.phase, MAX_PHASE)
+        score = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+        return -score if self.side_to_move else score
+
+    def is_square_attacked(self, square, by_color):
+        squares = self.square_list
+        clr = int(by_color)
+
+        knight = 'Nn'[clr]
+        for sq in KNIGHT_TARGETS[square]:
+            if squares[sq] is not None and squares[sq].piecetype == knight:
+                return True
+
+        king = 'Kk'[clr]
+        for sq in KING_TARGETS[square]:
+            if squares[sq] is not None and squares[sq].piecetype == king:
+                return True
+
+        # Pawns of by_color that attack the square are where a pawn of the other color on the square would capture
+        pawn = 'Pp'[clr]
+        for sq in PAWN_CAPTURES[1 - clr][square]:
+            if squares[sq] is not None and squares[sq].piecetype == pawn:
+                return True
+
+        rooklike = 'Rr'[clr] + 'Qq'[clr]
+        for ray in ROOK_RAYS[square]:
+            for sq in ray:
+                if squares[sq] is not None:
+                    if squares[sq].piecetype in rooklike:
+                        return True
+                    break
+
+        bishoplike = 'Bb'[clr] + 'Qq'[clr]
+        for ray in BISHOP_RAYS[square]:
+            for sq in ray:
+                if squares[sq] is not None:
+                    if squares[sq].piecetype in bishoplike:
+                        return True
+                    break
+
+        return False
+
+    def least_valuable_attacker(self, square, by_color, removed=()):
+        """ Square of the least valuable piece of by_color attacking square (None if there is none)
+
+        Pieces on the squares in removed are taken as gone, so sliders behind them attack through (x-rays).
+        """
+        squares = self.square_list
+        clr = int(by_color)
+
+        pawn = 'Pp'[clr]
+        for sq in PAWN_CAPTURES[1 - clr][square]:
+            if sq not in removed and squares[sq] is not None and squares[sq].piecetype == pawn:
+                return sq
+
+        knight = 'Nn'[clr]
+        for sq in KNIGHT_TARGETS[square]:
+            if sq not in removed and squares[sq] is not None and squares[sq].piecetype == knight:
+                return sq
+
+        # First piece along each ray, per slider type
+        found = {}
+        for rays, sliders in ((BISHOP_RAYS[square], 'Bb'[clr] + 'Qq'[clr]), (ROOK_RAYS[square], 'Rr'[clr] + 'Qq'[clr])):
+            for ray in rays:
+                for sq in ray:
+                    if sq in removed or squares[sq] is None:
+                        continue
+                    if squares[sq].piecetype in sliders:
+                        found.setdefault(squares[sq].piecetype.upper(), sq)
+                    break
+        for piecetype in 'BRQ':
+            if piecetype in found:
+                return found[piecetype]
+
+        king = 'Kk'[clr]
+        for sq in KING_TARGETS[square]:
+            if sq not in removed and squares[sq] is not None and squares[sq].piecetype == king:
+                return sq
+
+        return None
+
+    def see(self, mv):
+        """ Static exchange evaluation: material won (in SEE_VALUES) by mv when both sides keep recapturing on its
+        target square with their least valuable piece, and may stop whenever that is better (pins are ignored)
+        """
+        squares = self.square_list
+        frm = mv & 63
+        to = (mv >> 6) & 63
+        color = self.side_to_move
+
+        removed = {frm}
+        if mv & EN_PASSANT:
+            removed.add(to - 8 * (-1) ** color)
+            gain = [SEE_VALUES['P']]
+        else:
+            gain = [SEE_VALUES[squares[to].piecetype] if squares[to] is not None else 0]
+        on_square = SEE_VALUES[squares[frm].piecetype]
+        if mv & PROMOTION_MASK:
+            on_square = SEE_VALUES[self.PIECES[(mv >> 12) & 7]]
+            gain[0] += on_square - SEE_VALUES['P']
+
+        side = not color
+        while True:
+            sq = self.least_valuable_attacker(to, side, removed)
+            if sq is None:
+                break
+            # Capturing the piece on the square, seen from the side making this capture
+            gain.append(on_square - gain[-1])
+            on_square = SEE_VALUES[squares[sq].piecetype]
+            removed.add(sq)
+            side = not side
+
+        # Each side only recaptures when that does not lose material
+        while len(gain) > 1:
+            last = gain.pop()
+            gain[-1] = -max(-gain[-1], last)
+        return gain[0]
+
+    def king_in_check(self, color):
+        king = self.kings[color]
+        return king is not None and self.is_square_attacked(king.position, not color)
+
     def find_move(self, frm_name, to_name, prom=None):
-        frm = self.SQUARE_TO_NUM[frm_name]
-        to = self.SQUARE_TO_NUM[to_name]
+        # Returns the packed move (prom is the FEN letter of the promotion piece, in either case)
+        wanted = self.SQUARE_TO_NUM[frm_name] | (self.SQUARE_TO_NUM[to_name] << 6)
+        if prom is not None:
+            wanted |= PIECE_TYPE[prom] << 12
         for move in self.pseudolegal_moves:
-            if move.frm == frm and move.to == to and move.promotion == prom:
+            if move & (PROMOTION_MASK | 4095) == wanted:
                 return move
 
-    def generate_pseudolegal_moves(self):
-        moves = []
+    def move_from_uci(self, uci):
+        # Legal packed move for a move in UCI notation (e.g. 'e2e4' or 'a7a8q'), None if there is none. Only the moves
+        # of the piece on the from square are generated.
+        frm = self.SQUARE_TO_NUM.get(uci[0:2])
+        to = self.SQUARE_TO_NUM.get(uci[2:4])
+        piece = self.square_list[frm] if frm is not None else None
+        if piece is None or piece.color != self.side_to_move or to is None or uci[4:] not in ('', 'n', 'b', 'r', 'q'):
+            return None
+        wanted = frm | (to << 6) | (PIECE_TYPE[uci[4]] << 12 if uci[4:] else 0)
+        for mv in self.generate_legal_moves(moves=self.generate_pseudolegal_moves(pieces=(piece,))):
+            if mv & (PROMOTION_MASK | 4095) == wanted:
+                return mv
+        return None
+
+    def move_from_san(self, san):
+        # Legal packed move for a move in standard algebraic notation (e.g. 'Nbd7', 'exd5', 'e8=Q+' or 'O-O'), None if
+        # there is none
+        san = san.rstrip('+#!?')
+        legal = self.generate_legal_moves()
+        if san in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+            for mv in legal:
+                if mv & CASTLE and (((mv >> 6) & 7) == 2) == (len(san) == 5):
+                    return mv
+            return None
+
+        promotion = 0
+        if '=' in san:
+            san, prom = san.split('=', 1)
+            promotion = PIECE_TYPE.get(prom[:1], 0)
+        elif san[-1:] in ('N', 'B', 'R', 'Q'):  # e8Q
+            promotion = PIECE_TYPE[san[-1]]
+            san = san[:-1]
+        piece = PIECE_TYPE[san[0]] if san[:1] in ('N', 'B', 'R', 'Q', 'K') else 0
+        to = self.SQUARE_TO_NUM.get(san[-2:])
+        disambiguation = san[1 if piece else 0:-2].replace('x', '')
+        for mv in legal:
+            if (mv >> 6) & 63 == to and (mv >> PIECE_SHIFT) & 7 == piece and (mv >> 12) & 7 == promotion and \
+                    not mv & CASTLE and all(c in self.NUM_TO_SQUARE[mv & 63] for c in disambiguation):
+                return mv
+        return None
+
+    def generate_pseudolegal_moves(self, captures=True, quiets=True, pieces=None):
+        """ Pseudolegal moves for the side to move
+
+        Parameters:
+        captures -- Include captures and promotions (promotions are counted as captures, also without one)
+        quiets -- Include all other moves (castling included)
+        pieces -- Only the moves of these own pieces (None = all of them)
+        """
+        moves = array('I')
         on_move = self.side_to_move
         squares = self.square_list
         clr = int(on_move)  # white = 0, black = 1
+        color_bit = BLACK * clr
+        en_passant_square = self.en_passant_square
 
         pawn = 'Pp'[clr]
-        rooklike = 'Rr'[clr] + 'Qq'[clr]
-        bishoplike = 'Bb'[clr] + 'Qq'[clr]
         king = 'Kk'[clr]
         knight = 'Nn'[clr]
+        slider_rays = {'Rr'[clr]: ROOK_RAYS, 'Bb'[clr]: BISHOP_RAYS, 'Qq'[clr]: QUEEN_RAYS}
 
-        proms = 'Qq'[clr] + 'Rr'[clr] + 'Bb'[clr] + knight
+        pawn_pushes = PAWN_PUSHES[clr]
+        pawn_captures = PAWN_CAPTURES[clr]
+        promotion_rank = 6 - 5 * clr
 
-        for moving_piece in self.piece_list:
+        own_pieces = pieces
+        if own_pieces is None:
+            own_pieces = chain(*[self.pieces[piecetype] for piecetype in self.PIECES[6 * clr:6 * clr + 6]])
+        for moving_piece in own_pieces:
             i = moving_piece.position
+            piecetype = moving_piece.piecetype
 
-            r = i // 8
-            f = i % 8
+            # Packed move without target square
+            base = i | (PIECE_TYPE[piecetype] << PIECE_SHIFT) | color_bit
 
             # Pawn moves
-            if moving_piece.piecetype == pawn:
-                # move forward
-                if squares[i + 8 * (-1) ** clr] is None:
-                    if r == 6 - 5 * clr:
-                        for prom in proms:
-                            moves.append(Move(i, i + 8 * (-1) ** clr, moving_piece, promotion=prom))
-                    else:
-                        moves.append(Move(i, i + 8 * (-1) ** clr, moving_piece))
-                        # move 2 if allowed
-                        if r == 1 + 5 * clr and squares[i + 16 * (-1) ** clr] is None:
-                            moves.append(Move(i, i + 16 * (-1) ** clr, moving_piece))
-
-                # capture right
-                if f < 7 and squares[i + 9 - 16 * clr] is not None and squares[i + 9 - 16 * clr].color != on_move:
-                    if r == 6 - 5 * clr:
-                        for prom in proms:
-                            moves.append(
-                                Move(i, i + 9 - 16 * clr, moving_piece,
-                                     capture=squares[i + 9 - 16 * clr].piecetype, promotion=prom))
-                    else:
-                        moves.append(
-                            Move(i, i + 9 - 16 * clr, moving_piece, capture=squares[i + 9 - 16 * clr].piecetype))
-
-                # capture right en passant
-                if f < 7 and self.en_passant_square == i + 9 - 16 * clr:
-                    moves.append(Move(i, i + 9 - 16 * clr, moving_piece, capture='pP'[clr], is_enpassant=True))
-
-                # capture left
-                if f > 0 and squares[i + 7 - 16 * clr] is not None and squares[i + 7 - 16 * clr].color != on_move:
-                    if r == 6 - 5 * clr:
-                        for prom in proms:
-                            moves.append(Move(i, i + 7 - 16 * clr, moving_piece,
-                                              capture=squares[i + 7 - 16 * clr].piecetype, promotion=prom))
-                    else:
-                        moves.append(
-                            Move(i, i + 7 - 16 * clr, moving_piece, capture=squares[i + 7 - 16 * clr].piecetype))
-
-                # capture left en passant
-                if f > 0 and self.en_passant_square == i + 7 - 16 * clr:
-                    moves.append(Move(i, i + 7 - 16 * clr, moving_piece, capture='pP'[clr], is_enpassant=True))
-
-            # Rook moves or rook-like queen moves
-            if moving_piece.piecetype in rooklike:
-                # move right
-                offset = 1
-                while f + offset < 8 and squares[i + offset] is None:
-                    moves.append(Move(i, i + offset, moving_piece))
-                    offset += 1
-                if f + offset < 8 and squares[i + offset].color != on_move:
-                    moves.append(Move(i, i + offset, moving_piece, capture=squares[i + offset].piecetype))
-
-                # move left
-                offset = -1
-                while f + offset >= 0 and squares[i + offset] is None:
-                    moves.append(Move(i, i + offset, moving_piece))
-                    offset -= 1
-                if f + offset >= 0 and squares[i + offset].color != on_move:
-                    moves.append(Move(i, i + offset, moving_piece, capture=squares[i + offset].piecetype))
-
-                # move up
-                offset = 1
-                while r + offset < 8 and squares[i + 8 * offset] is None:
-                    moves.append(Move(i, i + 8 * offset, moving_piece))
-                    offset += 1
-                if r + offset < 8 and squares[i + 8 * offset].color != on_move:
-                    moves.append(Move(i, i + 8 * offset, moving_piece, capture=squares[i + 8 * offset].piecetype))
-
-                # move down
-                offset = -1
-                while r + offset >= 0 and squares[i + 8 * offset] is None:
-                    moves.append(Move(i, i + 8 * offset, moving_piece))
-                    offset -= 1
-                if r + offset >= 0 and squares[i + 8 * offset].color != on_move:
-                    moves.append(Move(i, i + 8 * offset, moving_piece, capture=squares[i + 8 * offset].piecetype))
-
-            # Bishop moves or bishop-like queen moves
-            if moving_piece.piecetype in bishoplike:
-                # move upright
-                offset = 1
-                while f + offset < 8 and r + offset < 8 and squares[i + 9 * offset] is None:
-                    moves.append(Move(i, i + 9 * offset, moving_piece))
-                    offset += 1
-                if f + offset < 8 and r + offset < 8 and squares[i + 9 * offset].color != on_move:
-                    moves.append(Move(i, i + 9 * offset, moving_piece, capture=squares[i + 9 * offset].piecetype))
-
-                # move upleft
-                offset = 1
-                while f - offset >= 0 and r + offset < 8 and squares[i + 7 * offset] is None:
-                    moves.append(Move(i, i + 7 * offset, moving_piece))
-                    offset += 1
-                if f - offset >= 0 and r + offset < 8 and squares[i + 7 * offset].color != on_move:
-                    moves.append(Move(i, i + 7 * offset, moving_piece, capture=squares[i + 7 * offset].piecetype))
-
-                # move downright
-                offset = 1
-                while f + offset < 8 and r - offset >= 0 and squares[i - 7 * offset] is None:
-                    moves.append(Move(i, i - 7 * offset, moving_piece))
-                    offset += 1
-                if f + offset < 8 and r - offset >= 0 and squares[i - 7 * offset].color != on_move:
-                    moves.append(Move(i, i - 7 * offset, moving_piece, capture=squares[i - 7 * offset].piecetype))
-
-                # move downleft
-                offset = 1
-                while f - offset >= 0 and r - offset >= 0 and squares[i - 9 * offset] is None:
-                    moves.append(Move(i, i - 9 * offset, moving_piece))
-                    offset += 1
-                if f - offset >= 0 and r - offset >= 0 and squares[i - 9 * offset].color != on_move:
-                    moves.append(Move(i, i - 9 * offset, moving_piece, capture=squares[i - 9 * offset].piecetype))
+            if piecetype == pawn:
+                promotes = i // 8 == promotion_rank
+
+                # move forward (and 2 if allowed)
+                pushes = pawn_pushes[i]
+                if pushes and squares[pushes[0]] is None:
+                    if promotes:
+                        if captures:
+                            for prom in PROMOTIONS:
+                                moves.append(base | (pushes[0] << 6) | prom)
+                    elif quiets:
+                        moves.append(base | (pushes[0] << 6))
+                        if len(pushes) > 1 and squares[pushes[1]] is None:
+                            moves.append(base | (pushes[1] << 6) | DOUBLE_PUSH)
+
+                # captures (and en passant)
+                if captures:
+                    for t in pawn_captures[i]:
+                        target = squares[t]
+                        if target is not None:
+                            if target.color != on_move:
+                                mv = base | (t << 6) | CAPTURE_CODE[target.piecetype]
+                                if promotes:
+                                    for prom in PROMOTIONS:
+                                        moves.append(mv | prom)
+                                else:
+                                    moves.append(mv)
+                        elif t == en_passant_square:
+                            moves.append(base | (t << 6) | CAPTURE_CODE['pP'[clr]] | EN_PASSANT)
+
+            # Knight moves
+            elif piecetype == knight:
+                for t in KNIGHT_TARGETS[i]:
+                    target = squares[t]
+                    if target is None:
+                        if quiets:
+                            moves.append(base | (t << 6))
+                    elif captures and target.color != on_move:
+                        moves.append(base | (t << 6) | CAPTURE_CODE[target.piecetype])
 
             # King moves
-            if moving_piece.piecetype == king:
+            elif piecetype == king:
                 # -- not castling moves first --
-                offsets = {7, 8, 9, -1, 1, -9, -8, -7}
-                if r == 0:
-                    offsets -= {-9, -8, -7}
-                elif r == 7:
-                    offsets -= {7, 8, 9}
-
-                if f == 0:
-                    offsets -= {7, -1, -9}
-                elif f == 7:
-                    offsets -= {9, 1, -7}
-
-                for offset in offsets:
-                    if squares[i + offset] is not None:
-                        if squares[i + offset].color != on_move:
-                            moves.append(Move(i, i + offset, moving_piece, capture=squares[i + offset].piecetype))
-                    else:
-                        moves.append(Move(i, i + offset, moving_piece))
+                for t in KING_TARGETS[i]:
+                    target = squares[t]
+                    if target is None:
+                        if quiets:
+                            moves.append(base | (t << 6))
+                    elif captures and target.color != on_move:
+                        moves.append(base | (t << 6) | CAPTURE_CODE[target.piecetype])
 
                 # -- Castling moves --
-                if self.castling_rights[2 * clr] and squares[7 * 8 * clr + 5] is None and squares[
+                if quiets and self.castling_rights[2 * clr] and squares[7 * 8 * clr + 5] is None and squares[
                     7 * 8 * clr + 6] is None:
-                    moves.append(Move(7 * 8 * clr + 4, 7 * 8 * clr + 6, moving_piece, is_castle=True))
+                    moves.append(base | ((7 * 8 * clr + 6) << 6) | CASTLE)
 
-                if self.castling_rights[2 * clr + 1] and all(
+                if quiets and self.castling_rights[2 * clr + 1] and all(
                         squares[7 * 8 * clr + x] is None for x in [1, 2, 3]):
-                    moves.append(Move(7 * 8 * clr + 4, 7 * 8 * clr + 2, moving_piece, is_castle=True))
+                    moves.append(base | ((7 * 8 * clr + 2) << 6) | CASTLE)
 
-            # Knight moves
-            if moving_piece.piecetype == knight:
-                offsets = {6, 15, 17, 10, -6, -15, -17, -10}
-                if r == 0:
-                    offsets -= {-6, -15, -17, -10}
-                elif r == 1:
-                    offsets -= {-15, -17}
-                elif r == 7:
-                    offsets -= {6, 15, 17, 10}
-                elif r == 6:
-                    offsets -= {15, 17}
-
-                if f == 0:
-                    offsets -= {-17, -10, 6, 15}
-                elif f == 1:
-                    offsets -= {-10, 6}
-                elif f == 7:
-                    offsets -= {17, 10, -6, -15}
-                elif f == 6:
-                    offsets -= {10, -6}
-
-                for offset in offsets:
-                    if squares[i + offset] is not None:
-                        if squares[i + offset].color != on_move:
-                            moves.append(Move(i, i + offset, moving_piece, capture=squares[i + offset].piecetype))
-                    else:
-                        moves.append(Move(i, i + offset, moving_piece))
+            # Rook, bishop and queen moves (along each ray up to and including the first piece)
+            else:
+                for ray in slider_rays[piecetype][i]:
+                    for t in ray:
+                        target = squares[t]
+                        if target is None:
+                            if quiets:
+                                moves.append(base | (t << 6))
+                        else:
+                            if captures and target.color != on_move:
+                                moves.append(base | (t << 6) | CAPTURE_CODE[target.piecetype])
+                            break
 
         return moves
 
-    def do_pseudolegal_move(self, mv):
-        move_list = self.pseudolegal_moves
-        assert mv in move_list  # This check is handled by do_move()
+    def is_pseudolegal(self, mv):
+        # Whether mv (e.g. a hash or killer move from another position) is a pseudolegal move in this position
+        piece = self.square_list[mv & 63]
+        if piece is None or piece.color != self.side_to_move:
+            return False
+        return mv in self.generate_pseudolegal_moves(pieces=(piece,))
 
+    def do_pseudolegal_move(self, mv):
         # Do move
         squares = self.square_list
-
-        frm_piece = squares[mv.frm]
-        squares[mv.frm] = None
-        if mv.capture is not None:
-            if not mv.is_enpassant:
-                captured_piece = squares[mv.to]
+        frm = mv & 63
+        to = (mv >> 6) & 63
+
+        frm_piece = squares[frm]
+        squares[frm] = None
+        key = self.zobrist_key ^ ZOBRIST_PIECES[frm_piece.piecetype][frm] ^ ZOBRIST_PIECES[frm_piece.piecetype][to]
+        psqt = self.psqt - PSQT[frm_piece.piecetype][frm] + PSQT[frm_piece.piecetype][to]
+        if mv & CAPTURE:
+            if not mv & EN_PASSANT:
+                captured_piece = squares[to]
             else:
-                captured_piece = squares[mv.to - 8 * (-1) ** self.side_to_move]
-                squares[mv.to - 8 * (-1) ** self.side_to_move] = None
-            self.piece_count[captured_piece.piecetype] -= 1
-            self.piece_list.remove(captured_piece)
+                captured_piece = squares[to - 8 * (-1) ** self.side_to_move]
+                squares[to - 8 * (-1) ** self.side_to_move] = None
+            key ^= ZOBRIST_PIECES[captured_piece.piecetype][captured_piece.position]
+            psqt -= PSQT[captured_piece.piecetype][captured_piece.position]
+            self.phase -= PHASE_WEIGHTS[captured_piece.piecetype]
+            self.remove_piece(captured_piece)
         else:
             captured_piece = None
-        squares[mv.to] = frm_piece
+        squares[to] = frm_piece
         try:
-            frm_piece.move(mv.to)
+            frm_piece.move(to)
         except AttributeError:
             print(self.get_fen())
             exit()
 
         # Move rook if it was a castling move
-        if mv.is_castle:
-            if mv.to - mv.frm == 2:  # short castle
-                rook = squares[mv.to + 1]
-                squares[mv.to + 1] = None
-                squares[mv.to - 1] = rook
-                rook.move(mv.to - 1)
-            elif mv.to - mv.frm == -2:  # long castle
-                rook = squares[mv.to - 2]
-                squares[mv.to - 2] = None
-                squares[mv.to + 1] = rook
-                rook.move(mv.to + 1)
-
-        # Handle promotion
-        if mv.promotion is not None:
-            promotedPiece = Piece(mv.promotion, mv.to)
-            squares[mv.to] = promotedPiece
-            self.piece_count[frm_piece.piecetype] -= 1
-            self.piece_count[promotedPiece.piecetype] += 1
-            self.piece_list.remove(frm_piece)
-            self.piece_list.append(promotedPiece)
-
+        if mv & CASTLE:
+            if to - frm == 2:  # short castle
+                rook = squares[to + 1]
+                squares[to + 1] = None
+                squares[to - 1] = rook
+                rook.move(to - 1)
+                key ^= ZOBRIST_PIECES[rook.piecetype][to + 1] ^ ZOBRIST_PIECES[rook.piecetype][to - 1]
+                psqt += PSQT[rook.piecetype][to - 1] - PSQT[rook.piecetype][to + 1]
+            elif to - frm == -2:  # long castle
+                rook = squares[to - 2]
+                squares[to - 2] = None
+                squares[to + 1] = rook
+                rook.move(to + 1)
+                key ^= ZOBRIST_PIECES[rook.piecetype][to - 2] ^ ZOBRIST_PIECES[rook.piecetype][to + 1]
+                psqt += PSQT[rook.piecetype][to + 1] - PSQT[rook.piecetype][to - 2]
+
+        # Handle promotion (the pawn object itself becomes the new piece)
+        if mv & PROMOTION_MASK:
+            promoted = self.PIECES[((mv >> 12) & 7) + 6 * self.side_to_move]
+            key ^= ZOBRIST_PIECES[frm_piece.piecetype][to] ^ ZOBRIST_PIECES[promoted][to]
+            psqt += PSQT[promoted][to] - PSQT[frm_piece.piecetype][to]
+            self.phase += PHASE_WEIGHTS[promoted]
+            self.remove_piece(frm_piece)
+            frm_piece.piecetype = promoted
+            self.add_piece(frm_piece)
+
+        self.zobrist_key = key
+        self.psqt = psqt
         return frm_piece, captured_piece
 
-    def undo_pseudolegal_move(self, mv):
+    def undo_pseudolegal_move(self, mv, captured_piece=None):
+        # captured_piece -- Piece returned by do_pseudolegal_move, put back on the board (a new one is made if None)
+        key = self.zobrist_key
+        psqt = self.psqt
+        frm = mv & 63
+        to = (mv >> 6) & 63
+
         # Unpromote
-        if mv.promotion is not None:
-            promotedPiece = self.square_list[mv.to]
-            self.piece_count[promotedPiece.piecetype] -= 1
-            self.piece_list.remove(promotedPiece)
-            oldPawn = Piece('Pp'[self.side_to_move], mv.to)
-            self.square_list[mv.to] = oldPawn
-            self.piece_count[oldPawn.piecetype] += 1
-            self.piece_list.append(oldPawn)
+        if mv & PROMOTION_MASK:
+            promoted_piece = self.square_list[to]
+            pawn = 'Pp'[self.side_to_move]
+            key ^= ZOBRIST_PIECES[promoted_piece.piecetype][to] ^ ZOBRIST_PIECES[pawn][to]
+            psqt += PSQT[pawn][to] - PSQT[promoted_piece.piecetype][to]
+            self.phase -= PHASE_WEIGHTS[promoted_piece.piecetype]
+            self.remove_piece(promoted_piece)
+            promoted_piece.piecetype = pawn
+            self.add_piece(promoted_piece)
 
         # Unmove castling rook
-        if mv.is_castle:
-            if mv.to - mv.frm == 2:  # short castle
-                rook = self.square_list[mv.to - 1]
-                self.square_list[mv.to - 1] = None
-                self.square_list[mv.to + 1] = rook
-                rook.move(mv.to + 1)
-            elif mv.to - mv.frm == -2:  # long castle
-                rook = self.square_list[mv.to + 1]
-                self.square_list[mv.to + 1] = None
-                self.square_list[mv.to - 2] = rook
-                rook.move(mv.to - 2)
-
-        to_piece = self.square_list[mv.to]
-        self.square_list[mv.to] = None
-        self.square_list[mv.frm] = to_piece
-        to_piece.move(mv.frm)
-
-        if mv.capture is not None:
-            if not mv.is_enpassant:
-                restored_piece = Piece(mv.capture, mv.to)
-                self.square_list[mv.to] = restored_piece
-            else:
-                restored_piece = Piece('pP'[self.side_to_move], mv.to - 8 * (-1) ** self.side_to_move)
-                self.square_list[mv.to - 8 * (-1) ** self.side_to_move] = restored_piece
-            self.piece_count[restored_piece.piecetype] += 1
-            self.piece_list.append(restored_piece)
+        if mv & CASTLE:
+            if to - frm == 2:  # short castle
+                rook = self.square_list[to - 1]
+                self.square_list[to - 1] = None
+                self.square_list[to + 1] = rook
+                rook.move(to + 1)
+                key ^= ZOBRIST_PIECES[rook.piecetype][to + 1] ^ ZOBRIST_PIECES[rook.piecetype][to - 1]
+                psqt += PSQT[rook.piecetype][to + 1] - PSQT[rook.piecetype][to - 1]
+            elif to - frm == -2:  # long castle
+                rook = self.square_list[to + 1]
+                self.square_list[to + 1] = None
+                self.square_list[to - 2] = rook
+                rook.move(to - 2)
+                key ^= ZOBRIST_PIECES[rook.piecetype][to - 2] ^ ZOBRIST_PIECES[rook.piecetype][to + 1]
+                psqt += PSQT[rook.piecetype][to - 2] - PSQT[rook.piecetype][to + 1]
+
+        to_piece = self.square_list[to]
+        self.square_list[to] = None
+        self.square_list[frm] = to_piece
+        to_piece.move(frm)
+        key ^= ZOBRIST_PIECES[to_piece.piecetype][to] ^ ZOBRIST_PIECES[to_piece.piecetype][frm]
+        psqt += PSQT[to_piece.piecetype][frm] - PSQT[to_piece.piecetype][to]
+
+        if mv & CAPTURE:
+            restored_piece = captured_piece
+            if restored_piece is None:
+                if not mv & EN_PASSANT:
+                    restored_piece = Piece(self.PIECES[((mv >> CAPTURED_SHIFT) & 7) + 6 * (not self.side_to_move)], to)
+                else:
+                    restored_piece = Piece('pP'[self.side_to_move], to - 8 * (-1) ** self.side_to_move)
+            self.square_list[restored_piece.position] = restored_piece
+            self.add_piece(restored_piece)
+            key ^= ZOBRIST_PIECES[restored_piece.piecetype][restored_piece.position]
+            psqt += PSQT[restored_piece.piecetype][restored_piece.position]
+            self.phase += PHASE_WEIGHTS[restored_piece.piecetype]
+
+        self.zobrist_key = key
+        self.psqt = psqt
+
+    def generate_legal_moves(self, captures=True, quiets=True, moves=None, checks_pins=None):
+        """ Legal moves for the side to move, without making any of them.
+
+        Pinned pieces may only move along the pin line, and when in check non-king moves have to capture the checker
+        or block the check (double check leaves king moves only). King moves are checked against attacks with the
+        king lifted off the board, so it can not step back along the line of a checking slider.
+
+        Parameters:
+        captures, quiets -- Which moves to generate (see generate_pseudolegal_moves)
+        moves -- Pseudolegal moves to filter instead of generating them
+        checks_pins -- Result of checks_and_pins for the side to move, when already known
+        """
+        if moves is None:
+            moves = self.generate_pseudolegal_moves(captures, quiets)
+        color = self.side_to_move
+        king = self.kings[color]
+        if king is None:
+            return moves
+
+        squares = self.square_list
+        them = not color
+        ks = king.position
+        checkers, pins = checks_pins or self.checks_and_pins(color)
+        evasion = checkers[0] if len(checkers) == 1 else None
+
+        legal = []
+        en_passant = []
+        squares[ks] = None
+        for mv in moves:
+            frm = mv & 63
+            to = (mv >> 6) & 63
+            if frm == ks:
+                if mv & CASTLE:
+                    if checkers or self.is_square_attacked((frm + to) // 2, them) or \
+                            self.is_square_attacked(to, them):
+                        continue
+                elif self.is_square_attacked(to, them):
+                    continue
+            elif len(checkers) > 1:
+                continue
+            elif mv & EN_PASSANT:
+                en_passant.append(mv)
+                continue
+            elif (frm in pins and to not in pins[frm]) or (evasion is not None and to not in evasion):
+                continue
+            legal.append(mv)
+        squares[ks] = king
+
+        # En passant removes two pieces from a rank (possibly exposing the king), so test those on the board itself
+        for mv in en_passant:
+            if self._en_passant_is_legal(mv):
+                legal.append(mv)
+
+        return legal
+
+    def _en_passant_is_legal(self, mv):
+        # Play the en passant capture mv on the square list only and look whether the own king is attacked
+        squares = self.square_list
+        color = self.side_to_move
+        frm = mv & 63
+        to = (mv >> 6) & 63
+        cap_sq = to - 8 * (-1) ** color
+        moving_piece = squares[frm]
+        captured_piece = squares[cap_sq]
+        squares[frm] = None
+        squares[cap_sq] = None
+        squares[to] = moving_piece
+        legal = not self.is_square_attacked(self.kings[color].position, not color)
+        squares[to] = None
+        squares[cap_sq] = captured_piece
+        squares[frm] = moving_piece
+        return legal
+
+    def count_legal_moves(self):
+        """ Number of legal moves for the side to move
+
+        Same filter as generate_legal_moves, but the legal moves are only counted, not collected. Moves of unpinned
+        pieces other than the king need no test at all when the side to move is not in check.
+        """
+        moves = self.generate_pseudolegal_moves()
+        color = self.side_to_move
+        king = self.kings[color]
+        if king is None:
+            return len(moves)
+
+        squares = self.square_list
+        them = not color
+        ks = king.position
+        checkers, pins = self.checks_and_pins(color)
+        evasion = checkers[0] if len(checkers) == 1 else None
+
+        count = 0
+        en_passant = []
+        squares[ks] = None
+        for mv in moves:
+            frm = mv & 63
+            if frm == ks:
+                to = (mv >> 6) & 63
+                if mv & CASTLE:
+                    if checkers or self.is_square_attacked((frm + to) // 2, them) or \
+                            self.is_square_attacked(to, them):
+                        continue
+                elif self.is_square_attacked(to, them):
+                    continue
+            elif mv & EN_PASSANT:
+                en_passant.append(mv)
+                continue
+            elif checkers or frm in pins:
+                to = (mv >> 6) & 63
+                if len(checkers) > 1 or (frm in pins and to not in pins[frm]) or \
+                        (evasion is not None and to not in evasion):
+                    continue
+            count += 1
+        squares[ks] = king
+
+        for mv in en_passant:
+            if self._en_passant_is_legal(mv):
+                count += 1
+
+        return count
+
+    def checks_and_pins(self, color):
+        """ Checking pieces and pinned pieces for the king of color
+
+        Returns:
+        checkers -- List with per checking piece the set of squares that stops its check (its square and, for
+                    sliders, the squares in between)
+        pins -- Dict of square of pinned piece: set of squares it can still move to (pin line including the pinner)
+        """
+        squares = self.square_list
+        ks = self.kings[color].position
+        clr = int(color)
+        checkers = []
+        pins = {}
+
+        for rays, sliders in ((ROOK_RAYS[ks], 'Rr'[1 - clr] + 'Qq'[1 - clr]),
+                              (BISHOP_RAYS[ks], 'Bb'[1 - clr] + 'Qq'[1 - clr])):
+            for ray in rays:
+                own = None
+                for i, sq in enumerate(ray):
+                    piece = squares[sq]
+                    if piece is None:
+                        continue
+                    if piece.color == color:
+                        if own is not None:
+                            break
+                        own = sq
+                        continue
+                    if piece.piecetype in sliders:
+                        if own is None:
+                            checkers.append(set(ray[:i + 1]))
+                        else:
+                            pins[own] = set(ray[:i + 1])
+                    break
+
+        knight = 'nN'[clr]
+        for sq in KNIGHT_TARGETS[ks]:
+            if squares[sq] is not None and squares[sq].piecetype == knight:
+                checkers.append({sq})
+
+        pawn = 'pP'[clr]
+        for sq in PAWN_CAPTURES[clr][ks]:
+            if squares[sq] is not None and squares[sq].piecetype == pawn:
+                checkers.append({sq})
+
+        return checkers, pins
 
     def do_move(self, mv, update_movelist=True):
         # if update_movelist = False, then next_move_list is returned instead of updated.
 
+        mv = int(mv)  # Move views are accepted as well
         move_list = self.pseudolegal_moves
 
         # First check if even pseudolegal
         if mv not in move_list:
             return False
 
-        # Then do move
-        moved_piece, captured_piece = self.do_pseudolegal_move(mv)
-
-        # already flip side to move
-        self.side_to_move = not self.side_to_move
+        # Can not castle from check or through check (castling into check is handled as any other move)
+        frm = mv & 63
+        if mv & CASTLE and (self.is_square_attacked(frm, not self.side_to_move) or
+                            self.is_square_attacked((frm + ((mv >> 6) & 63)) // 2, not self.side_to_move)):
+            return False
 
-        # already set en passant square (save old in case of undo move)
-        old_enpassant = self.en_passant_square
-        if moved_piece.piecetype == 'P' and mv.to - mv.frm == 16:
-            self.en_passant_square = mv.to - 8
-        elif moved_piece.piecetype == 'p' and mv.to - mv.frm == -16:
-            self.en_passant_square = mv.to + 8
-        else:
-            self.en_passant_square = None
+        # Own king may not be attacked after the move
+        captured_piece = self.do_pseudolegal_move(mv)[1]
+        illegal = self.king_in_check(self.side_to_move)
+        self.undo_pseudolegal_move(mv, captured_piece)
+        if illegal:
+            return False
 
-        # Rook capture can change castling rights and hence affect next pseudolegals (therefore update before)
-        # Remove castling rights after capture
-        old_castling = self.castling_rights
-        if any(self.castling_rights):  # avoid unnecessary checking
-            # After capture
-            if mv.capture and captured_piece.is_type('Rr'):
-                for right, square in enumerate([7, 0, 63, 56]):
-                    if mv.to == square:
-                        self.castling_rights[right] = False
+        self.make_move(mv)
 
-        # --- all updates that could affect next moves taken into account now ---
-        # Generate new move list (with correct side to move and en-passant square)
+        # Generate new move list (with correct side to move, en-passant square and castling rights)
         next_move_list = self.generate_pseudolegal_moves()
 
-        rollback = False
-        if mv.is_castle:
-
-            # Can not castle through check (1st cond) or from check (2nd cond) [this check for non-pawn pieces only!]
-            for nxt_mv in next_move_list:
-                if nxt_mv.moving_piece_FEN in 'Pp':
-                    continue
+        if update_movelist:
+            self.pseudolegal_moves = next_move_list
+            return True
+        else:
+            return next_move_list
 
-                if nxt_mv.to == mv.frm + (mv.to - mv.frm) / 2 or nxt_mv.to == mv.frm:
-                    rollback = True
-                    break
+    def make_move(self, mv):
+        # Makes a move that is known to be legal (e.g. from generate_legal_moves) and updates all board attributes
+        # except the move list.
+        old_state_key = self.state_key()
+        old_key = self.zobrist_key
+        old_enpassant = self.en_passant_square
+        old_castling = self.castling_rights[:]
+        old_half_move_count = self.half_move_count
 
-            if self.side_to_move:  # Black to move
-                for j in range(1 * 8, 2 * 8):
-                    c1 = self.square_list[j] is not None and self.square_list[j].piecetype == 'p'  # Pawn on square j
-                    c2 = j != 15 and (j-7 == mv.frm + (mv.to - mv.frm) / 2 or j-7 == mv.frm)       # With right capture
-                    c3 = j !=  8 and (j-9 == mv.frm + (mv.to - mv.frm) / 2 or j-9 == mv.frm)       # With left  capture
-                    if c1 and (c2 or c3):
-                        rollback = True
-                        break
-            else:  # White to move
-                for j in range(6 * 8, 7 * 8):
-                    c1 = self.square_list[j] is not None and self.square_list[j].piecetype == 'P'  # Pawn on square j
-                    c2 = j != 55 and (j+9 == mv.frm + (mv.to - mv.frm) / 2 or j+9 == mv.frm)       # With right capture
-                    c3 = j != 48 and (j+7 == mv.frm + (mv.to - mv.frm) / 2 or j+7 == mv.frm)       # With left  capture
-                    if c1 and (c2 or c3):
-                        rollback = True
-                        break
-
-        if any(nxt_mv.capture == 'kK'[self.side_to_move] for nxt_mv in next_move_list):
-            rollback = True
-
-        if rollback:
-            # undo side_to_move, en_passant, castling rights and pseudo_legal move. Delete pseudolegal move.
-            self.side_to_move = not self.side_to_move
-            self.en_passant_square = old_enpassant
-            self.castling_rights = old_castling
-            self.undo_pseudolegal_move(mv)
-
-            # TODO: REMOVE THIS LIST MODIFICATION. Has large impact on PERFT!
-            move_list.remove(mv)
+        moved_piece, captured_piece = self.do_pseudolegal_move(mv)
+        frm = mv & 63
+        to = (mv >> 6) & 63
 
-            return False
+        self.side_to_move = not self.side_to_move
 
-        # --- Setting the remaining board attributes after legal move!
+        if mv & DOUBLE_PUSH:
+            self.en_passant_square = (frm + to) // 2
+        else:
+            self.en_passant_square = None
 
-        # Remove castling rights after piece has moved
         if any(self.castling_rights):  # avoid unnecessary checking
+            # After rook capture
+            if mv & CAPTURE and captured_piece.is_type('Rr'):
+                for right, square in enumerate([7, 0, 63, 56]):
+                    if to == square:
+                        self.castling_rights[right] = False
+
             # After king move
             if moved_piece.piecetype == 'K':
                 self.castling_rights[0] = False
@@ -539,14 +1214,14 @@ class BoardRep:
 
             # After rook move
             if moved_piece.piecetype == 'R':
-                if mv.frm == 7:
+                if frm == 7:
                     self.castling_rights[0] = False
-                elif mv.frm == 0:
+                elif frm == 0:
                     self.castling_rights[1] = False
             if moved_piece.piecetype == 'r':
-                if mv.frm == 63:
+                if frm == 63:
                     self.castling_rights[2] = False
-                elif mv.frm == 56:
+                elif frm == 56:
                     self.castling_rights[3] = False
 
         # full move count
@@ -554,48 +1229,46 @@ class BoardRep:
             self.full_move_count += 1
 
         # half move count
-        if mv.capture is not None or moved_piece.piecetype in 'Pp' or mv.is_castle:
+        if mv & (CAPTURE | CASTLE) or moved_piece.piecetype in 'Pp':
             self.half_move_count = 0
         else:
             self.half_move_count += 1
 
-        self.move_sequence.append(mv)
-        self.fen_sequence.append(self.get_fen())
+        self.zobrist_key ^= old_state_key ^ self.state_key()
 
-        if update_movelist:
-            self.pseudolegal_moves = next_move_list
-            return True
-        else:
-            return next_move_list
+        self.move_sequence.append(mv)
+        self.undo_stack.append(UndoState(captured_piece, old_castling, old_enpassant, old_half_move_count, old_key,
+                                         self.in_check))
+        self.in_check = self.king_in_check(self.side_to_move)
 
     def undo_move(self, regenerate_movelist=True):
-        try:
-            del_move = self.move_sequence.pop()
-            self.fen_sequence.pop()
-            last_fen = self.fen_sequence[-1]
-        except IndexError:
+        if not self.move_sequence:
             return
+        self.unmake_move()
 
-        lines = last_fen.split()
+        # regenerate pseudo_legal moves
+        if regenerate_movelist:
+            self.pseudolegal_moves = self.generate_pseudolegal_moves()
 
-        # restore castling rights and en_passant square
-        for i, opt in enumerate('KQkq'):
-            self.castling_rights[i] = opt in lines[2]
-        self.en_passant_square = self.SQUARE_TO_NUM[lines[3]]
+    def unmake_move(self):
+        # Takes back the last move (counterpart of make_move, the move list is not touched)
+        del_move = self.move_sequence.pop()
+        state = self.undo_stack.pop()
 
-        # restore move counts
-        self.half_move_count = int(lines[4])
-        self.full_move_count = int(lines[5])
+        # restore castling rights, en_passant square and half move count
+        self.castling_rights = state.castling_rights
+        self.en_passant_square = state.en_passant_square
+        self.half_move_count = state.half_move_count
+        self.in_check = state.in_check
 
         # flip side to move back
         self.side_to_move = not self.side_to_move
+        if self.side_to_move:
+            self.full_move_count -= 1
 
         # undo_pseudolegal_move
-        self.undo_pseudolegal_move(del_move)
-
-        # regenerate pseudo_legal moves
-        if regenerate_movelist:
-            self.pseudolegal_moves = self.generate_pseudolegal_moves()
+        self.undo_pseudolegal_move(del_move, state.captured_piece)
+        self.zobrist_key = state.zobrist_key
 
     def is_legal(self, mv):
         res = self.do_move(mv)
@@ -604,33 +1277,32 @@ class BoardRep:
         return res
 
     def test_random_move(self, special_moves_first=True):
-        move_list = self.pseudolegal_moves
+        # Makes a random legal move. Returns False if there is none (checkmate or stalemate).
+        move_list = self.generate_legal_moves()
 
         if len(move_list) == 0:
-            return
+            return False
 
         special_moves = []
         if special_moves_first:
-            special_moves = [move for move in move_list if
-                             move.is_castle or move.capture is not None or move.promotion is not None]
+            special_moves = [move for move in move_list if move & (CASTLE | CAPTURE | PROMOTION_MASK)]
 
         if len(special_moves) > 0:
-            mv = random.sample(special_moves, 1)[0]
+            mv = random.choice(special_moves)
         else:
-            mv = random.sample(move_list, 1)[0]
+            mv = random.choice(move_list)
 
-        try:
-            self.do_move(mv)
-        except IllegalMoveError:
-            self.test_random_move()
+        self.make_move(mv)
+        self.pseudolegal_moves = self.generate_pseudolegal_moves()
+        return True
 
     def ask_for_move(self):
-        move_list = self.pseudolegal_moves
+        move_list = self.generate_legal_moves()
 
         if len(move_list) == 0:
             return
 
-        move_list.sort()
+        move_list = sorted(Move.from_code(mv) for mv in move_list)
         printable_moves = []
         for i, mv in enumerate(move_list):
             printable_moves.append('{:2d}. {}\t'.format(i + 1, mv))
@@ -654,51 +1326,49 @@ class BoardRep:
                     raise (KeyboardInterrupt('User aborted'))
                 print('Invalid input!')
 
-        try:
-            self.do_move(proposed_move)
-        except IllegalMoveError:
-            print("Move {} turned out not to be legal!".format(proposed_move))
-            self.ask_for_move()
+        self.make_move(proposed_move.code)
+        self.pseudolegal_moves = self.generate_pseudolegal_moves()
 
         print(proposed_move)
 
     def generate_random_game(self):
-        while len(self.pseudolegal_moves) > 0 and self.half_move_count <= 100:
-            self.test_random_move()
+        while self.half_move_count <= 100 and self.test_random_move():
+            pass
 
-    def perft(self, n, split=False):
+    def perft(self, n, split=False, hash_size=None, table=None, bulk=True):
+        # hash_size -- Number of PerftTable entries to cache subtree counts of transpositions (None = no cache)
+        # bulk -- Count the legal moves at depth 1 instead of making each of them
         if n == 0:
             if split:
                 return 1, {}
             else:
                 return 1
+        if bulk and n == 1 and not split:
+            return self.count_legal_moves()
+
+        if table is None and hash_size:
+            table = PerftTable(hash_size)
+        if table is not None and not split:
+            cached = table.probe(self.zobrist_key, n)
+            if cached is not None:
+                return cached
 
         nodes = 0
-        i = 0
 
         if split:
             split_dict = {}
 
-        while i < len(self.pseudolegal_moves):
-            move = self.pseudolegal_moves[i]
-            temp = self.do_move(move, update_movelist=False)
-            add = None
-            if temp:
-                old_moves = self.pseudolegal_moves
-                self.pseudolegal_moves = temp
-                add = self.perft(n - 1)
-                nodes += add
-                self.undo_move(regenerate_movelist=False)
-                self.pseudolegal_moves = old_moves
-                i += 1
-
-            # No need to increase i if the move was not legal, since it is then removed from the list
-            if split and add is not None:
-                k = str(move)
-                k2 = k[0:2] + k[3:5]
-                if len(k) > 5:
-                    k2 = k2 + k[-1].lower()
-                split_dict[k2] = add
+        for move in self.generate_legal_moves():
+            self.make_move(move)
+            add = self.perft(n - 1, table=table, bulk=bulk)
+            self.unmake_move()
+            nodes += add
+
+            if split:
+                split_dict[move_to_uci(move)] = add
+
+        if table is not None:
+            table.store(self.zobrist_key, n, nodes)
 
         if split:
             return nodes, split_dict
@@ -706,35 +1376,86 @@ class BoardRep:
             return nodes
 
 
+class PerftTable:
+    def __init__(self, size):
+        """ Fixed-size cache of perft subtree counts keyed by (Zobrist key, depth)
+
+        The table consists of buckets of two entries: the first entry is only replaced by a result of at least the
+        same depth (large subtrees stay cached), the second entry is always replaced.
+
+        Parameters:
+        size -- Total number of entries (rounded down to an even number)
+        """
+        self.buckets = max(1, size // 2)
+        self.keys = [None] * (2 * self.buckets)
+        self.depths = [0] * (2 * self.buckets)
+        self.counts = [0] * (2 * self.buckets)
+        self.hits = 0
+        self.probes = 0
+
+    def probe(self, key, depth):
+        self.probes += 1
+        i = 2 * (key % self.buckets)
+        for j in (i, i + 1):
+            if self.keys[j] == key and self.depths[j] == depth:
+                self.hits += 1
+                return self.counts[j]
+        return None
+
+    def store(self, key, depth, count):
+        i = 2 * (key % self.buckets)
+        if self.keys[i] is not None and self.depths[i] > depth:
+            i += 1
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.counts[i] = count
+
+
+class UndoState:
+    # Irreversible part of the position before a move, as needed by BoardRep.undo_move
+    __slots__ = ('captured_piece', 'castling_rights', 'en_passant_square', 'half_move_count', 'zobrist_key',
+                 'in_check')
+
+    def __init__(self, captured_piece, castling_rights, en_passant_square, half_move_count, zobrist_key, in_check):
+        self.captured_piece = captured_piece
+        self.castling_rights = castling_rights
+        self.en_passant_square = en_passant_square
+        self.half_move_count = half_move_count
+        self.zobrist_key = zobrist_key
+        self.in_check = in_check
+
+
 class Piece:
     PIECE_TO_NAME = {'P': 'Pawn', 'N': 'Knight', 'B': 'Bishop', 'R': 'Rook', 'Q': 'Queen', 'K': 'King'}
     COLOR_TO_NAME = {False: 'White', True: 'Black'}
+    __slots__ = ('piecetype', 'color', 'position', 'index')
 
     def __init__(self, piecetype, position):
         """"
-        piecetype:  Type of the piece (by FEN letter)
+        piecetype:  Type of the piece (by FEN letter, changes when a pawn promotes)
         color:      Boolean (False = white, True = Black)
         position:   The square it occupies 0-63
-        mobility:   The number of moves the piece has (including captures)
-        attack:     Lowest valued attacker (by FEN letter)
-        defend:     Lowest valued defender (by FEN letter)
+        index:      Position in BoardRep.pieces[piecetype]
         """
         self.piecetype = piecetype
         self.color = piecetype.islower()
-        self.piecename = self.PIECE_TO_NAME[piecetype.upper()]
-        self.colorname = self.COLOR_TO_NAME[self.color]
-
         self.position = position
-        self.mobility = None
-        self.attack = None
-        self.defend = None
+        self.index = None
+
+    @property
+    def piecename(self):
+        return self.PIECE_TO_NAME[self.piecetype.upper()]
+
+    @property
+    def colorname(self):
+        return self.COLOR_TO_NAME[self.color]
 
     def __str__(self):
         return self.colorname + ' ' + self.piecename + ' on ' + BoardRep.NUM_TO_SQUARE[self.position]
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.piecetype == other.piecetype and self.position == other.position
         else:
             return False
 
@@ -746,22 +1467,62 @@ class Piece:
 
 
 class Move:
+    # Decoding view of a packed move (see encode_move), used for display. The board itself only handles the ints.
+    __slots__ = ('code',)
+
     def __init__(self, frm, to, moving_piece, capture=None, promotion=None, is_castle=False, is_enpassant=False):
-        self.frm = frm  # int of square
-        self.to = to  # int of square
-        self.moving_piece = moving_piece  # Piece object that is supposed to move
-        self.moving_piece_FEN = moving_piece.piecetype.upper()  # FEN of moved piece (for notation)
-        self.capture = capture  # FEN letter of captured piece
-        self.promotion = promotion  # FEN letter of promoted piece
-        self.is_castle = is_castle  # Bool
-        self.is_enpassant = is_enpassant  # Bool
+        self.code = encode_move(frm, to, moving_piece.piecetype, capture, promotion, is_castle, is_enpassant)
+
+    @classmethod
+    def from_code(cls, code):
+        mv = cls.__new__(cls)
+        mv.code = code
+        return mv
+
+    @property
+    def frm(self):
+        return self.code & 63  # int of square
+
+    @property
+    def to(self):
+        return (self.code >> 6) & 63  # int of square
+
+    @property
+    def moving_piece_FEN(self):
+        return 'PNBRQK'[(self.code >> PIECE_SHIFT) & 7]  # FEN of moved piece (for notation)
+
+    @property
+    def capture(self):
+        # FEN letter of captured piece
+        if self.code & CAPTURE:
+            return BoardRep.PIECES[((self.code >> CAPTURED_SHIFT) & 7) + 6 * (not self.code & BLACK)]
+
+    @property
+    def promotion(self):
+        # FEN letter of promoted piece
+        if self.code & PROMOTION_MASK:
+            return BoardRep.PIECES[((self.code >> 12) & 7) + 6 * bool(self.code & BLACK)]
+
+    @property
+    def is_castle(self):
+        return bool(self.code & CASTLE)
+
+    @property
+    def is_enpassant(self):
+        return bool(self.code & EN_PASSANT)
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.code == other.code
         else:
             return False
 
+    def __hash__(self):
+        return hash(self.code)
+
+    def __int__(self):
+        return self.code
+
     def fen(self):
         # Prints a best-effort FEN (does not check if multiple pieces of same type can move to target square)
         if self.is_castle:
@@ -0,0 +1,591 @@
+from Board_and_moves import BoardRep, CAPTURE, PROMOTION_MASK, PIECE_SHIFT, CAPTURED_SHIFT, BLACK, move_to_uci
+from array import array
+import threading
+import time
+
+INFINITY = 100000
+MATE = 99000  # Score of being mated at the root, mate in n plies scores MATE - n
+MAX_PLY = 64
+KNOWN_WIN = 20000  # Added to the evaluation of positions that are won according to a bitbase
+
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+
+
+def material(board):
+    # Material balance from the point of view of the side to move
+    score = 0
+    for piecetype, value in PIECE_VALUES.items():
+        score += value * (len(board.pieces[piecetype]) - len(board.pieces[piecetype.lower()]))
+    return -score if board.side_to_move else score
+
+
+class SearchStopped(Exception):
+    # Raised inside the search when a node or time limit is reached
+    pass
+
+
+class SearchResult:
+    def __init__(self, best_move, score, pv, depth, nodes, seconds):
+        """ Outcome of Search.search
+
+        Parameters:
+        best_move -- Packed move (None when there are no legal moves)
+        score -- Centipawns from the point of view of the side to move (mate scores are near +-MATE)
+        pv -- Principal variation, list of packed moves starting with best_move
+        depth -- Last completed iteration
+        nodes -- Nodes searched in all iterations
+        seconds -- Time used
+        """
+        self.best_move = best_move
+        self.score = score
+        self.pv = pv
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0
+
+    def __str__(self):
+        return "depth {} score {} nodes {} time {:.2f} pv {}".format(
+            self.depth, self.score, self.nodes, self.seconds, " ".join(move_to_uci(mv) for mv in self.pv))
+
+
+class TranspositionTable:
+    EXACT = 0
+    LOWER = 1  # Score is at least the stored score (fail high)
+    UPPER = 2  # Score is at most the stored score (fail low)
+
+    BUCKET_SIZE = 4
+    ENTRY_BYTES = 16  # 8 byte key and 8 byte data word
+
+    # Data word: move (bits 0-25), score + SCORE_OFFSET (26-43), depth (44-51), bound (52-53), generation (54-61).
+    # An empty entry has data 0, which a stored entry never has because of the score offset.
+    MOVE_MASK = (1 << 26) - 1
+    SCORE_OFFSET = 1 << 17
+
+    def __init__(self, mb=16):
+        """ Search results keyed by Zobrist key, in two preallocated array('Q') of keys and packed data words
+
+        Entries are grouped in buckets of BUCKET_SIZE. A position replaces its own entry, otherwise the entry of an
+        earlier search (generation) or else the entry with the lowest depth in the bucket.
+
+        Parameters:
+        mb -- Memory budget in megabytes
+        """
+        self.buckets = max(1, (mb << 20) // (self.ENTRY_BYTES * self.BUCKET_SIZE))
+        size = self.buckets * self.BUCKET_SIZE
+        self.keys = array('Q', bytes(8 * size))
+        self.data = array('Q', bytes(8 * size))
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0  # Stores that overwrote an entry of another position
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        size = len(self.keys)
+        self.keys = array('Q', bytes(8 * size))
+        self.data = array('Q', bytes(8 * size))
+        self.generation = 0
+
+    def new_search(self):
+        # Entries of earlier searches are replaced first
+        self.generation = (self.generation + 1) & 255
+
+    def probe(self, key):
+        # (depth, bound, score, move) of the position, or None (move is 0 when there is no best move)
+        self.probes += 1
+        keys = self.keys
+        i = (key % self.buckets) * self.BUCKET_SIZE
+        for j in range(i, i + self.BUCKET_SIZE):
+            if keys[j] == key:
+                data = self.data[j]
+                if data:
+                    self.hits += 1
+                    return ((data >> 44) & 255, (data >> 52) & 3, ((data >> 26) & 0x3FFFF) - self.SCORE_OFFSET,
+                            data & self.MOVE_MASK)
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        keys = self.keys
+        data = self.data
+        i = (key % self.buckets) * self.BUCKET_SIZE
+        victim = i
+        worst = None
+        for j in range(i, i + self.BUCKET_SIZE):
+            old = data[j]
+            if not old:
+                victim = j
+                break
+            if keys[j] == key:
+                if not move:
+                    move = old & self.MOVE_MASK  # Keep the best move of an earlier search of this position
+                victim = j
+                break
+            # Entries of earlier searches first, then the shallowest
+            value = ((old >> 44) & 255) - 8 * ((self.generation - (old >> 54)) & 255)
+            if worst is None or value < worst:
+                worst = value
+                victim = j
+        else:
+            self.collisions += 1
+
+        self.stores += 1
+        keys[victim] = key
+        data[victim] = move | ((score + self.SCORE_OFFSET) << 26) | (min(depth, 255) << 44) | (bound << 52) | \
+            (self.generation << 54)
+
+    def hashfull(self):
+        # Permille of the (first 1000) entries used by the current search
+        sample = min(1000, len(self.data))
+        used = sum(1 for d in self.data[:sample] if d and d >> 54 == self.generation)
+        return 1000 * used // sample
+
+
+class MoveOrdering:
+    # Sort keys: hash move, previous principal variation move, captures and promotions (MVV-LVA), killers, counter
+    # move and then quiet moves by history
+    TT_SCORE = 1 << 30
+    PV_SCORE = 1 << 29
+    CAPTURE_SCORE = 1 << 28
+    KILLER_SCORE = 1 << 27
+    COUNTER_SCORE = 1 << 26
+    HISTORY_MAX = 1 << 25
+
+    def __init__(self):
+        """ Move ordering heuristics with their tables in preallocated arrays
+
+        killers -- Two quiet moves per ply that caused a beta cutoff (most recent first)
+        history -- Per side and (from, to) the sum of depth * depth over the beta cutoffs of a quiet move
+        counter_moves -- Per (from, to) of the previous move the quiet move that refuted it last
+        cutoffs, first_move_cutoffs -- Beta cutoffs, and those by the first move searched (the closer the two, the
+                                       better the ordering and the lower the effective branching factor)
+        """
+        self.killers = array('I', bytes(4 * 2 * (MAX_PLY + 1)))
+        self.history = array('q', bytes(8 * 2 * 4096))
+        self.counter_moves = array('I', bytes(4 * 4096))
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def new_search(self):
+        # Killers and statistics start over, history is kept at half weight
+        for i in range(len(self.killers)):
+            self.killers[i] = 0
+        self.age_history()
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def age_history(self):
+        history = self.history
+        for i in range(len(history)):
+            history[i] >>= 1
+
+    @staticmethod
+    def mvv_lva(mv):
+        # Most valuable victim first, then least valuable attacker (promotions count as capturing the new piece)
+        victim = ((mv >> CAPTURED_SHIFT) & 7) + 1 if mv & CAPTURE else 0
+        return 16 * (victim + ((mv >> 12) & 7)) - ((mv >> PIECE_SHIFT) & 7)
+
+    def order(self, moves, ply, tt_move=None, pv_move=None, previous_move=None):
+        killer1 = self.killers[2 * ply]
+        killer2 = self.killers[2 * ply + 1]
+        counter = self.counter_moves[previous_move & 4095] if previous_move else 0
+        history = self.history
+
+        def key(mv):
+            if mv == tt_move:
+                return self.TT_SCORE
+            if mv == pv_move:
+                return self.PV_SCORE
+            if mv & (CAPTURE | PROMOTION_MASK):
+                return self.CAPTURE_SCORE + self.mvv_lva(mv)
+            if mv == killer1:
+                return self.KILLER_SCORE + 1
+            if mv == killer2:
+                return self.KILLER_SCORE
+            if mv == counter:
+                return self.COUNTER_SCORE
+            return history[(mv & 4095) | ((mv & BLACK) >> 13)]
+
+        return sorted(moves, key=key, reverse=True)
+
+    def staged(self, board, ply, tt_move=None, pv_move=None, previous_move=None):
+        """ Generator of the legal moves of board in the same order as order, but generated in stages
+
+        The hash and principal variation moves are tried before anything is generated, then the captures and
+        promotions are generated, then the killers and counter move are tried and only then the quiet moves are
+        generated. A node that cuts off early never generates its quiet moves. The board has to be back in the same
+        position each time the next move is asked for.
+        """
+        color = board.side_to_move
+        checks_pins = board.checks_and_pins(color) if board.kings[color] is not None else None
+
+        def legal(mv):
+            return board.is_pseudolegal(mv) and bool(board.generate_legal_moves(moves=[mv], checks_pins=checks_pins))
+
+        tried = []
+        for mv in (tt_move, pv_move):
+            if mv and mv not in tried and legal(mv):
+                tried.append(mv)
+                yield mv
+
+        captures = board.generate_legal_moves(quiets=False, checks_pins=checks_pins)
+        for mv in sorted(captures, key=self.mvv_lva, reverse=True):
+            if mv not in tried:
+                yield mv
+
+        counter = self.counter_moves[previous_move & 4095] if previous_move else 0
+        for mv in (self.killers[2 * ply], self.killers[2 * ply + 1], counter):
+            if mv and not mv & (CAPTURE | PROMOTION_MASK) and mv not in tried and legal(mv):
+                tried.append(mv)
+                yield mv
+
+        history = self.history
+        quiets = board.generate_legal_moves(captures=False, checks_pins=checks_pins)
+        for mv in sorted(quiets, key=lambda mv: history[(mv & 4095) | ((mv & BLACK) >> 13)], reverse=True):
+            if mv not in tried:
+                yield mv
+
+    def update(self, mv, index, depth, ply, previous_move=None):
+        # Beta cutoff by mv, the index-th move searched in its node
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if mv & (CAPTURE | PROMOTION_MASK):
+            return
+
+        if self.killers[2 * ply] != mv:
+            self.killers[2 * ply + 1] = self.killers[2 * ply]
+            self.killers[2 * ply] = mv
+        i = (mv & 4095) | ((mv & BLACK) >> 13)
+        self.history[i] += depth * depth
+        if self.history[i] > self.HISTORY_MAX:
+            self.age_history()
+        if previous_move:
+            self.counter_moves[previous_move & 4095] = mv
+
+
+def score_to_tt(score, ply):
+    # Mate scores are stored as distance from the node instead of from the root
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class Search:
+    DEFAULT_DEPTH = 4  # Used when no limit at all is given
+    ASPIRATION_WINDOW = 50  # Half width of the first window around the previous score (0 = always full window)
+    CHECK_EVERY = 1024  # Nodes between time checks
+    SEE_PRUNING = True  # Skip captures that lose material by static exchange evaluation in the quiescence search
+    STAGED_MOVES = True  # Generate the moves of a node in stages (MoveOrdering.staged) instead of all at once
+
+    def __init__(self, board, evaluate=BoardRep.evaluate, hash_mb=16, bitbases=None):
+        """ Negamax alpha-beta search with iterative deepening, principal variation search and aspiration windows
+
+        Parameters:
+        board -- BoardRep to search from (moves are made and unmade on it, it is back in its position afterwards)
+        evaluate -- Function of the board giving a score for the side to move (e.g. material for material only)
+        hash_mb -- Size of the transposition table in MB (0 = no table)
+        bitbases -- bitbase.Bitbases probed for the results of positions with a king and a piece against a king
+        """
+        self.board = board
+        self.evaluate = evaluate
+        self.tt = TranspositionTable(hash_mb) if hash_mb else None
+        self.bitbases = bitbases
+        self.root_in_bitbase = False
+        self.ordering = MoveOrdering()
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.max_nodes = None
+        self.stop_time = None
+        self.soft_stop_time = None
+        self.stopped = False
+        self.next_check = 0
+        self.limits_lock = threading.Lock()  # Guards the time limits and searching against set_time_limits
+        self.searching = False
+        self.pending_limits = None  # (time, seconds, soft_seconds) of set_time_limits before the search started
+        self.pv = [[] for _ in range(MAX_PLY + 1)]
+        self.previous_pv = []
+
+    def search(self, depth=None, nodes=None, seconds=None, info=None, soft_seconds=None):
+        """ Iterative deepening until one of the limits is reached (or stop is called)
+
+        Parameters:
+        depth -- Deepest iteration
+        nodes -- Node limit (the current iteration is abandoned when reached)
+        seconds -- Time limit (the current iteration is abandoned when reached)
+        info -- Function called with the SearchResult of every completed iteration
+        soft_seconds -- No new iteration is started after this time (the next one would most likely not finish)
+
+        Returns:
+        SearchResult of the last completed iteration
+        """
+        if depth is None:
+            depth = self.DEFAULT_DEPTH if nodes is None and seconds is None else MAX_PLY
+        start = time.time()
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.max_nodes = nodes
+        self.set_stop_times(start, seconds, soft_seconds)
+        self.stopped = False
+        self.next_check = 0
+        self.previous_pv = []
+        plies = len(self.board.move_sequence)
+        if self.tt is not None:
+            self.tt.new_search()
+        self.ordering.new_search()
+        self.root_in_bitbase = self.bitbases is not None and self.bitbases.probe(self.board) is not None
+
+        moves = self.board.generate_legal_moves()
+        result = SearchResult(moves[0] if moves else None, 0, moves[:1], 0, 0, 0.0)
+        if not moves:
+            result.score = -MATE if self.board.in_check else 0
+            return result
+
+        with self.limits_lock:
+            # Limits set (by another thread) before the search got here count from the time they were set
+            if self.pending_limits is not None:
+                self.set_stop_times(*self.pending_limits)
+                self.pending_limits = None
+            self.searching = True
+
+        for d in range(1, min(depth, MAX_PLY) + 1):
+            try:
+                score = self.aspiration(d, result.score)
+            except SearchStopped:
+                # Take the board back to where the search was interrupted
+                while len(self.board.move_sequence) > plies:
+                    self.board.unmake_move()
+                break
+
+            self.previous_pv = self.pv[0][:]
+            result = SearchResult(self.previous_pv[0], score, self.previous_pv, d, self.nodes, time.time() - start)
+            if info is not None:
+                info(result)
+            if abs(score) >= MATE - MAX_PLY:  # No use searching deeper after finding a mate
+                break
+            if self.soft_stop_time is not None and time.time() >= self.soft_stop_time:
+                break
+
+        with self.limits_lock:
+            self.searching = False
+        result.nodes = self.nodes
+        result.seconds = time.time() - start
+        return result
+
+    def set_stop_times(self, start, seconds, soft_seconds):
+        self.stop_time = None if seconds is None else start + seconds
+        self.soft_stop_time = None if soft_seconds is None else start + soft_seconds
+
+    def set_time_limits(self, seconds=None, soft_seconds=None):
+        # New time limits from now on (from another thread, e.g. on ponderhit). Before the search is under way they
+        # are kept in pending_limits and taken over by search, so they are not overwritten by its own limits.
+        now = time.time()
+        with self.limits_lock:
+            if self.searching:
+                self.set_stop_times(now, seconds, soft_seconds)
+                self.next_check = 0
+            else:
+                self.pending_limits = (now, seconds, soft_seconds)
+
+    def aspiration(self, depth, previous_score):
+        # Search with a window around the previous score, widened to the side it fails to until the score is inside
+        delta = self.ASPIRATION_WINDOW
+        if depth == 1 or not delta:
+            return self.negamax(depth, -INFINITY, INFINITY, 0)
+
+        alpha = max(previous_score - delta, -INFINITY)
+        beta = min(previous_score + delta, INFINITY)
+        while True:
+            score = self.negamax(depth, alpha, beta, 0)
+            if score <= alpha:
+                alpha = max(alpha - delta, -INFINITY)
+            elif score >= beta:
+                beta = min(beta + delta, INFINITY)
+            else:
+                return score
+            delta *= 2
+
+    def negamax(self, depth, alpha, beta, ply):
+        board = self.board
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        self.nodes += 1
+        self.pv[ply] = []
+
+        if ply > 0 and self.is_draw():
+            return 0
+
+        # Bitbase positions (phase 4 at most: a queen, rook or pawn) have a known result. Wins score above any
+        # evaluation when converting into the ending, once in it they are searched on to make progress to the mate.
+        if self.bitbases is not None and ply > 0 and board.phase <= 4:
+            result = self.bitbases.probe(board)
+            if result == 0:
+                return 0
+            if result is not None and not self.root_in_bitbase:
+                if board.in_check and not board.count_legal_moves():
+                    return -MATE + ply
+                return result * KNOWN_WIN + self.evaluate(board)
+
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(alpha, beta, ply)
+
+        # Transposition table: cut off null window nodes on a deep enough bound, otherwise use the best move hint
+        tt = self.tt
+        tt_move = None
+        if tt is not None:
+            entry = tt.probe(board.zobrist_key)
+            if entry is not None:
+                tt_depth, bound, tt_score, tt_move = entry
+                if ply > 0 and tt_depth >= depth and beta - alpha == 1:
+                    tt_score = score_from_tt(tt_score, ply)
+                    if bound == TranspositionTable.EXACT or \
+                            (bound == TranspositionTable.LOWER and tt_score >= beta) or \
+                            (bound == TranspositionTable.UPPER and tt_score <= alpha):
+                        return tt_score
+
+        previous_move = board.move_sequence[-1] if board.move_sequence else None
+        pv_move = self.previous_pv[ply] if ply < len(self.previous_pv) else None
+        if self.STAGED_MOVES:
+            moves = self.ordering.staged(board, ply, tt_move, pv_move, previous_move)
+        else:
+            moves = self.ordering.order(board.generate_legal_moves(), ply, tt_move, pv_move, previous_move)
+
+        original_alpha = alpha
+        best = -INFINITY
+        best_move = 0
+        for i, mv in enumerate(moves):
+            board.make_move(mv)
+            if i == 0:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Principal variation search: prove with a null window that the move is not better than the first
+                score = -self.negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+
+            if score > best:
+                best = score
+                best_move = mv
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [mv] + self.pv[ply + 1]
+                    if alpha >= beta:
+                        self.ordering.update(mv, i, depth, ply, previous_move)
+                        break
+
+        if best == -INFINITY:  # No legal moves
+            return -MATE + ply if board.in_check else 0
+
+        if tt is not None:
+            if best >= beta:
+                bound = TranspositionTable.LOWER
+            elif best > original_alpha:
+                bound = TranspositionTable.EXACT
+            else:
+                bound = TranspositionTable.UPPER
+                best_move = 0  # All moves failed low, none of them is known to be best
+            tt.store(board.zobrist_key, depth, bound, score_to_tt(best, ply), best_move)
+        return best
+
+    def quiescence(self, alpha, beta, ply, qply=0):
+        """ Search of captures and promotions only, until the position is quiet
+
+        The side to move may stand pat on the static evaluation instead of capturing (except in check, where all
+        evasions are searched). Captures that lose material by static exchange evaluation are not searched.
+        qply counts the plies played in the quiescence search: the node it starts from (qply 0) was already counted
+        by negamax.
+        """
+        board = self.board
+        if qply > 0:
+            if self.nodes >= self.next_check:
+                self.check_limits()
+            self.nodes += 1
+            self.quiescence_nodes += 1
+        if ply >= MAX_PLY:
+            return self.evaluate(board)
+
+        if board.in_check:
+            moves = board.generate_legal_moves()
+            if not moves:
+                return -MATE + ply
+            best = -INFINITY
+            ordered = self.ordering.order(moves, ply)
+        else:
+            best = self.evaluate(board)
+            if best >= beta:
+                return best
+            alpha = max(alpha, best)
+
+            # Captures and promotions, best exchange first
+            captures = []
+            for mv in board.generate_pseudolegal_moves(quiets=False):
+                value = board.see(mv)
+                if value >= 0 or not self.SEE_PRUNING:
+                    captures.append((value, mv))
+            captures.sort(reverse=True)
+            ordered = [mv for value, mv in captures]
+
+        for mv in ordered:
+            board.make_move(mv)
+            if board.king_in_check(not board.side_to_move):  # Pseudolegal move that leaves the own king in check
+                board.unmake_move()
+                continue
+            score = -self.quiescence(-beta, -alpha, ply + 1, qply + 1)
+            board.unmake_move()
+
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def is_draw(self):
+        # Fifty move rule and repetition of a position since the last capture or pawn move
+        board = self.board
+        if board.half_move_count >= 100:
+            return True
+        undo_stack = board.undo_stack
+        key = board.zobrist_key
+        for k in range(2, min(board.half_move_count, len(undo_stack)) + 1, 2):
+            if undo_stack[-k].zobrist_key == key:
+                return True
+        return False
+
+    def stop(self):
+        # Stops a running search (from another thread) at its next node, the search returns its last result
+        self.stopped = True
+        self.next_check = 0
+
+    def check_limits(self):
+        if self.stopped:
+            raise SearchStopped
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchStopped
+        if self.stop_time is not None and time.time() >= self.stop_time:
+            raise SearchStopped
+        self.next_check = self.nodes + self.CHECK_EVERY
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
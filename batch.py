@@ -0,0 +1,352 @@
+import numpy as np
+from Board_and_moves import BoardRep
+from Bitboard import FILE_A, FILE_H, RANK_1, RANK_8, CASTLE_KEEP
+
+# Move generation for many positions at once. Every position is a row of 12 bitboards (same order as
+# BoardRep.PIECES), and all operations work on whole columns, so the interpreter overhead is paid per piece slot and
+# per ply instead of per position. Pieces of a kind are handled one at a time by peeling off the lowest set bit of
+# every row together, so a loop runs as often as the largest number of such pieces in any row of the batch.
+
+U = np.uint64
+FULL = ~U(0)
+NOT_A = U(~FILE_A & 0xFFFFFFFFFFFFFFFF)
+NOT_H = U(~FILE_H & 0xFFFFFFFFFFFFFFFF)
+NOT_AB = U(~(FILE_A | FILE_A << 1) & 0xFFFFFFFFFFFFFFFF)
+NOT_GH = U(~(FILE_H | FILE_H >> 1) & 0xFFFFFFFFFFFFFFFF)
+PROMOTION_RANKS = U(RANK_1 | RANK_8)
+DOUBLE_PUSH_RANKS = [U(RANK_1 << 24), U(RANK_1 << 32)]  # [white, black] target rank of a double push
+
+# (step, mask of squares that can be reached by a step without wrapping around the board, straight or diagonal)
+STRAIGHT_STEPS = [(8, FULL), (-8, FULL), (1, NOT_A), (-1, NOT_H)]
+DIAGONAL_STEPS = [(9, NOT_A), (7, NOT_H), (-7, NOT_A), (-9, NOT_H)]
+
+# Castling per right (same bit order as BitboardRep.castling): squares that must be empty, squares the king passes
+# or lands on (may not be attacked), target square of the king and the rook move.
+CASTLING = [(1, 0x60, 0x60, 6, 7, 5), (2, 0x0E, 0x0C, 2, 0, 3),
+            (4, 0x60 << 56, 0x60 << 56, 62, 63, 61), (8, 0x0E << 56, 0x0C << 56, 58, 56, 59)]
+ROOK_FROM = np.zeros(64, dtype=np.int64)
+ROOK_TO = np.zeros(64, dtype=np.int64)
+for _right, _empty, _safe, _target, _rook_from, _rook_to in CASTLING:
+    ROOK_FROM[_target] = _rook_from
+    ROOK_TO[_target] = _rook_to
+CASTLE_KEEP_ARRAY = np.array(CASTLE_KEEP, dtype=np.uint8)
+
+PROMOTION_PIECES = [4, 3, 2, 1]  # Q, R, B, N as piece index of the own color
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(x):
+        return np.bitwise_count(x).astype(np.int64)
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+    def popcount(x):
+        x = np.ascontiguousarray(x, dtype=np.uint64)
+        return _BYTE_COUNTS[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1)
+
+
+def _shift(x, step):
+    return x << U(step) if step > 0 else x >> U(-step)
+
+
+def _bit_index(bit):
+    # Square of a single set bit
+    return popcount(bit - U(1))
+
+
+def _square_bits(squares):
+    # Bitboards of an array of squares (square -1 gives an empty bitboard)
+    return np.where(squares >= 0, U(1) << np.maximum(squares, 0).astype(np.uint64), U(0))
+
+
+def _shift_rows(x, step):
+    # Shift every row of x by its own step (array of +8 or -8)
+    return np.where(step > 0, x << U(8), x >> U(8))
+
+
+def _sliding(gen, empty, step, mask):
+    # Kogge-Stone fill: attacks of the sliders in gen along one step direction, up to and including the first blocker
+    pro = empty & mask
+    gen = gen | (pro & _shift(gen, step))
+    pro = pro & _shift(pro, step)
+    gen = gen | (pro & _shift(gen, 2 * step))
+    pro = pro & _shift(pro, 2 * step)
+    gen = gen | (pro & _shift(gen, 4 * step))
+    return _shift(gen, step) & mask
+
+
+def _slider_attacks(gen, empty, steps):
+    attacks = np.zeros_like(gen)
+    for step, mask in steps:
+        attacks |= _sliding(gen, empty, step, mask)
+    return attacks
+
+
+def _knight_attacks(b):
+    return ((b << U(17)) & NOT_A) | ((b << U(15)) & NOT_H) | ((b << U(10)) & NOT_AB) | ((b << U(6)) & NOT_GH) | \
+           ((b >> U(15)) & NOT_A) | ((b >> U(17)) & NOT_H) | ((b >> U(6)) & NOT_AB) | ((b >> U(10)) & NOT_GH)
+
+
+def _king_attacks(b):
+    sides = ((b << U(1)) & NOT_A) | ((b >> U(1)) & NOT_H)
+    row = b | sides
+    return sides | (row << U(8)) | (row >> U(8))
+
+
+def _pawn_attacks(b, black):
+    white_attacks = ((b << U(9)) & NOT_A) | ((b << U(7)) & NOT_H)
+    black_attacks = ((b >> U(7)) & NOT_A) | ((b >> U(9)) & NOT_H)
+    return np.where(black, black_attacks, white_attacks)
+
+
+def _attacks(pieces, occupied, black):
+    # Squares attacked by pieces (N x 6 bitboards of one color per row, black says which color)
+    empty = ~occupied
+    attacks = _pawn_attacks(pieces[:, 0], black) | _knight_attacks(pieces[:, 1]) | _king_attacks(pieces[:, 5])
+    attacks |= _slider_attacks(pieces[:, 2] | pieces[:, 4], empty, DIAGONAL_STEPS)
+    attacks |= _slider_attacks(pieces[:, 3] | pieces[:, 4], empty, STRAIGHT_STEPS)
+    return attacks
+
+
+class PositionBatch:
+    def __init__(self, bitboards, black, castling, en_passant):
+        """ N chess positions stored as arrays, for move counting and perft on all of them at once
+
+        Parameters:
+        bitboards -- (N, 12) uint64 array, one bitboard per piece in the order of BoardRep.PIECES (a1 = bit 0)
+        black -- (N,) bool array (False = white to move, True = black to move)
+        castling -- (N,) uint8 array of castling rights (1 = white short, 2 = white long, 4 = black short,
+                    8 = black long)
+        en_passant -- (N,) int array with the en passant square (-1 = none)
+        """
+        self.bitboards = bitboards
+        self.black = black
+        self.castling = castling
+        self.en_passant = en_passant
+
+    @classmethod
+    def from_fens(cls, fens):
+        boards = [BoardRep.read_fen(fen, backend='bitboard') for fen in fens]
+        return cls(np.array([board.bitboards for board in boards], dtype=np.uint64).reshape(-1, 12),
+                   np.array([board.side_to_move for board in boards], dtype=bool),
+                   np.array([board.castling for board in boards], dtype=np.uint8),
+                   np.array([-1 if board.en_passant_square is None else board.en_passant_square
+                             for board in boards], dtype=np.int64))
+
+    def __len__(self):
+        return len(self.black)
+
+    def piece_codes(self):
+        # (N, 64) array with per square the index of the piece in BoardRep.PIECES (-1 = empty)
+        codes = np.full((len(self), 64), -1, dtype=np.int8)
+        bits = U(1) << np.arange(64, dtype=np.uint64)
+        for i in range(12):
+            codes[(self.bitboards[:, i, None] & bits) != 0] = i
+        return codes
+
+    def attack_masks(self):
+        # (N, 2) array with the squares attacked by white and by black
+        occupied = np.bitwise_or.reduce(self.bitboards, axis=1)
+        no = np.zeros(len(self), dtype=bool)
+        return np.stack([_attacks(self.bitboards[:, :6], occupied, no),
+                         _attacks(self.bitboards[:, 6:], occupied, ~no)], axis=1)
+
+    def _sides(self):
+        black = self.black[:, None]
+        own = np.where(black, self.bitboards[:, 6:], self.bitboards[:, :6])
+        their = np.where(black, self.bitboards[:, :6], self.bitboards[:, 6:])
+        return own, their
+
+    def _targets(self, legal):
+        """ Yields the moves of all positions, grouped per piece slot
+
+        Every item is (piece, from_bits, targets): piece is the (N,) index of the moving piece in BoardRep.PIECES,
+        from_bits the (N,) bitboard of its square (0 = no piece in this slot for that row) and targets the bitboard
+        of squares it can move to. Promotions are one target here; en passant and castling targets are included.
+        """
+        n = len(self)
+        black = self.black
+        color_offset = np.where(black, 6, 0)
+        own, their = self._sides()
+        own_occupied = np.bitwise_or.reduce(own, axis=1)
+        their_occupied = np.bitwise_or.reduce(their, axis=1)
+        occupied = own_occupied | their_occupied
+        empty = ~occupied
+        free = ~own_occupied
+        king = own[:, 5]
+        ep_bits = _square_bits(self.en_passant)
+
+        allowed_all = np.full(n, FULL)
+        pins = []
+        if legal:
+            # Squares attacked by the opponent with the own king lifted off the board (it can not step back along
+            # the line of a checking slider)
+            danger = _attacks(their, occupied ^ king, ~black)
+
+            # Pieces giving check by leaping and along each line from the king, pinned pieces per line
+            leapers = (_pawn_attacks(king, black) & their[:, 0]) | (_knight_attacks(king) & their[:, 1])
+            checks = popcount(leapers)
+            allowed_all = np.where(leapers != 0, leapers, FULL)
+            for steps, sliders in ((STRAIGHT_STEPS, their[:, 3] | their[:, 4]),
+                                   (DIAGONAL_STEPS, their[:, 2] | their[:, 4])):
+                for step, mask in steps:
+                    ray = _sliding(king, empty, step, mask)
+                    checking = (ray & sliders) != 0
+                    checks += checking
+                    allowed_all = np.where(checking, allowed_all & ray, allowed_all)
+
+                    blocker = ray & own_occupied
+                    xray = _sliding(king, ~(occupied ^ blocker), step, mask)
+                    pinned = np.where((xray & ~ray & sliders) != 0, blocker, U(0))
+                    pins.append((pinned, xray))
+            in_check = checks > 0
+            allowed_all = np.where(checks > 1, U(0), allowed_all)
+        else:
+            danger = np.zeros(n, dtype=np.uint64)
+            in_check = np.zeros(n, dtype=bool)
+
+        def allowed(bits):
+            mask = allowed_all
+            for pinned, xray in pins:
+                mask = np.where((bits & pinned) != 0, mask & xray, mask)
+            return mask
+
+        # Pawns: pushes, captures and en passant
+        forward = np.where(black, -8, 8)
+        remaining = own[:, 0]
+        double_rank = np.where(black, DOUBLE_PUSH_RANKS[1], DOUBLE_PUSH_RANKS[0])
+        while remaining.any():
+            bits = remaining & (~remaining + U(1))
+            remaining ^= bits
+            single = np.where(black, bits >> U(8), bits << U(8)) & empty
+            double = np.where(black, single >> U(8), single << U(8)) & empty & double_rank
+            attacks = _pawn_attacks(bits, black)
+            targets = (single | double | (attacks & their_occupied)) & allowed(bits)
+
+            # En passant removes two pieces from a rank, so test whether the king is attacked after the capture
+            ep = attacks & ep_bits
+            if legal and ep.any():
+                captured = _shift_rows(ep, -forward)
+                after = occupied ^ bits ^ captured ^ ep
+                attackers = (_slider_attacks(king, ~after, STRAIGHT_STEPS) & (their[:, 3] | their[:, 4])) | \
+                            (_slider_attacks(king, ~after, DIAGONAL_STEPS) & (their[:, 2] | their[:, 4])) | \
+                            (_knight_attacks(king) & their[:, 1]) | \
+                            (_pawn_attacks(king, black) & their[:, 0] & ~captured)
+                ep = np.where(attackers != 0, U(0), ep)
+            yield color_offset, bits, targets | ep
+
+        # Knights, bishops, rooks and queens
+        for p, steps in ((1, None), (2, DIAGONAL_STEPS), (3, STRAIGHT_STEPS), (4, DIAGONAL_STEPS + STRAIGHT_STEPS)):
+            remaining = own[:, p]
+            while remaining.any():
+                bits = remaining & (~remaining + U(1))
+                remaining ^= bits
+                if steps is None:
+                    attacks = _knight_attacks(bits)
+                else:
+                    attacks = _slider_attacks(bits, empty, steps)
+                yield color_offset + p, bits, attacks & free & allowed(bits)
+
+        # King (pseudolegal castling only needs the castling right and empty squares in between)
+        targets = _king_attacks(king) & free & ~danger
+        for right, between, safe, target, rook_from, rook_to in CASTLING:
+            possible = ((self.castling & right) != 0) & ((occupied & U(between)) == 0) & ~in_check & \
+                       ((danger & U(safe)) == 0) & (black == (right > 2))
+            targets |= np.where(possible, U(1 << target), U(0))
+        yield color_offset + 5, king, targets
+
+    def pseudolegal_counts(self):
+        return self._count(legal=False)
+
+    def legal_counts(self):
+        return self._count(legal=True)
+
+    def _count(self, legal):
+        counts = np.zeros(len(self), dtype=np.int64)
+        for piece, bits, targets in self._targets(legal):
+            counts += popcount(targets)
+            pawns = (piece % 6) == 0
+            counts += 3 * popcount(np.where(pawns, targets & PROMOTION_RANKS, U(0)))
+        return counts
+
+    def children(self):
+        """ All positions after one legal move
+
+        Returns:
+        (children, parents) -- PositionBatch of the new positions and for each of them the row of its parent
+        """
+        rows = []
+        frms = []
+        tos = []
+        pieces = []
+        for piece, bits, targets in self._targets(legal=True):
+            frm = _bit_index(bits)
+            while targets.any():
+                target_bits = targets & (~targets + U(1))
+                targets ^= target_bits
+                row = np.nonzero(target_bits)[0]
+                rows.append(row)
+                frms.append(frm[row])
+                tos.append(_bit_index(target_bits[row]))
+                pieces.append(piece[row])
+
+        row = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        frm = np.concatenate(frms) if rows else np.zeros(0, dtype=np.int64)
+        to = np.concatenate(tos) if rows else np.zeros(0, dtype=np.int64)
+        piece = np.concatenate(pieces) if rows else np.zeros(0, dtype=np.int64)
+
+        # Every pawn move to the last rank becomes four moves, one per promotion piece
+        placed = piece.copy()
+        promotes = (piece % 6 == 0) & ((to < 8) | (to >= 56))
+        if promotes.any():
+            index = np.nonzero(promotes)[0]
+            extra = np.repeat(index, 3)
+            row, frm, to, piece = (np.concatenate([a, a[extra]]) for a in (row, frm, to, piece))
+            placed = np.concatenate([placed, placed[extra]])
+            placed[index] += PROMOTION_PIECES[0]
+            placed[len(promotes):] += np.tile(PROMOTION_PIECES[1:], len(index))
+
+        return self._make(row, frm, to, piece, placed), row
+
+    def _make(self, row, frm, to, piece, placed):
+        # New positions after the moves (row, from square, to square, moving piece, piece placed on the to square)
+        m = len(row)
+        index = np.arange(m)
+        black = self.black[row]
+        bitboards = self.bitboards[row]
+        frm_bits = U(1) << frm.astype(np.uint64)
+        to_bits = U(1) << to.astype(np.uint64)
+
+        bitboards &= ~to_bits[:, None]
+        bitboards[index, piece] ^= frm_bits
+        bitboards[index, placed] |= to_bits
+
+        pawn = piece % 6 == 0
+        en_passant = pawn & (to == self.en_passant[row])
+        if en_passant.any():
+            ep = np.nonzero(en_passant)[0]
+            captured = to[ep] + np.where(black[ep], 8, -8)
+            bitboards[ep, np.where(black[ep], 0, 6)] &= ~(U(1) << captured.astype(np.uint64))
+
+        castle = (piece % 6 == 5) & (np.abs(to - frm) == 2)
+        if castle.any():
+            c = np.nonzero(castle)[0]
+            rook_bits = (U(1) << ROOK_FROM[to[c]].astype(np.uint64)) | (U(1) << ROOK_TO[to[c]].astype(np.uint64))
+            bitboards[c, np.where(black[c], 9, 3)] ^= rook_bits
+
+        castling = self.castling[row] & CASTLE_KEEP_ARRAY[frm] & CASTLE_KEEP_ARRAY[to]
+        en_passant_square = np.where(pawn & (np.abs(to - frm) == 16), (frm + to) // 2, -1)
+        return PositionBatch(bitboards, ~black, castling, en_passant_square)
+
+    def perft(self, depth):
+        # (N,) array of perft(depth) per position, the last ply is counted instead of made
+        nodes = np.zeros(len(self), dtype=np.int64)
+        if depth == 0:
+            return nodes + 1
+
+        batch = self
+        parents = np.arange(len(self))
+        for _ in range(depth - 1):
+            batch, row = batch.children()
+            parents = parents[row]
+        np.add.at(nodes, parents, batch.legal_counts())
+        return nodes
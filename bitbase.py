@@ -0,0 +1,241 @@
+from Board_and_moves import KING_TARGETS, ROOK_RAYS, QUEEN_RAYS, PAWN_CAPTURES
+from collections import deque
+import argparse
+import mmap
+import sys
+import os
+
+# A bitbase has one bit per position of king and piece against king: set when the side with the piece wins.
+# Positions are seen with the side with the piece as white (for black the board is flipped vertically) and indexed as
+#   bit 18     side to move (0 = side with the piece, 1 = lone king)
+#   bits 12-17 square of the king of the side with the piece
+#   bits 6-11  square of the lone king
+#   bits 0-5   square of the piece
+# A lone king can never win, so a clear bit is a draw and a set bit is a win for the side with the piece.
+ENDINGS = ['KQK', 'KRK', 'KPK']  # In build order: KPK needs KQK and KRK for its promotions
+TABLE_SIZE = 1 << 19
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+def _mask(squares):
+    mask = 0
+    for sq in squares:
+        mask |= 1 << sq
+    return mask
+
+
+KING_MASKS = [_mask(targets) for targets in KING_TARGETS]
+
+
+def _slider_attacks(rays):
+    # Attack mask per (square of the piece, square of the one piece that can block it): index 64 * piece + blocker
+    attacks = []
+    for sq in range(64):
+        for blocker in range(64):
+            mask = 0
+            for ray in rays[sq]:
+                for t in ray:
+                    mask |= 1 << t
+                    if t == blocker:
+                        break
+            attacks.append(mask)
+    return attacks
+
+
+def _piece_moves(piece, p, wk, bk):
+    # Target squares of a slider on p, blocked by both kings
+    targets = []
+    for ray in (QUEEN_RAYS if piece == 'Q' else ROOK_RAYS)[p]:
+        for t in ray:
+            if t == wk or t == bk:
+                break
+            targets.append(t)
+    return targets
+
+
+def generate(piece, queen_table=None, rook_table=None):
+    """ Retrograde analysis of king and piece (Q, R or P) against king
+
+    Starting from the mates (and, for a pawn, from the winning promotions) every position that is won is marked
+    once. A position with the side with the piece to move is won as soon as one of its moves leads to a won
+    position, a position with the lone king to move once all of its moves do.
+
+    Parameters:
+    piece -- 'Q', 'R' or 'P'
+    queen_table, rook_table -- KQK and KRK bitbases (as given by generate), needed for the promotions of KPK
+
+    Returns:
+    bytearray with TABLE_SIZE bits
+    """
+    attacks = [_mask(PAWN_CAPTURES[0][sq]) for sq in range(64)] if piece == 'P' else \
+        _slider_attacks(QUEEN_RAYS if piece == 'Q' else ROOK_RAYS)
+    pawn = piece == 'P'
+
+    def piece_attacks(p, blocker):
+        return attacks[p] if pawn else attacks[64 * p + blocker]
+
+    def promotion_wins(wk, bk, to):
+        # The promoted queen or rook (on to, lone king to move) wins
+        index = (1 << 18) | (wk << 12) | (bk << 6) | to
+        return any(table[index >> 3] >> (index & 7) & 1 for table in (queen_table, rook_table) if table is not None)
+
+    won = bytearray(TABLE_SIZE)
+    moves_left = bytearray(TABLE_SIZE)  # Lone king to move: moves not (yet) known to lose, 255 = can not lose
+    queue = deque()
+
+    def valid(wk, bk, p):
+        return wk != bk and wk != p and bk != p and not KING_MASKS[wk] >> bk & 1 and (not pawn or 8 <= p < 56)
+
+    for wk in range(64):
+        for bk in range(64):
+            for p in range(64):
+                if not valid(wk, bk, p):
+                    continue
+                attacked = KING_MASKS[wk] | piece_attacks(p, wk)
+
+                # Side with the piece to move (illegal when the lone king is in check)
+                if not attacked >> bk & 1 and pawn and p >= 48 and p + 8 not in (wk, bk) and \
+                        promotion_wins(wk, bk, p + 8):
+                    index = (wk << 12) | (bk << 6) | p
+                    won[index] = 1
+                    queue.append(index)
+
+                # Lone king to move: count its moves, capturing an undefended piece or stalemate is a draw
+                index = (1 << 18) | (wk << 12) | (bk << 6) | p
+                count = 0
+                for t in KING_TARGETS[bk]:
+                    if not attacked >> t & 1:
+                        if t == p:
+                            count = 255
+                            break
+                        count += 1
+                if count == 0:
+                    if attacked >> bk & 1:  # Mate
+                        won[index] = 1
+                        queue.append(index)
+                    else:
+                        count = 255
+                moves_left[index] = count
+
+    while queue:
+        index = queue.popleft()
+        wk = (index >> 12) & 63
+        bk = (index >> 6) & 63
+        p = index & 63
+
+        if index >> 18:
+            # Lone king to move and lost: every move of the side with the piece that leads here wins
+            predecessors = [(w, bk, p) for w in KING_TARGETS[wk] if w != p and w != bk and not KING_MASKS[w] >> bk & 1]
+            if pawn:
+                if p >= 16 and p - 8 not in (wk, bk):
+                    predecessors.append((wk, bk, p - 8))
+                    if 24 <= p < 32 and p - 16 not in (wk, bk):
+                        predecessors.append((wk, bk, p - 16))
+            else:
+                predecessors.extend((wk, bk, q) for q in _piece_moves(piece, p, wk, bk))
+            for w, b, q in predecessors:
+                if not (KING_MASKS[w] | piece_attacks(q, w)) >> b & 1:
+                    previous = (w << 12) | (b << 6) | q
+                    if not won[previous]:
+                        won[previous] = 1
+                        queue.append(previous)
+        else:
+            # Side with the piece to move and won: a lone king position that leads here loses one more move
+            for b in KING_TARGETS[bk]:
+                if b != wk and b != p and not KING_MASKS[wk] >> b & 1:
+                    previous = (1 << 18) | (wk << 12) | (b << 6) | p
+                    if moves_left[previous] != 255 and not won[previous]:
+                        moves_left[previous] -= 1
+                        if moves_left[previous] == 0:
+                            won[previous] = 1
+                            queue.append(previous)
+
+    bits = bytearray(TABLE_SIZE // 8)
+    for index in range(TABLE_SIZE):
+        if won[index]:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bits
+
+
+def build(directory, endings=ENDINGS):
+    """ Generate bitbases and write them to directory as <ending>.bin (e.g. KPK.bin)
+
+    Returns:
+    Dict of ending: path
+    """
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+    paths = {}
+    for ending in ENDINGS:
+        if ending not in endings and not (ending in ('KQK', 'KRK') and 'KPK' in endings):
+            continue
+        tables[ending] = generate(ending[1], tables.get('KQK'), tables.get('KRK'))
+        if ending in endings:
+            paths[ending] = os.path.join(directory, ending + '.bin')
+            with open(paths[ending], 'wb') as table_file:
+                table_file.write(tables[ending])
+    return paths
+
+
+class Bitbases:
+    def __init__(self, directory):
+        """ Bitbases of a directory (written by build), memory mapped
+
+        Endings without a file in the directory are not probed.
+        """
+        self.files = []
+        self.tables = {}
+        for ending in ENDINGS:
+            path = os.path.join(directory, ending + '.bin')
+            if os.path.exists(path):
+                table_file = open(path, 'rb')
+                self.files.append(table_file)
+                self.tables[ending[1]] = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+        for table_file in self.files:
+            table_file.close()
+        self.tables = {}
+
+    def probe(self, board):
+        """ WIN, DRAW or LOSS for the side to move, None when the position is not in one of the bitbases """
+        pieces = board.pieces
+        if sum(map(len, pieces.values())) != 3:  # Checked first: most positions the search probes have more pieces
+            return None
+        for piecetype in 'QRPqrp':
+            if pieces[piecetype]:
+                break
+        else:
+            return None
+        table = self.tables.get(piecetype.upper())
+        if table is None:
+            return None
+
+        strong = piecetype.islower()  # Color of the side with the piece
+        flip = 56 if strong else 0
+        index = (board.side_to_move != strong) << 18 | (board.kings[strong].position ^ flip) << 12 | \
+            (board.kings[not strong].position ^ flip) << 6 | (board.pieces[piecetype][0].position ^ flip)
+        if not table[index >> 3] >> (index & 7) & 1:
+            return DRAW
+        return WIN if board.side_to_move == strong else LOSS
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate the KQK, KRK and KPK bitbases")
+    parser.add_argument('directory', help="Directory to write the bitbases to")
+    parser.add_argument('endings', nargs='*', default=ENDINGS, choices=ENDINGS)
+    options = parser.parse_args(args)
+    for ending, path in build(options.directory, options.endings).items():
+        print("{} written to {}".format(ending, path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
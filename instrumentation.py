@@ -0,0 +1,245 @@
+from Board_and_moves import BoardRep
+from time import perf_counter
+import argparse
+import cProfile
+import pstats
+import tracemalloc
+import sys
+import io
+
+# Phases timed by InstrumentedBoardRep. Times are exclusive: a phase that calls another (e.g. do_move calling
+# make_move and generate_pseudolegal_moves) is only charged for its own work.
+#   generate -- generate_pseudolegal_moves
+#   legality -- Filtering pseudolegal moves in generate_legal_moves and count_legal_moves (checks, pins, king moves)
+#   do_move -- Checked moves of do_move, including the rollback of moves that leave the king in check
+#   make, unmake -- make_move and unmake_move
+#   perft -- Bookkeeping of perft itself (loop, split dict and hash table)
+PHASES = ['generate', 'legality', 'do_move', 'make', 'unmake', 'perft']
+
+
+class Statistics:
+    def __init__(self):
+        """ Counters and phase times collected by an InstrumentedBoardRep
+
+        Parameters:
+        nodes -- Positions entered with make_move (including the ones entered by do_move)
+        legal_moves -- Moves accepted by do_move
+        rolled_back_moves -- Moves of do_move that were played and taken back since they left the king in check
+        rejected_moves -- Moves of do_move refused without playing them (not pseudolegal or castling through check)
+        generate_calls -- Calls of generate_pseudolegal_moves
+        moves_generated -- Pseudolegal moves returned by those calls
+        legal_generated -- Legal moves returned by generate_legal_moves and counted by count_legal_moves
+        calls -- Dict of phase: number of calls
+        times -- Dict of phase: seconds spent in the phase itself
+        """
+        self.nodes = 0
+        self.legal_moves = 0
+        self.rolled_back_moves = 0
+        self.rejected_moves = 0
+        self.generate_calls = 0
+        self.moves_generated = 0
+        self.legal_generated = 0
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self._nested = []  # Time spent in nested phases, per phase that is running
+
+    def reset(self):
+        self.__init__()
+
+    def as_dict(self):
+        return {key: value for key, value in vars(self).items() if not key.startswith('_')}
+
+    def report(self):
+        # Counters and a table of the phases, as printed by profile_perft
+        lines = ["nodes {}, legal moves {}, rolled back {}, rejected {}".format(
+                     self.nodes, self.legal_moves, self.rolled_back_moves, self.rejected_moves),
+                 "move generation: {} calls, {} pseudolegal moves ({:.1f} per call), {} legal".format(
+                     self.generate_calls, self.moves_generated, self.moves_generated / max(self.generate_calls, 1),
+                     self.legal_generated)]
+        total = sum(self.times.values()) or 1.0
+        lines.append("{:<10}{:>10}{:>10}{:>8}{:>10}".format('phase', 'calls', 'seconds', '%', 'us/call'))
+        for phase in PHASES:
+            calls = self.calls[phase]
+            seconds = self.times[phase]
+            lines.append("{:<10}{:>10}{:>10.3f}{:>8.1f}{:>10.2f}".format(
+                phase, calls, seconds, 100 * seconds / total, 1e6 * seconds / calls if calls else 0.0))
+        return "\n".join(lines)
+
+
+def _timed(phase):
+    # Wraps a BoardRep method to count its calls and charge its exclusive time to phase
+    def decorator(method):
+        def wrapper(self, *args, **kwargs):
+            statistics = self.statistics
+            nested = statistics._nested
+            nested.append(0.0)
+            start = perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                statistics.times[phase] += elapsed - nested.pop()
+                statistics.calls[phase] += 1
+                if nested:
+                    nested[-1] += elapsed
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+    return decorator
+
+
+class InstrumentedBoardRep(BoardRep):
+    # BoardRep that counts and times its hot paths in self.statistics. BoardRep itself is not touched, so boards that
+    # are not instrumented pay nothing. Get one with BoardRep.read_fen(fen, backend='instrumented'), from_snapshot or
+    # instrument(board).
+
+    def __init__(self):
+        super().__init__()
+        self.statistics = Statistics()
+        self._rollbacks = 0
+
+    @_timed('generate')
+    def generate_pseudolegal_moves(self, captures=True, quiets=True, pieces=None):
+        moves = super().generate_pseudolegal_moves(captures, quiets, pieces)
+        self.statistics.generate_calls += 1
+        self.statistics.moves_generated += len(moves)
+        return moves
+
+    @_timed('legality')
+    def generate_legal_moves(self, captures=True, quiets=True, moves=None, checks_pins=None):
+        legal = super().generate_legal_moves(captures, quiets, moves, checks_pins)
+        self.statistics.legal_generated += len(legal)
+        return legal
+
+    @_timed('legality')
+    def count_legal_moves(self):
+        count = super().count_legal_moves()
+        self.statistics.legal_generated += count
+        return count
+
+    @_timed('do_move')
+    def do_move(self, mv, update_movelist=True):
+        statistics = self.statistics
+        self._rollbacks = 0
+        result = super().do_move(mv, update_movelist)
+        if result is not False:
+            statistics.legal_moves += 1
+        elif self._rollbacks:
+            statistics.rolled_back_moves += 1
+        else:
+            statistics.rejected_moves += 1
+        return result
+
+    def undo_pseudolegal_move(self, mv, captured_piece=None):
+        # Outside of unmake_move only called by the rollback in do_move
+        self._rollbacks += 1
+        return super().undo_pseudolegal_move(mv, captured_piece)
+
+    @_timed('make')
+    def make_move(self, mv):
+        self.statistics.nodes += 1
+        return super().make_move(mv)
+
+    @_timed('unmake')
+    def unmake_move(self):
+        return super().unmake_move()
+
+    @_timed('perft')
+    def perft(self, n, split=False, hash_size=None, table=None, bulk=True):
+        return super().perft(n, split, hash_size, table, bulk)
+
+
+def instrument(board):
+    """ Switch a BoardRep to an InstrumentedBoardRep in place (position and move history are kept)
+
+    Returns:
+    The Statistics the board now collects
+    """
+    if not isinstance(board, InstrumentedBoardRep):
+        board.__class__ = InstrumentedBoardRep
+        board.statistics = Statistics()
+        board._rollbacks = 0
+    return board.statistics
+
+
+def profile_perft(fen=None, depth=3, sort='cumulative', limit=20, memory=True, profile_path=None, output=None):
+    """ Where perft spends its time: phase counters and times, a cProfile listing and (optionally) tracemalloc
+
+    Perft is run once per measurement (instrumented, under cProfile, under tracemalloc), so that the overhead of one
+    does not distort the others.
+
+    Parameters:
+    fen -- Position (None = start position)
+    depth -- Perft depth
+    sort -- pstats sort key (e.g. 'cumulative', 'tottime', 'ncalls')
+    limit -- Number of functions and allocation sites to list
+    memory -- Also trace memory allocations (slow)
+    profile_path -- Write the cProfile statistics to this file as well (for snakeviz, pstats etc.)
+    output -- Text stream for the summaries (None = stdout)
+
+    Returns:
+    Dict with nodes, seconds, statistics (Statistics), stats (pstats.Stats), memory_peak (bytes) and memory_top
+    (list of tracemalloc.Statistic)
+    """
+    output = output or sys.stdout
+    fen = fen or BoardRep.read_fen().get_fen()
+    result = {}
+
+    board = BoardRep.read_fen(fen, backend='instrumented')
+    start = perf_counter()
+    result['nodes'] = board.perft(depth)
+    result['seconds'] = perf_counter() - start
+    result['statistics'] = board.statistics
+    print("perft({}) = {} for {}".format(depth, result['nodes'], fen), file=output)
+    print(board.statistics.report(), file=output)
+
+    board = BoardRep.read_fen(fen)
+    profile = cProfile.Profile()
+    profile.enable()
+    board.perft(depth)
+    profile.disable()
+    if profile_path:
+        profile.dump_stats(profile_path)
+    listing = io.StringIO()
+    result['stats'] = pstats.Stats(profile, stream=listing).sort_stats(sort)
+    result['stats'].print_stats(limit)
+    print(listing.getvalue().strip(), file=output)
+
+    result['memory_peak'] = None
+    result['memory_top'] = []
+    if memory:
+        board = BoardRep.read_fen(fen)
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        board.perft(depth)
+        after = tracemalloc.take_snapshot()
+        result['memory_peak'] = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+        result['memory_top'] = after.compare_to(before, 'lineno')[:limit]
+        print("\nmemory peak {:.1f} KB, allocation changes by line:".format(result['memory_peak'] / 1024),
+              file=output)
+        for statistic in result['memory_top']:
+            print(statistic, file=output)
+
+    return result
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Profile perft: counters per phase, cProfile and tracemalloc")
+    parser.add_argument('fen', nargs='?', default=None, help="Position (default: start position)")
+    parser.add_argument('-d', '--depth', type=int, default=3)
+    parser.add_argument('-s', '--sort', default='cumulative', help="pstats sort key")
+    parser.add_argument('-n', '--limit', type=int, default=20, help="Functions and allocation sites to list")
+    parser.add_argument('-o', '--profile', default=None, help="Also write the cProfile statistics to this file")
+    parser.add_argument('--no-memory', action='store_true', help="Skip tracemalloc")
+    options = parser.parse_args(args)
+    profile_perft(options.fen, options.depth, options.sort, options.limit, not options.no_memory, options.profile)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+from Board_and_moves import BoardRep
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+
+def _play(fen, moves, backend):
+    # Board after the given moves (in UCI notation, e.g. 'e2e4' or 'a7a8q') from fen
+    board = BoardRep.read_fen(fen, backend=backend)
+    for mv in moves:
+        board.do_move(board.find_move(mv[0:2], mv[2:4], mv[4:] or None))
+    return board
+
+
+def _legal_moves(board):
+    # Legal moves in UCI notation (works for every backend, since they all provide perft with splits)
+    return list(board.perft(1, split=True)[1])
+
+
+def _perft_task(task):
+    fen, moves, depth, backend = task
+    return moves, _play(fen, moves, backend).perft(depth)
+
+
+def parallel_perft(fen, depth, workers=None, split_depth=1, backend='mailbox'):
+    """ Perft with the subtrees of the root moves divided over a process pool
+
+    Workers only receive the FEN and the moves leading to their subtree, so nothing but strings is pickled.
+
+    Parameters:
+    fen -- Position to count from
+    depth -- Perft depth
+    workers -- Number of worker processes (None = number of cores)
+    split_depth -- 1 = one task per root move, 2 = one task per root move and reply (better load balance when a
+                   few root moves have most of the nodes)
+    backend -- Board backend used by the workers ('mailbox' or 'bitboard')
+
+    Returns:
+    (nodes, split_dict) -- Same as BoardRep.perft(depth, split=True)
+    """
+    if depth == 0:
+        return 1, {}
+
+    board = BoardRep.read_fen(fen, backend=backend)
+    tasks = []
+    split_dict = {}
+    for root in _legal_moves(board):
+        split_dict[root] = 0
+        if split_depth >= 2 and depth >= 2:
+            child = _play(fen, [root], backend)
+            for reply in _legal_moves(child):
+                tasks.append((fen, [root, reply], depth - 2, backend))
+        else:
+            tasks.append((fen, [root], depth - 1, backend))
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for moves, nodes in pool.map(_perft_task, tasks, chunksize=1):
+            split_dict[moves[0]] += nodes
+
+    return sum(split_dict.values()), split_dict
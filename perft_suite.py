@@ -0,0 +1,227 @@
+from Board_and_moves import BoardRep
+from positions import stream_positions
+from multiprocessing.connection import wait
+import multiprocessing
+import argparse
+import json
+import time
+import csv
+import os
+import sys
+
+REPORT_FIELDS = ['name', 'fen', 'depth', 'nodes', 'expected', 'status', 'seconds', 'nps', 'error']
+
+
+def read_epd(path):
+    """ Positions of a perft suite in EPD format, one per line: '<fen> ;D1 20 ;D2 400 ...'
+
+    Yields (name, fen, expected) with expected a dict of depth: node count. The name is the file name and line number.
+    """
+    for record in stream_positions(path):
+        expected = {int(opcode[1:]): int(operand) for opcode, operand in record.operations.items()
+                    if opcode[:1] == 'D' and opcode[1:].isdigit()}
+        yield "{}:{}".format(os.path.basename(path), record.line_number), record.fen, expected
+
+
+def read_json(path):
+    # Position of a perft_test/*.json file, in the same form as read_epd
+    with open(path) as json_file:
+        data = json.load(json_file)
+    yield os.path.basename(path), data["fen"].strip(), {d["depth"]: d["nodes"] for d in data["perft"]}
+
+
+def read_suite(paths):
+    # Positions of all files, .json files are read with read_json and everything else as EPD
+    for path in paths:
+        if path.endswith('.json'):
+            yield from read_json(path)
+        else:
+            yield from read_epd(path)
+
+
+def _worker(fen, depths, backend, connection):
+    # Runs in its own process: sends (depth, nodes, seconds) as soon as a depth is counted, then (None, None, None)
+    try:
+        board = BoardRep.read_fen(fen, backend=backend)
+        for depth in depths:
+            t1 = time.perf_counter()
+            nodes = board.perft(depth)
+            connection.send((depth, nodes, time.perf_counter() - t1))
+    except Exception as error:
+        connection.send((-1, repr(error), 0.0))
+    connection.send((None, None, None))
+    connection.close()
+
+
+def run_suite(positions, workers=None, timeout=60.0, max_depth=6, max_nodes=None, backend='mailbox',
+              progress=None):
+    """ Perft of every depth of every position, with the positions divided over worker processes
+
+    Every position gets a process (and pipe) of its own, which is terminated when it runs longer than timeout. Positions are
+    taken from the iterable only when a worker is free, so a suite can be streamed from file. Depths are counted from
+    low to high and the deeper depths of a position are not counted after a wrong result.
+
+    Parameters:
+    positions -- Iterable of (name, fen, expected) as given by read_suite
+    workers -- Number of positions counted at the same time (None = number of cores)
+    timeout -- Seconds per position (None = no limit)
+    max_depth -- Deepest depth to count
+    max_nodes -- Skip depths where more nodes are expected (None = no limit)
+    backend -- Board backend ('mailbox' or 'bitboard')
+    progress -- Function called with every record as it comes in (e.g. print)
+
+    Returns:
+    List of records (dicts with the keys in REPORT_FIELDS), one per position and depth. The status of a record is
+    'ok', 'fail' (wrong node count), 'unknown' (no expected count), 'timeout', 'skipped' or 'error' (the depth that
+    raised an exception or during which the worker died, with the message in 'error'; the deeper depths of the
+    position are 'skipped').
+    """
+    workers = workers or os.cpu_count()
+    positions = iter(positions)
+    records = []
+    running = {}  # receiving end of the pipe: (process, start time, name, fen, remaining depths, expected)
+
+    def add(name, fen, depth, status, nodes=None, expected=None, seconds=None, error=None):
+        record = {'name': name, 'fen': fen, 'depth': depth, 'nodes': nodes, 'expected': expected,
+                  'status': status, 'seconds': seconds,
+                  'nps': None if nodes is None else nodes / seconds if seconds else 0, 'error': error}
+        records.append(record)
+        if progress is not None:
+            progress(record)
+
+    def stop(connection, status):
+        process, start, name, fen, depths, expected = running.pop(connection)
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        connection.close()
+        for depth in depths:
+            add(name, fen, depth, status, expected=expected.get(depth))
+
+    def error(connection, message):
+        # The first depth not counted gets the error, the deeper ones are skipped
+        process, start, name, fen, depths, expected = running[connection]
+        if depths:
+            add(name, fen, depths[0], 'error', expected=expected.get(depths[0]), error=message)
+            running[connection] = (process, start, name, fen, depths[1:], expected)
+        stop(connection, 'skipped')
+
+    exhausted = False
+    while running or not exhausted:
+        # Start positions on free workers
+        while not exhausted and len(running) < workers:
+            try:
+                name, fen, expected = next(positions)
+            except StopIteration:
+                exhausted = True
+                break
+            depths = sorted(d for d in expected if d <= max_depth) or list(range(1, max_depth + 1))
+            for depth in [d for d in depths if max_nodes is not None and expected.get(d, 0) > max_nodes]:
+                add(name, fen, depth, 'skipped', expected=expected[depth])
+            depths = [d for d in depths if max_nodes is None or expected.get(d, 0) <= max_nodes]
+            if not depths:
+                continue
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_worker, args=(fen, depths, backend, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (process, time.perf_counter(), name, fen, depths, expected)
+
+        # Collect results
+        for connection in wait(list(running), timeout=0.05):
+            try:
+                depth, nodes, seconds = connection.recv()
+            except EOFError:
+                process = running[connection][0]
+                process.join(1.0)
+                error(connection, "worker died without reporting (exit code {})".format(process.exitcode))
+                continue
+            process, start, name, fen, depths, expected = running[connection]
+            if depth is None:
+                error(connection, "worker finished without counting this depth")  # No depths should be left
+            elif depth == -1:
+                error(connection, nodes)  # nodes is the repr of the exception here
+            else:
+                depths.remove(depth)
+                if depth not in expected:
+                    status = 'unknown'
+                elif expected[depth] == nodes:
+                    status = 'ok'
+                else:
+                    status = 'fail'
+                add(name, fen, depth, status, nodes, expected.get(depth), seconds)
+                if status == 'fail':
+                    stop(connection, 'skipped')
+
+        # Terminate positions over their time limit
+        now = time.perf_counter()
+        for connection in list(running):
+            if timeout is not None and now - running[connection][1] > timeout:
+                stop(connection, 'timeout')
+
+    return records
+
+
+def write_json(records, path):
+    with open(path, 'w') as json_file:
+        json.dump(records, json_file, indent=1)
+
+
+def write_csv(records, path):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def summary(records):
+    # Dict of status: number of records, and total nodes, seconds and nodes per second of the counted depths
+    counts = {}
+    for record in records:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+    counted = [r for r in records if r['seconds'] is not None]
+    nodes = sum(r['nodes'] for r in counted)
+    seconds = sum(r['seconds'] for r in counted)
+    counts.update(nodes=nodes, seconds=seconds, nps=nodes / seconds if seconds else 0)
+    return counts
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run perft suites (EPD with ;D<depth> <nodes> fields or "
+                                                 "perft_test/*.json) and report nodes, time and NPS")
+    parser.add_argument('files', nargs='+', help="Suite files")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: number of cores)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Seconds per position (0 = no limit)")
+    parser.add_argument('--max-depth', type=int, default=6)
+    parser.add_argument('--max-nodes', type=int, default=None, help="Skip depths where more nodes are expected")
+    parser.add_argument('--backend', default='mailbox', choices=['mailbox', 'bitboard'])
+    parser.add_argument('--json', help="Write the report as JSON to this file")
+    parser.add_argument('--csv', help="Write the report as CSV to this file")
+    parser.add_argument('--quiet', action='store_true', help="Only print the summary")
+    options = parser.parse_args(args)
+
+    def progress(record):
+        if record['status'] == 'ok':
+            print("{name} D{depth}: {nodes} ok ({seconds:.2f} s, {nps:.0f} nps)".format(**record))
+        elif record['status'] == 'error':
+            print("{name} D{depth}: error {error}".format(**record))
+        else:
+            print("{name} D{depth}: {status} (nodes {nodes}, expected {expected})".format(**record))
+
+    records = run_suite(read_suite(options.files), workers=options.workers, timeout=options.timeout or None,
+                        max_depth=options.max_depth, max_nodes=options.max_nodes, backend=options.backend,
+                        progress=None if options.quiet else progress)
+    if options.json:
+        write_json(records, options.json)
+    if options.csv:
+        write_csv(records, options.csv)
+
+    totals = summary(records)
+    totals['seconds'] = round(totals['seconds'], 2)
+    totals['nps'] = round(totals['nps'])
+    print(", ".join("{}: {}".format(key, value) for key, value in totals.items()))
+    return 1 if totals.get('fail') or totals.get('error') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
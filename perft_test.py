@@ -1,9 +1,11 @@
 from Board_and_moves import *
+from parallel_perft import parallel_perft
 import json
 import time
 
 
-def run_test(data, prefix="", max_nodes=200000, max_depth=6, print_pos=True):
+def run_test(data, prefix="", max_nodes=200000, max_depth=6, print_pos=True, workers=None):
+    # workers -- Divide the root moves over this many processes (None = single process BoardRep.perft)
     fen = data["fen"]
     perft = data["perft"]
     if print_pos:
@@ -19,8 +21,11 @@ def run_test(data, prefix="", max_nodes=200000, max_depth=6, print_pos=True):
         nodes = d["nodes"]
         split = d["split"]
 
-    a = BoardRep.read_fen(fen)
-    res_nodes, res_split = a.perft(depth, split=True)
+    if workers:
+        res_nodes, res_split = parallel_perft(fen, depth, workers=workers)
+    else:
+        a = BoardRep.read_fen(fen)
+        res_nodes, res_split = a.perft(depth, split=True)
     if res_nodes == nodes:
         print(prefix + "Perft({}) = {} computed successfully!".format(depth, nodes))
         return nodes
@@ -54,30 +59,31 @@ def run_test(data, prefix="", max_nodes=200000, max_depth=6, print_pos=True):
                 if key in data.keys():
                     print(prefix + "Split {} failed. Computed {} = {}, should be {}. Testing position after move:".
                           format(key, key, val, split_val, failed_fen))
-                    run_test(data[key], prefix=prefix + "\t", max_depth=depth - 1)
+                    run_test(data[key], prefix=prefix + "\t", max_depth=depth - 1, workers=workers)
                 else:
                     print(prefix + "Split {} failed. Computed {} = {}, should be {}. Failing FEN: {}".format(
                         key, key, val, split_val, failed_fen))
 
 
-files = [
-    # "perft_test/initposition.json",
-    "perft_test/position2.json",
-    # "perft_test/position3.json",
-    # "perft_test/position4.json",
-    # "perft_test/position5.json",
-    # "perft_test/position6.json"
-]
+if __name__ == '__main__':
+    files = [
+        # "perft_test/initposition.json",
+        "perft_test/position2.json",
+        # "perft_test/position3.json",
+        # "perft_test/position4.json",
+        # "perft_test/position5.json",
+        # "perft_test/position6.json"
+    ]
 
-for f in files:
-    with open(f) as json_file:
-        print("Opening file: {}".format(f.split("/")[1]))
-        t1 = time.time()
-        data = json.load(json_file)
+    for f in files:
+        with open(f) as json_file:
+            print("Opening file: {}".format(f.split("/")[1]))
+            t1 = time.time()
+            data = json.load(json_file)
 
-        n = run_test(data, max_nodes=5000000, max_depth=4)
-        dt = time.time() - t1
-        if n is not None:
-            print("Nps: {:.0f}".format(n/dt))
-        print("Test took: {:.2f} (s)".format(dt))
-        print()
+            n = run_test(data, max_nodes=5000000, max_depth=4)
+            dt = time.time() - t1
+            if n is not None:
+                print("Nps: {:.0f}".format(n/dt))
+            print("Test took: {:.2f} (s)".format(dt))
+            print()
@@ -0,0 +1,165 @@
+from Board_and_moves import BoardRep
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import bz2
+import gzip
+import lzma
+import sys
+import os
+
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+class PositionRecord:
+    __slots__ = ('fen', 'operations', 'line_number', '_board')
+
+    def __init__(self, fen, operations=None, line_number=None):
+        """ Position as read from a FEN or EPD line, the BoardRep is only built when asked for
+
+        Parameters:
+        fen -- FEN with all six fields (for EPD lines the counters come from the hmvc and fmvn operations, or 0 1)
+        operations -- Dict of EPD opcode: operand string (e.g. {'bm': 'Nf3', 'id': 'test 1', 'D1': '20'})
+        line_number -- Line in the file the position was read from
+        """
+        self.fen = fen
+        self.operations = operations or {}
+        self.line_number = line_number
+        self._board = None
+
+    def __reduce__(self):
+        # Only the parsed text is pickled (e.g. when sent to a worker process), never a board
+        return PositionRecord, (self.fen, self.operations, self.line_number)
+
+    def __repr__(self):
+        return "PositionRecord({!r}, {!r}, {!r})".format(self.fen, self.operations, self.line_number)
+
+    @property
+    def board(self):
+        if self._board is None:
+            self._board = BoardRep.read_fen(self.fen)
+        return self._board
+
+    @property
+    def side_to_move(self):
+        # False = white, True = black (as BoardRep.side_to_move, without building the board)
+        return self.fen.split(' ', 2)[1] == 'b'
+
+
+def _split_operations(text):
+    # EPD operations separated by ';' (outside of quoted operands)
+    if '"' not in text:
+        return text.split(';')
+    operations = []
+    current = []
+    quoted = False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            operations.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    operations.append("".join(current))
+    return operations
+
+
+def parse_line(line, line_number=None):
+    """ PositionRecord of a FEN or EPD line, None for an empty line or a comment (starting with #)
+
+    Only splits strings, nothing is checked beyond the number of fields and the side to move. Both
+    '<fen> bm Nf3; id "x";' (EPD) and '<fen with counters> ;D1 20 ;D2 400' (perft suites) are accepted.
+    """
+    fields = line.split(None, 4)
+    if not fields or fields[0][0] == '#':
+        return None
+    if len(fields) < 4 or fields[1] not in ('w', 'b') or fields[0].count('/') != 7:
+        raise ValueError("Line {}: not a FEN or EPD position: {!r}".format(line_number, line.strip()))
+
+    half_move, full_move = '0', '1'
+    rest = fields[4] if len(fields) > 4 else ''
+    counters = rest.split(None, 2)
+    if len(counters) >= 2 and counters[0].isdigit() and counters[1].isdigit():
+        half_move, full_move = counters[0], counters[1]
+        rest = counters[2] if len(counters) > 2 else ''
+
+    operations = {}
+    if rest:
+        for operation in _split_operations(rest):
+            opcode, _, operand = operation.strip().partition(' ')
+            if opcode:
+                operations[opcode] = operand.strip().strip('"')
+        half_move = operations.get('hmvc', half_move)
+        full_move = operations.get('fmvn', full_move)
+
+    fen = " ".join(fields[:4]) + " " + half_move + " " + full_move
+    return PositionRecord(fen, operations, line_number)
+
+
+def open_source(source):
+    # Text stream of a path ('-' = stdin, .gz, .bz2 and .xz files are decompressed on the fly) or an open file
+    if source == '-':
+        return sys.stdin
+    if not isinstance(source, str):
+        return source
+    opener = OPENERS.get(os.path.splitext(source)[1], open)
+    return opener(source, 'rt', encoding='utf-8', errors='replace')
+
+
+def stream_positions(source, skip_invalid=False):
+    """ Generator of the PositionRecords of a FEN or EPD file, read line by line (constant memory)
+
+    Parameters:
+    source -- Path ('-' = stdin, compressed .gz, .bz2 and .xz files are read as well), open text file or any
+              iterable of lines
+    skip_invalid -- Skip lines that are not a position instead of raising ValueError
+    """
+    stream = open_source(source)
+    try:
+        for line_number, line in enumerate(stream, 1):
+            try:
+                record = parse_line(line, line_number)
+            except ValueError:
+                if skip_invalid:
+                    continue
+                raise
+            if record is not None:
+                yield record
+    finally:
+        if isinstance(source, str) and source != '-':
+            stream.close()
+
+
+def chunked(iterable, size):
+    # Lists of (at most) size consecutive items, e.g. batches of PositionRecords for worker processes
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def map_chunks(function, chunks, workers=None, max_pending=None):
+    """ Results of function(chunk) for every chunk, computed in worker processes and yielded in order
+
+    Unlike Executor.map the chunks are taken from the iterable only as workers become free (at most max_pending are
+    queued, by default twice the number of workers), so a stream of any length is handled in constant memory.
+    function has to be picklable (a module level function). With workers=1 the chunks are handled in this process.
+    """
+    if workers == 1:
+        for chunk in chunks:
+            yield function(chunk)
+        return
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or 2 * workers
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(function, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
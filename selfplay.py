@@ -0,0 +1,211 @@
+from Board_and_moves import BoardRep, SNAPSHOT_SIZE, move_to_uci
+from positions import OPENERS, map_chunks
+from Search import Search
+from array import array
+from collections import Counter
+import argparse
+import random
+import struct
+import time
+import sys
+import os
+
+# Games are written in chunks, in the order they were started, so the output only depends on the seed and the chunk
+# size (not on the number of workers). Two formats:
+#   moves -- Binary: MAGIC and the snapshot of the start position (see BoardRep.snapshot), then per game one byte
+#            result (index in RESULTS), the number of plies as uint16 and per ply the move as uint16 (from, to and
+#            promotion bits of the packed move, little endian)
+#   fens  -- Text: sampled positions of every game as EPD lines '<fen> ;result 1-0' (read them with
+#            positions.stream_positions)
+MAGIC = b'PYGAMES1'
+RESULTS = ['*', '1-0', '0-1', '1/2-1/2']
+GAME_HEADER = struct.Struct('<BH')
+MOVE_MASK = 0x7FFF  # from, to and promotion bits of a packed move
+FORMATS = ['moves', 'fens']
+
+
+def play_game(board, rng, max_plies=400, depth=0, random_plies=8, samples=0, search=None):
+    """ Play a game from board to the end, with random moves or a fixed depth search
+
+    A game ends in mate, stalemate, by the 50 move rule, threefold repetition, when neither side can mate (bare
+    kings or a single minor piece) or unfinished ('*') after max_plies.
+
+    Parameters:
+    board -- BoardRep to play on (its moves are made with make_move)
+    rng -- random.Random for the moves and the sampled positions
+    max_plies -- Plies before the game is abandoned
+    depth -- 0 = random legal moves, otherwise moves of a search to this depth
+    random_plies -- Plies played randomly before the search takes over (for different games when depth > 0)
+    samples -- Number of positions of the game to sample (uniformly, as FEN)
+    search -- Search on board to reuse between moves (created when needed)
+
+    Returns:
+    (result, moves, fens) -- Result as in RESULTS, packed moves, list of at most samples FENs (in game order)
+    """
+    moves = array('I')
+    reservoir = []  # (ply, fen) of the sampled positions
+    seen = 0
+    repetitions = Counter()
+    pieces = board.pieces
+    result = '*'
+    for ply in range(max_plies + 1):
+        if samples:
+            # Reservoir sampling: the FEN is only built for positions that are (still) kept
+            if seen < samples:
+                reservoir.append((ply, board.get_fen()))
+            else:
+                j = rng.randrange(seen + 1)
+                if j < samples:
+                    reservoir[j] = (ply, board.get_fen())
+            seen += 1
+
+        legal = board.generate_legal_moves()
+        if not legal:
+            result = ('1-0' if board.side_to_move else '0-1') if board.in_check else '1/2-1/2'
+            break
+        if board.half_move_count == 0:
+            repetitions.clear()  # Earlier positions can not come back after a capture or pawn move
+        repetitions[board.zobrist_key] += 1
+        if board.half_move_count >= 100 or repetitions[board.zobrist_key] >= 3 or \
+                (board.phase <= 1 and not pieces['P'] and not pieces['p']):
+            result = '1/2-1/2'
+            break
+        if ply == max_plies:
+            break
+
+        if depth and ply >= random_plies:
+            if search is None:
+                search = Search(board, hash_mb=1)
+            mv = search.search(depth=depth).best_move
+        else:
+            mv = rng.choice(legal)
+        board.make_move(mv)
+        moves.append(mv)
+
+    reservoir.sort()
+    return result, moves, [fen for _, fen in reservoir]
+
+
+def _play_chunk(task):
+    # Worker: play the games of one chunk and return (data, statistics). The seed of the chunk only depends on the
+    # seed of the run and the chunk number.
+    start, seed, chunk, games, options = task
+    rng = random.Random("{}-{}".format(seed, chunk))
+    results = Counter()
+    plies = 0
+    data = bytearray() if options['format'] == 'moves' else []
+    for _ in range(games):
+        board = BoardRep.from_snapshot(start)
+        result, moves, fens = play_game(board, rng, options['max_plies'], options['depth'], options['random_plies'],
+                                        options['samples'] if options['format'] == 'fens' else 0)
+        results[result] += 1
+        plies += len(moves)
+        if options['format'] == 'moves':
+            data += GAME_HEADER.pack(RESULTS.index(result), len(moves))
+            data += array('H', [mv & MOVE_MASK for mv in moves]).tobytes()
+        else:
+            data.extend("{} ;result {}\n".format(fen, result) for fen in fens)
+    return (bytes(data) if options['format'] == 'moves' else "".join(data)), (games, plies, results)
+
+
+def _open_output(path, binary):
+    # Output file, compressed by extension (.gz, .bz2, .xz) as in positions.open_source
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'wb') if binary else opener(path, 'wt', encoding='utf-8')
+
+
+def generate_games(path, games, workers=None, chunk_size=100, seed=0, output_format='moves', fen=None, samples=4,
+                   max_plies=400, depth=0, random_plies=8, report_seconds=10.0, output=None):
+    """ Play games in worker processes and stream them to path chunk by chunk
+
+    At most a few chunks per worker are in flight (see positions.map_chunks), so memory does not grow with the
+    number of games.
+
+    Parameters:
+    path -- Output file (.gz, .bz2 or .xz to compress)
+    games -- Number of games
+    workers -- Worker processes (None = number of cores, 1 = play in this process)
+    chunk_size -- Games per chunk (the unit of work of a worker and of writing)
+    seed -- Seed of the run, every chunk plays with its own random.Random derived from it
+    output_format -- 'moves' or 'fens' (see FORMATS above)
+    fen -- Start position of all games (None = start position)
+    samples -- Positions per game written in the fens format
+    max_plies, depth, random_plies -- See play_game
+    report_seconds -- Seconds between progress lines (None = no progress lines)
+    output -- Text stream for progress and the final summary (None = stderr)
+
+    Returns:
+    Dict with games, plies, results (Counter of RESULTS), seconds and games_per_second
+    """
+    if output_format not in FORMATS:
+        raise ValueError("Unknown format: " + str(output_format))
+    output = output or sys.stderr
+    start = BoardRep.read_fen(fen).snapshot() if fen else BoardRep.read_fen().snapshot()
+    options = {'format': output_format, 'samples': samples, 'max_plies': max_plies, 'depth': depth,
+               'random_plies': random_plies}
+    tasks = ((start, seed, chunk, min(chunk_size, games - first), options)
+             for chunk, first in enumerate(range(0, games, chunk_size)))
+
+    summary = {'games': 0, 'plies': 0, 'results': Counter()}
+    begin = time.perf_counter()
+    next_report = begin + report_seconds if report_seconds else None
+    with _open_output(path, output_format == 'moves') as out:
+        if output_format == 'moves':
+            out.write(MAGIC + start)
+        for data, (played, plies, results) in map_chunks(_play_chunk, tasks, workers):
+            out.write(data)
+            summary['games'] += played
+            summary['plies'] += plies
+            summary['results'].update(results)
+            if next_report is not None and time.perf_counter() >= next_report:
+                elapsed = time.perf_counter() - begin
+                print("{} games, {:.1f} games/s".format(summary['games'], summary['games'] / elapsed), file=output)
+                next_report += report_seconds
+
+    summary['seconds'] = time.perf_counter() - begin
+    summary['games_per_second'] = summary['games'] / summary['seconds'] if summary['seconds'] else 0.0
+    print("{} games ({} plies) in {:.1f} s, {:.1f} games/s, results {}".format(
+        summary['games'], summary['plies'], summary['seconds'], summary['games_per_second'],
+        ", ".join("{} {}".format(r, summary['results'][r]) for r in RESULTS)), file=output)
+    return summary
+
+
+def read_games(path):
+    """ Generator of the games of a file in the moves format as (start FEN, result, moves in UCI notation) """
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    with opener(path, 'rb') as games_file:
+        header = games_file.read(len(MAGIC) + SNAPSHOT_SIZE)
+        if not header.startswith(MAGIC):
+            raise ValueError(path + " is not a games file")
+        fen = BoardRep.from_snapshot(header[len(MAGIC):]).get_fen()
+        while True:
+            game_header = games_file.read(GAME_HEADER.size)
+            if not game_header:
+                return
+            result, plies = GAME_HEADER.unpack(game_header)
+            moves = array('H')
+            moves.frombytes(games_file.read(2 * plies))
+            yield fen, RESULTS[result], [move_to_uci(mv) for mv in moves]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Play random or fixed depth games in parallel and write them out")
+    parser.add_argument('path', help="Output file (.gz, .bz2 or .xz to compress)")
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('-c', '--chunk-size', type=int, default=100, help="Games per chunk")
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-f', '--format', choices=FORMATS, default='moves')
+    parser.add_argument('--fen', default=None, help="Start position (default: start position)")
+    parser.add_argument('--samples', type=int, default=4, help="Positions per game in the fens format")
+    parser.add_argument('--max-plies', type=int, default=400)
+    parser.add_argument('-d', '--depth', type=int, default=0, help="Search depth of the moves (0 = random moves)")
+    parser.add_argument('--random-plies', type=int, default=8, help="Random opening plies when searching")
+    options = parser.parse_args(args)
+    generate_games(options.path, options.games, options.workers, options.chunk_size, options.seed, options.format,
+                   options.fen, options.samples, options.max_plies, options.depth, options.random_plies)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import unittest
+import json
+import Board_and_moves as Chess
+import Bitboard
+
+
+class TestBitboardRep(unittest.TestCase):
+
+    def test_backend_selection(self):
+        board = Chess.BoardRep.read_fen(backend='bitboard')
+        self.assertIsInstance(board, Bitboard.BitboardRep)
+        self.assertIsInstance(Chess.BoardRep.read_fen(), Chess.BoardRep)
+        with self.assertRaises(ValueError):
+            Chess.BoardRep.read_fen(backend='nonexistent')
+
+    def test_fen_roundtrip(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Bitboard.BitboardRep.read_fen(fen)
+        self.assertEqual(fen, board.get_fen())
+        self.assertEqual(str(Chess.BoardRep.read_fen(fen)), str(board))
+
+    def test_snapshot(self):
+        # Snapshots are the same bytes for both backends
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - b6 3 40"]:
+            board = Bitboard.BitboardRep.read_fen(fen)
+            snapshot = board.snapshot()
+            self.assertEqual(Chess.BoardRep.read_fen(fen).snapshot(), snapshot)
+            self.assertEqual(fen, Bitboard.BitboardRep.from_snapshot(snapshot).get_fen())
+            self.assertEqual(fen, Chess.BoardRep.from_snapshot(snapshot).get_fen())
+
+    def test_board_interface(self):
+        # square_list is an attribute as in BoardRep (with FEN characters), a missing king is never in check
+        board = Bitboard.BitboardRep.read_fen("8/8/8/8/8/8/8/r3K3 w - - 0 1")
+        self.assertEqual('K', board.square_list[4])
+        self.assertEqual('r', board.square_list[0])
+        self.assertIsNone(board.square_list[63])
+        self.assertTrue(board.king_in_check(False))
+        self.assertFalse(board.king_in_check(True))
+        self.assertFalse(Chess.BoardRep.read_fen(board.get_fen()).king_in_check(True))
+
+    def test_do_move(self):
+        board = Bitboard.BitboardRep.read_fen("rn1qkb1r/p1pp1ppp/bp2pn2/8/4P3/5NPB/PPPP1P1P/RNBQK2R w KQkq - 0 1")
+
+        # Castling through check is not legal
+        self.assertFalse(board.do_move(board.find_move('e1', 'g1')))
+
+        # Walking into check is not legal
+        self.assertFalse(board.do_move(board.find_move('e1', 'f1')))
+
+        # Not even pseudo-legal
+        self.assertIsNone(board.find_move('e1', 'b4'))
+
+        fen = board.get_fen()
+        self.assertTrue(board.do_move(board.find_move('e4', 'e5')))
+        self.assertTrue(board.do_move(board.find_move('d7', 'd5')))
+        self.assertEqual('d6', Chess.BoardRep.NUM_TO_SQUARE[board.en_passant_square])
+        self.assertTrue(board.do_move(board.find_move('e5', 'd6')))
+        board.undo_move()
+        board.undo_move()
+        board.undo_move()
+        self.assertEqual(fen, board.get_fen())
+
+        # Castling resets the half move clock as in BoardRep
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 5 10"
+        for to in ['g1', 'c1']:
+            board = Bitboard.BitboardRep.read_fen(fen)
+            mailbox = Chess.BoardRep.read_fen(fen)
+            board.make_move(board.find_move('e1', to))
+            mailbox.make_move(mailbox.find_move('e1', to))
+            self.assertEqual(mailbox.get_fen(), board.get_fen())
+            self.assertEqual(0, board.half_move_count)
+
+    def test_perft(self):
+        # Compare node counts and splits against the reference files up to a node cap
+        for name in ['initposition', 'position2', 'position3', 'position4', 'position5', 'position6']:
+            with open('perft_test/{}.json'.format(name)) as json_file:
+                data = json.load(json_file)
+
+            board = Chess.BoardRep.read_fen(data["fen"], backend='bitboard')
+            for d in data["perft"]:
+                if d["nodes"] > 100000:
+                    break
+                nodes, split = board.perft(d["depth"], split=True)
+                self.assertEqual(d["nodes"], nodes)
+                if d["split"] is not None:
+                    self.assertEqual(d["split"], split)
+            self.assertEqual(data["fen"].strip(), board.get_fen())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import pickle
+import random
 import Board_and_moves as Chess
 
 
@@ -42,6 +44,81 @@ class TestBoardRep(unittest.TestCase):
         move = Chess.Move(s2n['e1'], s2n['b4'], sl[s2n['e1']])
         self.assertFalse(board.is_legal(move))
 
+    def test_move_encoding(self):
+        board = Chess.BoardRep.read_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq a3 0 1")
+        s2n = Chess.BoardRep.SQUARE_TO_NUM
+        sl = board.square_list
+
+        for move in board.pseudolegal_moves:
+            self.assertIsInstance(move, int)
+
+        # Views decode the packed moves and compare equal to views built from the old arguments
+        move = Chess.Move.from_code(board.find_move('b4', 'a3'))
+        self.assertEqual(Chess.Move(s2n['b4'], s2n['a3'], sl[s2n['b4']], capture='P', is_enpassant=True), move)
+        self.assertEqual(('P', 'P', True, 'xa3'), (move.moving_piece_FEN, move.capture, move.is_enpassant, move.fen()))
+
+        move = Chess.Move.from_code(board.find_move('e8', 'c8'))
+        self.assertEqual(Chess.Move(s2n['e8'], s2n['c8'], sl[s2n['e8']], is_castle=True), move)
+        self.assertEqual('O-O-O', move.fen())
+
+        board.do_move(board.find_move('h3', 'g2'))
+        board.do_move(board.find_move('a2', 'a3'))
+        move = Chess.Move.from_code(board.find_move('g2', 'h1', 'n'))
+        self.assertEqual(Chess.Move(s2n['g2'], s2n['h1'], sl[s2n['g2']], capture='R', promotion='n'), move)
+        self.assertEqual(('n', 'R', 'g2xh1=N', 'xh1=N'), (move.promotion, move.capture, str(move), move.fen()))
+        self.assertEqual('g2h1n', Chess.move_to_uci(move.code))
+
+        # do_move accepts views as well
+        self.assertTrue(board.do_move(move))
+        self.assertEqual(board.move_sequence[-1], move.code)
+
+    def test_lookup_tables(self):
+        s2n = Chess.BoardRep.SQUARE_TO_NUM
+        self.assertEqual({s2n['b3'], s2n['c2']}, set(Chess.KNIGHT_TARGETS[s2n['a1']]))
+        self.assertEqual(8, len(Chess.KING_TARGETS[s2n['e4']]))
+        self.assertEqual([s2n['e3'], s2n['e4']], Chess.PAWN_PUSHES[0][s2n['e2']])
+        self.assertEqual([s2n['e6']], Chess.PAWN_PUSHES[1][s2n['e7']][:1])
+        self.assertEqual([s2n['g6']], Chess.PAWN_CAPTURES[1][s2n['h7']])
+        self.assertEqual(27, sum(len(ray) for ray in Chess.QUEEN_RAYS[s2n['d4']]))
+        self.assertEqual([s2n['b2'], s2n['c3'], s2n['d4']], Chess.BISHOP_RAYS[s2n['a1']][0][:3])
+
+    def test_is_square_attacked(self):
+        board = Chess.BoardRep.read_fen("rn1qkb1r/p1pp1ppp/bp2pn2/8/4P3/5NPB/PPPP1P1P/RNBQK2R w KQkq - 0 1")
+        s2n = Chess.BoardRep.SQUARE_TO_NUM
+
+        self.assertTrue(board.is_square_attacked(s2n['f1'], True))  # Bishop a6
+        self.assertTrue(board.is_square_attacked(s2n['e4'], True))  # Knight f6
+        self.assertTrue(board.is_square_attacked(s2n['d6'], True))  # Pawn c7
+        self.assertFalse(board.is_square_attacked(s2n['d6'], False))
+        self.assertTrue(board.is_square_attacked(s2n['e6'], False))  # Bishop h3 through empty squares
+        self.assertFalse(board.is_square_attacked(s2n['e1'], True))
+        self.assertFalse(board.in_check)
+
+        board.do_move(board.find_move('h3', 'e6'))
+        self.assertFalse(board.in_check)
+        board.do_move(board.find_move('b8', 'c6'))
+        board.do_move(board.find_move('e6', 'f7'))
+        self.assertTrue(board.in_check)
+        board.undo_move()
+        self.assertFalse(board.in_check)
+
+    def test_generate_legal_moves(self):
+        # Compare with trial make/unmake of the bitboard backend (pins, checks, double check, en passant pins)
+        fen_list = [
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "8/8/8/KPp4r/8/8/8/7k w - c6 0 2",
+            "4k3/8/8/8/1b6/8/3P4/4K2r w - - 0 1",
+            "4k3/8/5n2/8/8/8/4r3/4K3 w - - 0 1",
+            "r3k2r/8/8/8/8/8/8/R2NK1bR w KQkq - 0 1",
+            "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        ]
+        for fen in fen_list:
+            board = Chess.BoardRep.read_fen(fen)
+            bitboard = Chess.BoardRep.read_fen(fen, backend='bitboard')
+            self.assertEqual(bitboard.perft(2, split=True), board.perft(2, split=True), fen)
+            self.assertEqual(board.perft(1), len(board.generate_legal_moves()))
+            self.assertEqual(fen, board.get_fen())
+
     def test_perft(self):
         # test perft(3) on six positions
 
@@ -54,6 +131,189 @@ class TestBoardRep(unittest.TestCase):
             board = Chess.BoardRep.read_fen(fen)
             self.assertEqual(res, board.perft(n))
 
+    def test_zobrist_key(self):
+        board = Chess.BoardRep.read_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        start_key = board.zobrist_key
+
+        # Castling, capture, double pawn push, en passant capture and promotion keep the key up to date
+        for frm, to, prom in [('e1', 'g1', None), ('c7', 'c5', None), ('d5', 'c6', None), ('h3', 'g2', None),
+                              ('c6', 'c7', None), ('g2', 'f1', 'q'), ('g1', 'f1', None),
+                              ('e8', 'g8', None), ('c7', 'c8', 'Q')]:
+            move = board.find_move(frm, to, prom)
+            self.assertTrue(board.do_move(move))
+            self.assertEqual(board.compute_zobrist_key(), board.zobrist_key)
+
+        while board.move_sequence:
+            board.undo_move()
+            self.assertEqual(board.compute_zobrist_key(), board.zobrist_key)
+        self.assertEqual(start_key, board.zobrist_key)
+
+        # Transposition gives the same key
+        board1 = Chess.BoardRep.read_fen()
+        board2 = Chess.BoardRep.read_fen()
+        for frm, to in [('g1', 'f3'), ('g8', 'f6'), ('b1', 'c3')]:
+            board1.do_move(board1.find_move(frm, to))
+        for frm, to in [('b1', 'c3'), ('g8', 'f6'), ('g1', 'f3')]:
+            board2.do_move(board2.find_move(frm, to))
+        self.assertEqual(board1.zobrist_key, board2.zobrist_key)
+
+    def test_undo_move(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Chess.BoardRep.read_fen(fen)
+
+        fens = [fen]
+        for frm, to in [('e1', 'g1'), ('c7', 'c5'), ('d5', 'c6'), ('e8', 'c8'), ('a2', 'a4'), ('b4', 'a3')]:
+            self.assertTrue(board.do_move(board.find_move(frm, to)))
+            fens.append(board.get_fen())
+        self.assertEqual(fens, board.fen_sequence)
+
+        # Castling rights, en passant square and move counters are restored without any FEN parsing
+        while board.move_sequence:
+            board.undo_move()
+            fens.pop()
+            self.assertEqual(fens[-1], board.get_fen())
+        board.undo_move()
+        self.assertEqual(fen, board.get_fen())
+
+    def test_perft_hashed(self):
+        board = Chess.BoardRep.read_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        table = Chess.PerftTable(1024)
+        self.assertEqual(2039, board.perft(2, table=table))
+        self.assertEqual(2039, board.perft(2, table=table))
+        self.assertGreater(table.hits, 0)
+        self.assertEqual((2039, board.perft(2, split=True)[1]), board.perft(2, split=True, hash_size=64))
+
+    def test_count_legal_moves(self):
+        # Checks, pins, en passant and castling positions
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                    "8/8/8/KPp4r/8/8/8/6k1 w - c6 0 2",
+                    "rnbqkbnr/ppp1pppp/8/1B1p4/4P3/8/PPPP1PPP/RNBQK1NR b KQkq - 1 2",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"]:
+            board = Chess.BoardRep.read_fen(fen)
+            self.assertEqual(len(board.generate_legal_moves()), board.count_legal_moves())
+            self.assertEqual(board.perft(2, bulk=False), board.perft(2))
+
+    def test_move_from_san(self):
+        board = Chess.BoardRep.read_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        for san, uci in [('O-O', 'e1g1'), ('O-O-O', 'e1c1'), ('Nxd7', 'e5d7'), ('dxe6', 'd5e6'), ('d6', 'd5d6'),
+                         ('Qxh3+', 'f3h3'), ('Ncb1', 'c3b1'), ('Nd1', 'c3d1'), ('gxh3', 'g2h3'), ('Qe7', None)]:
+            mv = board.move_from_san(san)
+            self.assertEqual(uci, mv and Chess.move_to_uci(mv))
+        board = Chess.BoardRep.read_fen("8/1P6/8/8/8/8/8/k1K5 w - - 0 1")
+        self.assertEqual('b7b8n', Chess.move_to_uci(board.move_from_san('b8=N')))
+        self.assertEqual('b7b8q', Chess.move_to_uci(board.move_from_san('b8Q#')))
+
+    def test_generate_moves_in_stages(self):
+        other = Chess.BoardRep.read_fen().generate_pseudolegal_moves()
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/8/8/KPp4r/8/8/8/6k1 w - c6 0 2",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"]:
+            board = Chess.BoardRep.read_fen(fen)
+            captures = board.generate_pseudolegal_moves(quiets=False)
+            quiets = board.generate_pseudolegal_moves(captures=False)
+            self.assertTrue(all(mv & (Chess.CAPTURE | Chess.PROMOTION_MASK) for mv in captures))
+            self.assertFalse(any(mv & (Chess.CAPTURE | Chess.PROMOTION_MASK) for mv in quiets))
+            self.assertEqual(sorted(board.generate_pseudolegal_moves()), sorted(captures + quiets))
+            legal = board.generate_legal_moves(quiets=False) + board.generate_legal_moves(captures=False)
+            self.assertEqual(sorted(board.generate_legal_moves()), sorted(legal))
+
+            self.assertTrue(all(board.is_pseudolegal(mv) for mv in captures + quiets))
+            self.assertFalse(any(board.is_pseudolegal(mv) for mv in other if mv not in captures + quiets))
+
+    def test_piece_lists(self):
+        board = Chess.BoardRep.read_fen("4k3/8/8/8/8/6n1/1p6/R3K2N w - - 0 1")
+        self.assertFalse(hasattr(board.square_list[0], '__dict__'))
+        rook = board.square_list[0]
+        knight = board.square_list[22]
+        pawn = board.square_list[9]
+
+        # Captured pieces and promoted pawns are the same objects after undo
+        self.assertTrue(board.do_move(board.find_move('h1', 'g3')))
+        self.assertTrue(board.do_move(board.find_move('b2', 'a1', 'q')))
+        self.assertIs(pawn, board.square_list[0])
+        self.assertEqual('q', pawn.piecetype)
+        self.assertEqual(1, board.piece_count['q'])
+        board.undo_move()
+        board.undo_move()
+        self.assertIs(rook, board.square_list[0])
+        self.assertIs(knight, board.square_list[22])
+        self.assertEqual('p', pawn.piecetype)
+
+        for piecetype, pieces in board.pieces.items():
+            for i, piece in enumerate(pieces):
+                self.assertEqual((piecetype, i), (piece.piecetype, piece.index))
+                self.assertIs(piece, board.square_list[piece.position])
+        self.assertEqual(Chess.BoardRep.read_fen(board.get_fen()).piece_count, board.piece_count)
+
+    def test_snapshot(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Chess.BoardRep.read_fen(fen)
+        snapshot = board.snapshot()
+        self.assertIsInstance(snapshot, bytes)
+        self.assertEqual(Chess.SNAPSHOT_SIZE, len(snapshot))
+        self.assertLess(len(pickle.dumps(snapshot)), 100)
+
+        copy = Chess.BoardRep.from_snapshot(snapshot)
+        self.assertEqual(fen, copy.get_fen())
+        self.assertEqual((board.zobrist_key, board.psqt, board.phase, board.in_check),
+                         (copy.zobrist_key, copy.psqt, copy.phase, copy.in_check))
+        self.assertEqual(sorted(board.generate_legal_moves()), sorted(copy.generate_legal_moves()))
+
+        # Equal positions give equal snapshots, played moves do not change the snapshot once undone
+        self.assertTrue(board.do_move(board.find_move('e5', 'f7')))
+        self.assertTrue(board.do_move(board.find_move('e8', 'f8')))
+        after = board.snapshot()
+        self.assertNotEqual(snapshot, after)
+        self.assertEqual(after, Chess.BoardRep.read_fen(board.get_fen()).snapshot())
+        self.assertEqual(board.get_fen(), Chess.BoardRep.from_snapshot(after).get_fen())
+        board.undo_move()
+        board.undo_move()
+        self.assertEqual(snapshot, board.snapshot())
+        self.assertEqual(1, len({snapshot, Chess.BoardRep.read_fen(fen).snapshot()}))
+
+        fen = "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - b6 312 1000"
+        self.assertEqual(fen, Chess.BoardRep.from_snapshot(Chess.BoardRep.read_fen(fen).snapshot()).get_fen())
+        with self.assertRaises(ValueError):
+            Chess.BoardRep.from_snapshot(snapshot[:64])
+
+    def test_evaluate(self):
+        # Same position with the colors swapped gives the same score for the side to move
+        board = Chess.BoardRep.read_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        mirrored = Chess.BoardRep.read_fen("r3k2r/pppbbppp/2n2q1P/1P2p3/3pn3/BN2PNP1/P1PPQPB1/R3K2R b KQkq - 0 1")
+        self.assertEqual(board.evaluate(), mirrored.evaluate())
+        self.assertEqual(0, Chess.BoardRep.read_fen().evaluate())
+        self.assertEqual(Chess.MAX_PHASE, Chess.BoardRep.read_fen().phase)
+        self.assertEqual((-3, 5), Chess.unpack_score(Chess.pack_score(-3, 5)))
+
+        # Incremental updates through captures, castling, en passant and promotions
+        random.seed(3)
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"]:
+            board = Chess.BoardRep.read_fen(fen)
+            for _ in range(60):
+                board.evaluate(verify=True)
+                if not board.test_random_move():
+                    break
+            while board.move_sequence:
+                board.undo_move()
+                board.evaluate(verify=True)
+            self.assertEqual(fen, board.get_fen())
+
+        board.psqt += 1
+        with self.assertRaises(AssertionError):
+            board.evaluate(verify=True)
+
+    def test_see(self):
+        for fen, move, value in [("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", ('e1', 'e5'), 100),
+                                 ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", ('d3', 'e5'), -220),
+                                 ("4k3/8/2p5/3p4/4P3/8/8/4K3 w - - 0 1", ('e4', 'd5'), 0),
+                                 ("4k3/8/2p5/3q4/8/8/3R4/3RK3 w - - 0 1", ('d2', 'd5'), 500),
+                                 ("r3k3/1P6/8/8/8/8/8/4K3 w - - 0 1", ('b7', 'a8', 'q'), 1300),
+                                 ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", ('e5', 'd6'), 100)]:
+            board = Chess.BoardRep.read_fen(fen)
+            self.assertEqual(value, board.see(board.find_move(*move)), fen)
+
 
 if __name__ == '__main__':
     unittest.main()
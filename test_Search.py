@@ -0,0 +1,210 @@
+import unittest
+import Board_and_moves as Chess
+import Search
+
+
+class TestSearch(unittest.TestCase):
+
+    def test_mate_in_one(self):
+        fen = "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+        board = Chess.BoardRep.read_fen(fen)
+        result = Search.Search(board).search(depth=3)
+        self.assertEqual('a1a8', Chess.move_to_uci(result.best_move))
+        self.assertEqual(Search.MATE - 1, result.score)
+        self.assertEqual(fen, board.get_fen())
+
+    def test_mate_in_two(self):
+        board = Chess.BoardRep.read_fen("2k5/8/2K5/8/8/8/8/1R6 w - - 0 1")
+        result = Search.Search(board).search(depth=4)
+        self.assertEqual(Search.MATE - 3, result.score)
+        self.assertEqual(3, len(result.pv))
+
+    def test_no_legal_moves(self):
+        result = Search.Search(Chess.BoardRep.read_fen("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")).search(depth=2)
+        self.assertIsNone(result.best_move)
+        self.assertEqual(0, result.score)
+
+    def test_principal_variation(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Chess.BoardRep.read_fen(fen)
+        iterations = []
+        result = Search.Search(board).search(depth=3, info=iterations.append)
+        self.assertEqual([1, 2, 3], [r.depth for r in iterations])
+        self.assertEqual(result.best_move, result.pv[0])
+
+        # The principal variation is a sequence of legal moves, ending in a position with the search score (after
+        # resolving the captures there)
+        for mv in result.pv:
+            self.assertIn(mv, board.generate_legal_moves())
+            board.make_move(mv)
+        sign = -1 if len(result.pv) % 2 else 1
+        leaf = Search.Search(board).quiescence(-Search.INFINITY, Search.INFINITY, len(result.pv))
+        self.assertEqual(result.score, sign * leaf)
+
+    def test_aspiration_and_pvs_keep_the_score(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        full_window = Search.Search(Chess.BoardRep.read_fen(fen))
+        full_window.ASPIRATION_WINDOW = 0
+        self.assertEqual(full_window.search(depth=3).score,
+                         Search.Search(Chess.BoardRep.read_fen(fen)).search(depth=3).score)
+
+    def test_limits(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Chess.BoardRep.read_fen(fen)
+        result = Search.Search(board).search(nodes=2000)
+        self.assertLessEqual(result.nodes, 2000)
+        self.assertIsNotNone(result.best_move)
+        self.assertEqual(fen, board.get_fen())
+
+        result = Search.Search(board).search(seconds=0.2)
+        self.assertLess(result.seconds, 1)
+        self.assertGreaterEqual(result.depth, 1)
+        self.assertEqual(fen, board.get_fen())
+
+    def test_repetition_is_a_draw(self):
+        board = Chess.BoardRep.read_fen("7k/8/8/8/8/8/8/K7 w - - 0 1")
+        for frm, to in [('a1', 'a2'), ('h8', 'h7'), ('a2', 'a1'), ('h7', 'h8')]:
+            board.do_move(board.find_move(frm, to))
+        self.assertTrue(Search.Search(board).is_draw())
+
+    def test_transposition_table(self):
+        tt = Search.TranspositionTable(1)
+        self.assertEqual(1 << 20, len(tt) * tt.ENTRY_BYTES)
+        self.assertIsNone(tt.probe(12345))
+
+        tt.store(12345, 5, tt.LOWER, -Search.MATE + 3, 777)
+        self.assertEqual((5, tt.LOWER, -Search.MATE + 3, 777), tt.probe(12345))
+
+        # Same position: replaced, but the best move is kept when the new result has none
+        tt.store(12345, 6, tt.UPPER, 40, 0)
+        self.assertEqual((6, tt.UPPER, 40, 777), tt.probe(12345))
+
+        # Full bucket: the shallowest entry goes, unless there are entries of an earlier search
+        keys = [12345 + i * tt.buckets for i in range(1, 4)]
+        for depth, key in zip([3, 1, 4], keys):
+            tt.store(key, depth, tt.EXACT, 0, 1)
+        tt.store(12345 + 4 * tt.buckets, 2, tt.EXACT, 0, 1)
+        self.assertIsNone(tt.probe(keys[1]))
+        self.assertEqual(1, tt.collisions)
+        tt.new_search()
+        tt.store(12345 + 5 * tt.buckets, 0, tt.EXACT, 0, 1)
+        self.assertEqual(2, tt.collisions)
+        self.assertEqual(0, tt.hashfull())
+        self.assertEqual((2, 4), (tt.hits, tt.probes))
+
+    def test_search_with_transposition_table(self):
+        fen = "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"
+        without = Search.Search(Chess.BoardRep.read_fen(fen), hash_mb=0).search(depth=5)
+        search = Search.Search(Chess.BoardRep.read_fen(fen), hash_mb=1)
+        result = search.search(depth=5)
+        self.assertEqual(without.score, result.score)
+        self.assertLess(result.nodes, without.nodes)
+        self.assertGreater(search.tt.hits, 0)
+
+        # Mate scores are stored relative to the node, so they come out the same at another distance from the root
+        search = Search.Search(Chess.BoardRep.read_fen("2k5/8/2K5/8/8/8/8/1R6 w - - 0 1"), hash_mb=1)
+        self.assertEqual(Search.MATE - 3, search.search(depth=4).score)
+        self.assertEqual(Search.MATE - 3, search.search(depth=4).score)
+
+    def test_quiescence(self):
+        # The pawn on d5 is defended: taking it with the queen loses the queen once the capture is resolved
+        board = Chess.BoardRep.read_fen("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1")
+        self.assertNotEqual('d1d5', Chess.move_to_uci(Search.Search(board).search(depth=1).best_move))
+
+        # Horizon nodes are counted once (by negamax), quiescence nodes are the captures searched beyond the horizon.
+        # At the start there are no captures: the root, its 20 moves and a few re-searches of the null window search.
+        search = Search.Search(Chess.BoardRep.read_fen())
+        self.assertLess(search.search(depth=1).nodes, 30)
+        self.assertEqual(0, search.quiescence_nodes)
+
+        # Pruning captures that lose material by SEE leaves far fewer captures to search, with the same result
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        counts = []
+        results = []
+        for see_pruning in (False, True):
+            search = Search.Search(Chess.BoardRep.read_fen(fen))
+            search.SEE_PRUNING = see_pruning
+            results.append(search.search(depth=2))
+            counts.append(search.quiescence_nodes)
+        self.assertLess(counts[1], counts[0] * 0.5)
+        self.assertEqual((results[0].score, results[0].pv), (results[1].score, results[1].pv))
+
+    def test_move_ordering(self):
+        board = Chess.BoardRep.read_fen("4k3/8/2q2r2/1P1p4/8/8/8/R2QK2R w - - 0 1")
+        ordering = Search.MoveOrdering()
+        moves = board.generate_legal_moves()
+        quiet = [mv for mv in moves if not mv & Chess.CAPTURE]
+        ordered = [Chess.move_to_uci(mv) for mv in ordering.order(moves, 0)]
+        # Most valuable victim first (pawn takes queen before queen takes pawn)
+        self.assertEqual(['b5c6', 'd1d5'], ordered[:2])
+
+        # A quiet cutoff makes the move a killer and the counter move of the previous move, captures are only counted
+        killer, other = quiet[0], quiet[1]
+        ordering.update(killer, 0, 3, 0, previous_move=other)
+        self.assertEqual(killer, ordering.killers[0])
+        self.assertEqual(killer, ordering.counter_moves[other & 4095])
+        self.assertEqual(9, ordering.history[killer & 4095])
+        capture = [mv for mv in moves if mv & Chess.CAPTURE][0]
+        ordering.update(capture, 3, 3, 0)
+        self.assertEqual(killer, ordering.killers[0])
+        self.assertEqual((2, 1, 0.5), (ordering.cutoffs, ordering.first_move_cutoffs, ordering.first_move_cutoff_rate))
+
+        ordered = ordering.order(moves, 0, tt_move=other)
+        self.assertEqual(other, ordered[0])
+        self.assertEqual(killer, [mv for mv in ordered if not mv & Chess.CAPTURE][1])
+
+        ordering.new_search()
+        self.assertEqual((0, 0, 4), (ordering.killers[0], ordering.cutoffs, ordering.history[killer & 4095]))
+
+        # Better ordering means fewer nodes for the same result
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        search = Search.Search(Chess.BoardRep.read_fen(fen))
+        search.search(depth=3)
+        self.assertGreater(search.ordering.first_move_cutoff_rate, 0.8)
+
+    def test_staged_move_generation(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Chess.BoardRep.read_fen(fen)
+        ordering = Search.MoveOrdering()
+        legal = board.generate_legal_moves()
+        quiet = [mv for mv in legal if not mv & (Chess.CAPTURE | Chess.PROMOTION_MASK)]
+        ordering.update(quiet[0], 0, 2, 0)
+        illegal_killer = Chess.BoardRep.read_fen().generate_legal_moves()[0]
+        ordering.update(illegal_killer, 0, 2, 0)
+
+        # Every legal move exactly once, in the same order as sorting them all
+        for tt_move in (None, quiet[5]):
+            staged = list(ordering.staged(board, 0, tt_move))
+            self.assertEqual(sorted(legal), sorted(staged))
+            self.assertEqual(ordering.order(legal, 0, tt_move), staged)
+
+        # A cutoff on the hash move or a capture generates no quiet moves
+        generated = []
+        generate = board.generate_pseudolegal_moves
+
+        def recording_generate(captures=True, quiets=True, pieces=None):
+            if pieces is None:
+                generated.append((captures, quiets))
+            return generate(captures, quiets, pieces)
+
+        board.generate_pseudolegal_moves = recording_generate
+        moves = ordering.staged(board, 0, quiet[5])
+        next(moves)
+        self.assertEqual([], generated)
+        next(moves)
+        self.assertEqual([(True, False)], generated)
+        del board.generate_pseudolegal_moves
+
+        # Same search result with and without stages
+        results = []
+        for staged in (False, True):
+            search = Search.Search(Chess.BoardRep.read_fen(fen))
+            search.STAGED_MOVES = staged
+            results.append(search.search(depth=3).score)
+        self.assertEqual(results[0], results[1])
+        board = Chess.BoardRep.read_fen("2k5/8/2K5/8/8/8/8/1R6 w - - 0 1")
+        self.assertEqual(Search.MATE - 3, Search.Search(board).search(depth=4).score)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import json
+import Board_and_moves as Chess
+
+try:
+    import numpy
+    import batch
+except ImportError:
+    numpy = None
+
+FILES = ['initposition', 'position2', 'position3', 'position4', 'position5', 'position6']
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestPositionBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.fens = []
+        for name in FILES:
+            with open('perft_test/{}.json'.format(name)) as json_file:
+                self.fens.append(json.load(json_file)["fen"])
+        self.boards = [Chess.BoardRep.read_fen(fen) for fen in self.fens]
+        self.batch = batch.PositionBatch.from_fens(self.fens)
+
+    def test_piece_codes(self):
+        codes = self.batch.piece_codes()
+        for board, row in zip(self.boards, codes):
+            expected = [-1 if piece is None else Chess.BoardRep.PIECES.index(piece.piecetype)
+                        for piece in board.square_list]
+            self.assertEqual(expected, row.tolist())
+
+    def test_attack_masks(self):
+        masks = self.batch.attack_masks()
+        for board, row in zip(self.boards, masks):
+            for color in (0, 1):
+                expected = sum(1 << sq for sq in range(64) if board.is_square_attacked(sq, bool(color)))
+                self.assertEqual(expected, int(row[color]))
+
+    def test_move_counts(self):
+        self.assertEqual([len(board.generate_pseudolegal_moves()) for board in self.boards],
+                         self.batch.pseudolegal_counts().tolist())
+        self.assertEqual([board.count_legal_moves() for board in self.boards], self.batch.legal_counts().tolist())
+
+    def test_perft(self):
+        for depth in range(4):
+            self.assertEqual([board.perft(depth) for board in self.boards], self.batch.perft(depth).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import tempfile
+import random
+import Board_and_moves as Chess
+import Search
+import bitbase
+
+
+class TestBitbase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        bitbase.build(cls.directory.name)
+        cls.bitbases = bitbase.Bitbases(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.bitbases.close()
+        cls.directory.cleanup()
+
+    def test_probe(self):
+        self.assertEqual(3, len(self.bitbases))
+        for fen, result in [("4k3/8/4K3/4P3/8/8/8/8 w - - 0 1", bitbase.WIN),  # King in front of the pawn on the 6th
+                            ("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1", bitbase.LOSS),
+                            ("8/8/8/4k3/8/8/4P3/4K3 w - - 0 1", bitbase.DRAW),
+                            ("k7/8/8/8/8/8/P7/7K w - - 0 1", bitbase.DRAW),  # Rook pawn, king in the corner
+                            ("7k/8/8/8/8/8/P7/K7 b - - 0 1", bitbase.LOSS),  # King outside the square of the pawn
+                            ("8/8/8/8/8/8/p7/K1k5 b - - 0 1", bitbase.DRAW),  # The same for black, stalemate
+                            ("8/8/8/8/8/k7/1R6/7K b - - 0 1", bitbase.DRAW),  # Hanging rook
+                            ("8/8/8/8/8/k7/1R6/7K w - - 0 1", bitbase.WIN),
+                            ("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1", bitbase.DRAW),  # Stalemate
+                            ("k7/2Q5/1K6/8/8/8/8/8 w - - 0 1", bitbase.WIN),
+                            ("1k6/8/1K6/8/8/8/8/7q w - - 0 1", bitbase.LOSS),
+                            ("8/8/8/8/8/8/8/k1K5 w - - 0 1", None),
+                            ("k7/8/8/8/8/8/N7/7K w - - 0 1", None),
+                            ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", None)]:
+            self.assertEqual(result, self.bitbases.probe(Chess.BoardRep.read_fen(fen)), fen)
+
+    def test_consistent_with_move_generation(self):
+        # The result of a position is the best result over its legal moves (checked with BoardRep's move generation)
+        rng = random.Random(2)
+        checked = 0
+        while checked < 300:
+            wk, bk, sq = rng.sample(range(64), 3)
+            piece = rng.choice('QRPqrp')
+            squares = [None] * 64
+            squares[wk], squares[bk], squares[sq] = 'K', 'k', piece
+            ranks = ["".join(p or '1' for p in squares[8 * r:8 * r + 8]) for r in range(7, -1, -1)]
+            board = Chess.BoardRep.read_fen("/".join(ranks) + " " + rng.choice('wb') + " - - 0 1")
+            if piece in 'Pp' and not 8 <= sq < 56 or wk in Chess.KING_TARGETS[bk] or \
+                    board.king_in_check(not board.side_to_move):
+                continue
+            checked += 1
+
+            moves = board.generate_legal_moves()
+            if not moves:
+                expected = bitbase.LOSS if board.in_check else bitbase.DRAW
+            else:
+                expected = bitbase.LOSS
+                for mv in moves:
+                    board.make_move(mv)
+                    expected = max(expected, -(self.bitbases.probe(board) or bitbase.DRAW))
+                    board.unmake_move()
+            self.assertEqual(expected, self.bitbases.probe(board), board.get_fen())
+
+    def test_search(self):
+        # Winning the rook converts into a won KQK, also when the search can not see the mate
+        board = Chess.BoardRep.read_fen("8/8/2k5/8/8/2r5/3QK3/8 w - - 0 1")
+        result = Search.Search(board, bitbases=self.bitbases).search(depth=3)
+        self.assertEqual('d2c3', Chess.move_to_uci(result.best_move))
+        self.assertGreater(result.score, Search.KNOWN_WIN)
+
+        board = Chess.BoardRep.read_fen("8/8/8/8/8/8/p7/K1k5 b - - 0 1")
+        self.assertEqual(0, Search.Search(board, bitbases=self.bitbases).search(depth=4).score)
+
+        # In the ending itself the search still looks for the mate
+        board = Chess.BoardRep.read_fen("k7/8/1K6/8/8/8/8/7R w - - 0 1")
+        self.assertEqual(Search.MATE - 1, Search.Search(board, bitbases=self.bitbases).search(depth=3).score)
+
+
+if __name__ == '__main__':
+    unittest.main()
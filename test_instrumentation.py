@@ -0,0 +1,61 @@
+import unittest
+import io
+import os
+import tempfile
+import Board_and_moves as Chess
+import instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_counters(self):
+        board = Chess.BoardRep.read_fen(backend='instrumented')
+        self.assertIsInstance(board, instrumentation.InstrumentedBoardRep)
+        self.assertEqual(8902, board.perft(3))
+        statistics = board.statistics
+        # 20 + 400 positions made, the 8902 leaves are only counted (bulk counting)
+        self.assertEqual(420, statistics.nodes)
+        self.assertEqual(420, statistics.calls['make'])
+        self.assertEqual(420, statistics.calls['unmake'])
+        self.assertEqual(421, statistics.calls['perft'])
+        self.assertEqual(421, statistics.generate_calls)
+        self.assertEqual(20 + 400 + 8902, statistics.legal_generated)
+        self.assertTrue(all(seconds >= 0 for seconds in statistics.times.values()))
+        self.assertIn('legality', statistics.report())
+
+        statistics.reset()
+        self.assertEqual(0, statistics.nodes)
+        self.assertEqual(0.0, sum(statistics.times.values()))
+
+    def test_do_move(self):
+        # The knight on d2 is pinned: moving it is played and rolled back, a rook move to b2 is refused outright
+        board = Chess.BoardRep.read_fen("3rk3/8/8/8/8/8/3N4/R2K3R w - - 0 1")
+        statistics = instrumentation.instrument(board)
+        self.assertIsInstance(board, instrumentation.InstrumentedBoardRep)
+        self.assertFalse(board.do_move(board.find_move('d2', 'f3')))
+        self.assertFalse(board.do_move(Chess.encode_move(0, 9, 'R')))
+        self.assertTrue(board.do_move(board.find_move('a1', 'a8')))
+        self.assertEqual((1, 1, 1), (statistics.legal_moves, statistics.rolled_back_moves, statistics.rejected_moves))
+        self.assertEqual(1, statistics.nodes)
+        self.assertIs(statistics, instrumentation.instrument(board))
+
+        # Instrumented boards play the same as plain ones
+        self.assertEqual(Chess.BoardRep.read_fen(board.get_fen()).perft(2), board.perft(2))
+
+    def test_profile_perft(self):
+        output = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'perft.prof')
+            result = instrumentation.profile_perft(depth=2, limit=5, profile_path=path, output=output)
+            self.assertTrue(os.path.getsize(path) > 0)
+        self.assertEqual(400, result['nodes'])
+        self.assertEqual(20, result['statistics'].nodes)
+        self.assertGreater(result['memory_peak'], 0)
+        text = output.getvalue()
+        self.assertIn("perft(2) = 400", text)
+        self.assertIn("function calls", text)
+        self.assertIn("memory peak", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+import Board_and_moves as Chess
+from parallel_perft import parallel_perft
+
+
+class TestParallelPerft(unittest.TestCase):
+
+    def test_matches_serial_perft(self):
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        expected = Chess.BoardRep.read_fen(fen).perft(2, split=True)
+
+        self.assertEqual(expected, parallel_perft(fen, 2, workers=2))
+        self.assertEqual(expected, parallel_perft(fen, 2, workers=2, split_depth=2))
+        self.assertEqual(expected, parallel_perft(fen, 2, workers=2, backend='bitboard'))
+        self.assertEqual((1, {}), parallel_perft(fen, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import tempfile
+import json
+import csv
+import os
+import perft_suite
+
+
+class TestPerftSuite(unittest.TestCase):
+
+    def test_read_suite(self):
+        positions = list(perft_suite.read_suite(['perft_test/suite.epd', 'perft_test/position3.json']))
+        self.assertEqual(7, len(positions))
+        name, fen, expected = positions[0]
+        self.assertEqual('suite.epd:1', name)
+        self.assertEqual("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", fen)
+        self.assertEqual({1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609, 6: 119060324}, expected)
+        self.assertEqual(positions[2][1:], positions[6][1:])
+
+    def test_run_suite(self):
+        positions = [('start', "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", {1: 20, 2: 400, 5: 1}),
+                     ('wrong', "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {1: 14, 2: 190, 3: 2812}),
+                     ('no counts', "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {})]
+        records = perft_suite.run_suite(positions, workers=2, max_depth=2, max_nodes=1000)
+        status = {(r['name'], r['depth']): (r['status'], r['nodes']) for r in records}
+        self.assertEqual({('start', 1): ('ok', 20), ('start', 2): ('ok', 400),
+                          ('wrong', 1): ('ok', 14), ('wrong', 2): ('fail', 191),
+                          ('no counts', 1): ('unknown', 14), ('no counts', 2): ('unknown', 191)}, status)
+
+    def test_timeout(self):
+        positions = [('slow', "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                      {1: 48, 6: 8031647685})]
+        records = perft_suite.run_suite(positions, workers=1, timeout=1.0)
+        self.assertEqual(['ok', 'timeout'], [r['status'] for r in records])
+
+    def test_error(self):
+        # The exception of the worker ends up in the record, the depths after it are skipped
+        positions = [('broken', "rnbqkbnr/ppxppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", {1: 20, 2: 400, 3: 8902})]
+        records = perft_suite.run_suite(positions, workers=1)
+        self.assertEqual([(1, 'error'), (2, 'skipped'), (3, 'skipped')], [(r['depth'], r['status']) for r in records])
+        self.assertIn("ValueError", records[0]['error'])
+        self.assertEqual([None, None], [r['error'] for r in records[1:]])
+
+    def test_reports(self):
+        records = perft_suite.run_suite(perft_suite.read_suite(['perft_test/suite.epd']), max_nodes=1000)
+        with tempfile.TemporaryDirectory() as directory:
+            perft_suite.write_json(records, os.path.join(directory, 'report.json'))
+            perft_suite.write_csv(records, os.path.join(directory, 'report.csv'))
+            with open(os.path.join(directory, 'report.json')) as json_file:
+                self.assertEqual(records, json.load(json_file))
+            with open(os.path.join(directory, 'report.csv')) as csv_file:
+                rows = list(csv.DictReader(csv_file))
+        self.assertEqual(len(records), len(rows))
+        self.assertEqual(perft_suite.REPORT_FIELDS, list(rows[0]))
+        self.assertEqual(0, perft_suite.main(['perft_test/suite.epd', '--max-nodes', '1000', '--quiet']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import tempfile
+import random
+import os
+import Board_and_moves as Chess
+import polyglot
+
+PGN = """[Event "Test"]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {main line} Nc6 (2... d6 3. d4 (3. Bc4)) 3. Bc4 Bc5 4. O-O Nf6 5. d3 O-O 1-0
+
+[Event "Test"]
+[Result "1/2-1/2"]
+
+1. e4 c5 2. Nf3 d6 3. d4 cxd4 4. Nxd4 Nf6 5. Nc3 a6 $1 1/2-1/2
+
+[Event "Test"]
+[Result "0-1"]
+
+1. d4 d5 2. c4 e6 ; comment until the end of the line
+3. Nc3 Nf6 4. Bg5 Be7 5. e3 O-O 0-1
+
+[Event "Test"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 1-0
+"""
+
+
+class TestPolyglot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pgn = os.path.join(self.directory.name, 'games.pgn')
+        self.book = os.path.join(self.directory.name, 'book.bin')
+        with open(self.pgn, 'w') as pgn_file:
+            pgn_file.write(PGN)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_polyglot_key(self):
+        # Keys from the Polyglot book format description
+        for moves, key in [("", 0x463B96181691FC9C),
+                           ("e2e4", 0x823C9B50FD114196),
+                           ("e2e4 d7d5", 0x0756B94461C50FB0),
+                           ("e2e4 d7d5 e4e5", 0x662FAFB965DB29D4),
+                           ("e2e4 d7d5 e4e5 f7f5", 0x22A48B5A8E47FF78),
+                           ("e2e4 d7d5 e4e5 f7f5 e1e2", 0x652A607CA3F242C1),
+                           ("e2e4 d7d5 e4e5 f7f5 e1e2 e8f7", 0x00FDD303C946BDD9),
+                           ("a2a4 b7b5 h2h4 b5b4 c2c4", 0x3C8123EA7B067637),
+                           ("a2a4 b7b5 h2h4 b5b4 c2c4 b4c3 a1a3", 0x5C3F9B829B279560)]:
+            board = Chess.BoardRep.read_fen()
+            for uci in moves.split():
+                board.make_move(board.move_from_uci(uci))
+            self.assertEqual(key, polyglot.polyglot_key(board))
+
+    def test_read_pgn(self):
+        games = list(polyglot.read_pgn(self.pgn))
+        self.assertEqual(4, len(games))
+        headers, moves = games[0]
+        self.assertEqual({'Event': 'Test', 'White': 'A', 'Black': 'B', 'Result': '1-0'}, headers)
+        self.assertEqual("e4 e5 Nf3 Nc6 Bc4 Bc5 O-O Nf6 d3 O-O".split(), moves)
+        self.assertEqual("d4 d5 c4 e6 Nc3 Nf6 Bg5 Be7 e3 O-O".split(), games[2][1])
+
+    def test_build_and_probe(self):
+        self.assertEqual(0, polyglot.build_book([self.pgn], self.book, max_ply=0))
+        with polyglot.PolyglotBook(self.book) as book:
+            self.assertEqual(0, len(book))
+            self.assertIsNone(book.choose(Chess.BoardRep.read_fen()))
+
+        polyglot.build_book([self.pgn], self.book, max_ply=12)
+        with polyglot.PolyglotBook(self.book) as book:
+            board = Chess.BoardRep.read_fen()
+            # Won twice and drawn once by white, lost by white
+            self.assertEqual([(board.move_from_uci('e2e4'), 5)], book.moves(board))
+            self.assertEqual(board.move_from_uci('e2e4'), book.choose(board))
+
+            for uci in "e2e4 e7e5 g1f3 b8c6".split():
+                board.make_move(board.move_from_uci(uci))
+            self.assertEqual({'f1c4': 2, 'f1b5': 2}, {Chess.move_to_uci(mv): w for mv, w in book.moves(board)})
+            rng = random.Random(1)
+            self.assertEqual({'f1c4', 'f1b5'}, {Chess.move_to_uci(book.choose(board, rng=rng)) for _ in range(50)})
+
+            # Castling is stored as king takes rook, and played as a normal castling move
+            for uci in "f1c4 f8c5".split():
+                board.make_move(board.move_from_uci(uci))
+            self.assertEqual('e1g1', Chess.move_to_uci(book.choose(board, best=True)))
+
+            board = Chess.BoardRep.read_fen("8/8/8/8/8/8/8/K6k w - - 0 1")
+            self.assertIsNone(book.choose(board))
+
+        self.assertEqual(0, polyglot.main(['probe', self.book]))
+
+    def test_compact_pgn(self):
+        # Move numbers written against the moves and castling with zeros
+        with open(self.pgn, 'w') as pgn_file:
+            pgn_file.write('[Result "1-0"]\n\n1.e4 e5 2.Nf3 Nc6 3.Bc4 Bc5 4.0-0 Nf6 5.d3 0-0 6. c3 6...d6 1-0\n')
+        self.assertEqual("e4 e5 Nf3 Nc6 Bc4 Bc5 O-O Nf6 d3 O-O c3 d6".split(), next(polyglot.read_pgn(self.pgn))[1])
+
+        # White's six moves (black lost, so its moves get no weight)
+        self.assertEqual(6, polyglot.build_book([self.pgn], self.book, max_ply=20))
+        with polyglot.PolyglotBook(self.book) as book:
+            board = Chess.BoardRep.read_fen()
+            self.assertEqual([(board.move_from_uci('e2e4'), 2)], book.moves(board))
+            for uci in "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5".split():
+                board.make_move(board.move_from_uci(uci))
+            self.assertEqual([('e1g1', 2)], [(Chess.move_to_uci(mv), w) for mv, w in book.moves(board)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+import pickle
+import gzip
+import io
+import os
+import Board_and_moves as Chess
+import positions
+
+EPD = """# comment
+r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1 ;D1 48 ;D2 2039
+
+rnbqkb1r/pppppppp/5n2/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - bm e5; id "test; 2"; hmvc 1; fmvn 2;
+8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -
+"""
+
+
+def count_moves(records):
+    # Worker function for map_chunks (module level, so it can be pickled)
+    return [record.board.count_legal_moves() for record in records]
+
+
+class TestPositions(unittest.TestCase):
+
+    def test_parse_line(self):
+        record = positions.parse_line("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 3 40 ;D1 14 ;D2 191", 7)
+        self.assertEqual("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 3 40", record.fen)
+        self.assertEqual({'D1': '14', 'D2': '191'}, record.operations)
+        self.assertEqual(7, record.line_number)
+        self.assertFalse(record.side_to_move)
+
+        record = positions.parse_line('4k3/8/8/8/8/8/8/4K3 b - - bm Kd7; id "a; b"; hmvc 12; fmvn 30;')
+        self.assertEqual("4k3/8/8/8/8/8/8/4K3 b - - 12 30", record.fen)
+        self.assertEqual({'bm': 'Kd7', 'id': 'a; b', 'hmvc': '12', 'fmvn': '30'}, record.operations)
+        self.assertTrue(record.side_to_move)
+
+        self.assertIsNone(positions.parse_line("   \n"))
+        self.assertIsNone(positions.parse_line("# 4k3/8/8/8/8/8/8/4K3 b - -"))
+        with self.assertRaises(ValueError):
+            positions.parse_line("not a position at all")
+
+    def test_lazy_board(self):
+        record = positions.parse_line("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        self.assertIsNone(record._board)
+        board = record.board
+        self.assertIs(board, record.board)
+        self.assertIsNone(board._pseudolegal_moves)  # read_fen leaves move generation until it is needed
+        self.assertEqual(48, len(board.pseudolegal_moves))
+        self.assertEqual(48, board.count_legal_moves())
+
+        copy = pickle.loads(pickle.dumps(record))
+        self.assertEqual((record.fen, record.operations), (copy.fen, copy.operations))
+        self.assertIsNone(copy._board)
+
+    def test_stream_positions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'suite.epd')
+            with open(path, 'w') as epd_file:
+                epd_file.write(EPD)
+            with gzip.open(path + '.gz', 'wt') as epd_file:
+                epd_file.write(EPD)
+
+            records = list(positions.stream_positions(path))
+            self.assertEqual([2, 4, 5], [record.line_number for record in records])
+            self.assertEqual("rnbqkb1r/pppppppp/5n2/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 1 2", records[1].fen)
+            self.assertEqual("test; 2", records[1].operations['id'])
+            self.assertEqual("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", records[2].fen)
+            self.assertEqual([r.fen for r in records], [r.fen for r in positions.stream_positions(path + '.gz')])
+
+        lines = io.StringIO(EPD + "garbage\n")
+        with self.assertRaises(ValueError):
+            list(positions.stream_positions(lines))
+        self.assertEqual(3, len(list(positions.stream_positions(EPD.splitlines() + ["garbage"], skip_invalid=True))))
+
+    def test_chunks(self):
+        records = positions.stream_positions(EPD.splitlines() * 5)
+        chunks = list(positions.chunked(records, 4))
+        self.assertEqual([4, 4, 4, 3], [len(chunk) for chunk in chunks])
+
+        expected = [count_moves(chunk) for chunk in chunks]
+        self.assertEqual(expected, list(positions.map_chunks(count_moves, iter(chunks), workers=2, max_pending=2)))
+        self.assertEqual(expected, list(positions.map_chunks(count_moves, iter(chunks), workers=1)))
+        self.assertEqual([48, 30, 14], expected[0][:3])
+
+
+if __name__ == '__main__':
+    unittest.main()
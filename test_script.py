@@ -1,5 +1,4 @@
 from Board_and_moves import *
-import cProfile
 
 
 def run_random_games(n=50, verbose=0):
@@ -10,10 +9,10 @@ def run_random_games(n=50, verbose=0):
 
         if verbose >= 1:
             if a.half_move_count <= 100:
-                print(color[a.side_to_move] + " to move and no pseudo-legal moves:")
+                print(color[a.side_to_move] + " to move and no legal moves:")
                 print(a)
                 if verbose == 2:
-                    print(a.move_sequence)
+                    print([Move.from_code(mv) for mv in a.move_sequence])
                     print()
                 else:
                     print()
@@ -21,15 +20,12 @@ def run_random_games(n=50, verbose=0):
                 if verbose == 2:
                     print("Draw by 50-move-rule:")
                     print(a)
-                    print(a.move_sequence)
+                    print([Move.from_code(mv) for mv in a.move_sequence])
                     print()
                 else:
                     print("Draw by 50-move-rule")
 
 
-# pr = cProfile.Profile()
-# pr.enable()
-
 # run_random_games(n=100, verbose=1)
 
 fen_list = [
@@ -44,7 +40,3 @@ for fen, val in fen_list:
     a = BoardRep.read_fen(fen)
     perft = a.perft(1)
     print("FEN: {} \t\tperft(1) = {:2d}\t\tcorrect = {:2d}".format(fen, perft, val))
-
-# pr.disable()
-# pr.dump_stats('test.prof')
-
@@ -0,0 +1,84 @@
+import unittest
+import tempfile
+import random
+import io
+import os
+import Board_and_moves as Chess
+import positions
+import selfplay
+
+
+class TestSelfplay(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_play_game(self):
+        # Mate in one for white is found by the search, a bare king position is drawn at once
+        board = Chess.BoardRep.read_fen("k7/8/1K6/8/8/8/8/7R w - - 0 1")
+        result, moves, fens = selfplay.play_game(board, random.Random(1), depth=2, random_plies=0, samples=5)
+        self.assertEqual(('1-0', ['h1h8']), (result, [Chess.move_to_uci(mv) for mv in moves]))
+        self.assertEqual(["k7/8/1K6/8/8/8/8/7R w - - 0 1", "k6R/8/1K6/8/8/8/8/8 b - - 1 1"], fens)
+
+        board = Chess.BoardRep.read_fen("8/8/3k4/8/8/4KN2/8/8 w - - 0 1")
+        result, moves, fens = selfplay.play_game(board, random.Random(1))
+        self.assertEqual(('1/2-1/2', 0, []), (result, len(moves), fens))
+
+        board = Chess.BoardRep.read_fen()
+        result, moves, fens = selfplay.play_game(board, random.Random(2), max_plies=10, samples=3)
+        self.assertEqual(('*', 10, 3), (result, len(moves), len(fens)))
+
+    def test_moves_format(self):
+        # Random games with two rooks against a king end in a mate now and then
+        output = io.StringIO()
+        fen = "4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1"
+        summary = selfplay.generate_games(self.path('games.bin'), 24, workers=1, chunk_size=10, seed=3,
+                                          max_plies=200, fen=fen, output=output)
+        self.assertEqual(24, summary['games'])
+        self.assertEqual(24, sum(summary['results'].values()))
+        self.assertEqual(1, summary['results']['1-0'])
+        self.assertIn("games/s", output.getvalue())
+
+        # The games only depend on the seed and the chunk size, not on the number of workers
+        selfplay.generate_games(self.path('games.bin.gz'), 24, workers=2, chunk_size=10, seed=3, max_plies=200,
+                                fen=fen, output=output)
+        games = list(selfplay.read_games(self.path('games.bin')))
+        self.assertEqual(games, list(selfplay.read_games(self.path('games.bin.gz'))))
+        self.assertEqual(summary['plies'], sum(len(moves) for _, _, moves in games))
+
+        # Every move is legal, and decisive results are mates
+        for start, result, moves in games:
+            self.assertEqual(fen, start)
+            board = Chess.BoardRep.read_fen(start)
+            for uci in moves:
+                mv = board.move_from_uci(uci)
+                self.assertIsNotNone(mv, uci)
+                board.make_move(mv)
+            if result in ('1-0', '0-1'):
+                self.assertFalse(board.generate_legal_moves())
+                self.assertTrue(board.in_check)
+                self.assertEqual(result == '1-0', board.side_to_move)
+            elif result == '*':
+                self.assertEqual(200, len(moves))
+
+    def test_fens_format(self):
+        summary = selfplay.generate_games(self.path('positions.epd'), 6, workers=1, chunk_size=4, output_format='fens',
+                                          samples=3, max_plies=100, output=io.StringIO())
+        records = list(positions.stream_positions(self.path('positions.epd')))
+        self.assertEqual(18, len(records))
+        self.assertEqual(sum(summary['results'].values()), 6)
+        for record in records:
+            self.assertIn(record.operations['result'], selfplay.RESULTS)
+            self.assertIsNotNone(record.board.kings[0])
+        with self.assertRaises(ValueError):
+            selfplay.generate_games(self.path('x'), 1, output_format='pgn')
+
+
+if __name__ == '__main__':
+    unittest.main()
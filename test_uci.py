@@ -0,0 +1,151 @@
+import unittest
+import io
+import time
+import tempfile
+import os
+import Board_and_moves as Chess
+import Search
+import polyglot
+import uci
+
+
+class TestUCI(unittest.TestCase):
+
+    def engine(self):
+        output = io.StringIO()
+        return uci.UCIEngine(io.StringIO(), output), output
+
+    def wait(self, engine):
+        engine.thread.join(10)
+        self.assertFalse(engine.thread.is_alive())
+
+    def test_allocate_time(self):
+        soft, hard = uci.allocate_time(60000, 1000)
+        self.assertLess(soft, hard)
+        self.assertLess(hard, 60 - uci.MOVE_OVERHEAD / 1000)
+        self.assertGreater(uci.allocate_time(60000, 1000)[0], uci.allocate_time(60000)[0])
+        self.assertGreater(uci.allocate_time(60000, moves_to_go=5)[0], uci.allocate_time(60000)[0])
+        self.assertEqual((0, 0), uci.allocate_time(50))
+
+        self.assertEqual("cp 31", uci.score_to_uci(31))
+        self.assertEqual("mate 2", uci.score_to_uci(Search.MATE - 3))
+        self.assertEqual("mate -1", uci.score_to_uci(-Search.MATE + 2))
+
+    def test_position(self):
+        engine, output = self.engine()
+        board = Chess.BoardRep.read_fen()
+        self.assertEqual(board.find_move('e2', 'e4'), board.move_from_uci('e2e4'))
+        self.assertIsNone(board.move_from_uci('e2e5'))
+        self.assertIsNone(board.move_from_uci('e7e5'))
+        self.assertIsNone(board.move_from_uci('z9e5'))
+
+        moves = "e2e4 d7d5 e4d5 g8f6 f1b5 c7c6 d5c6 d8d2 b1d2 f6e4 c6b7 e8d8 b7a8q"
+        engine.handle("position startpos moves " + moves)
+        for mv in moves.split():
+            self.assertTrue(board.do_move(board.find_move(mv[0:2], mv[2:4], mv[4:] or None)))
+        self.assertEqual(board.get_fen(), engine.board.get_fen())
+
+        # Moves already on the board are not played again, taken back moves are unmade
+        board = engine.board
+        self.assertEqual(13, len(board.move_sequence))
+        engine.handle("position startpos moves " + moves + " d8c7")
+        self.assertIs(board, engine.board)
+        self.assertEqual("d8c7", Chess.move_to_uci(board.move_sequence[-1]))
+        engine.handle("position startpos moves e2e4 d7d5 e4d5")
+        self.assertEqual(3, len(board.move_sequence))
+        expected = Chess.BoardRep.read_fen("rnbqkbnr/ppp1pppp/8/3P4/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2")
+        self.assertEqual(expected.zobrist_key, board.zobrist_key)
+
+        engine.handle("position fen 4k3/8/8/8/8/8/8/4K2R w K - 0 1 moves e1g1 e8e7")
+        self.assertEqual("8/4k3/8/8/8/8/8/5RK1 w - - 1 2", engine.board.get_fen())
+        engine.handle("position startpos moves e2e5")
+        self.assertIn("info string illegal move e2e5", output.getvalue())
+
+    def test_go(self):
+        engine, output = self.engine()
+        engine.handle("uci")
+        engine.handle("isready")
+        self.assertIn("uciok", output.getvalue())
+        self.assertIn("readyok", output.getvalue())
+
+        engine.handle("position fen 2k5/8/2K5/8/8/8/8/1R6 w - - 0 1")
+        engine.handle("go depth 4")
+        self.wait(engine)
+        self.assertIn("score mate 2", output.getvalue())
+        self.assertTrue(output.getvalue().splitlines()[-1].startswith("bestmove "))
+
+        engine.handle("position startpos moves e2e4")
+        engine.handle("go wtime 1000 btime 1000 winc 0 binc 0")
+        self.wait(engine)
+        self.assertTrue(output.getvalue().splitlines()[-1].startswith("bestmove "))
+
+    def test_stop_and_ponderhit(self):
+        engine, output = self.engine()
+        engine.handle("position startpos")
+        engine.handle("go infinite")
+        time.sleep(0.3)
+        self.assertNotIn("bestmove", output.getvalue())
+        start = time.time()
+        engine.handle("stop")
+        self.assertLess(time.time() - start, 0.2)
+        self.assertIn("bestmove", output.getvalue())
+
+        # A ponder search keeps going until ponderhit, then uses the time it is given from then on
+        engine.handle("position startpos moves e2e4")
+        engine.handle("go ponder wtime 3000 btime 3000")
+        time.sleep(0.3)
+        self.assertEqual(1, output.getvalue().count("bestmove"))
+        engine.handle("ponderhit")
+        self.wait(engine)
+        self.assertEqual(2, output.getvalue().count("bestmove"))
+
+        # Also when ponderhit comes before the search has started
+        search = engine.search.search
+        engine.search.search = lambda *args, **kwargs: time.sleep(0.2) or search(*args, **kwargs)
+        start = time.time()
+        engine.handle("go ponder wtime 3000 btime 3000")
+        engine.handle("ponderhit")
+        self.wait(engine)
+        del engine.search.search
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual(3, output.getvalue().count("bestmove"))
+
+        # Malformed limits are reported and ignored
+        engine.handle("go depth 1 wtime abc")
+        self.wait(engine)
+        self.assertIn("info string invalid value 'abc' for wtime", output.getvalue())
+        self.assertEqual(4, output.getvalue().count("bestmove"))
+
+        # Book moves are played without a search
+        directory = tempfile.TemporaryDirectory()
+        book = os.path.join(directory.name, 'book.bin')
+        with open(book, 'wb') as book_file:
+            book_file.write(polyglot.ENTRY.pack(0x463B96181691FC9C, polyglot.encode_book_move(
+                Chess.BoardRep.read_fen().move_from_uci('g1f3')), 1, 0))
+        engine.handle("setoption name Book value " + book)
+        engine.handle("position startpos")
+        engine.handle("go wtime 1000 btime 1000")
+        self.assertTrue(output.getvalue().endswith("bestmove g1f3\n"))
+        engine.handle("setoption name Book value <empty>")
+        directory.cleanup()
+
+        engine.handle("setoption name Hash value 1")
+        engine.handle("setoption name Move Overhead value 30")
+        self.assertEqual(30, engine.overhead)
+
+        # Malformed values are reported and ignored, values out of range are clamped
+        tt = engine.search.tt
+        engine.handle("setoption name Hash value abc")
+        engine.handle("setoption name Move Overhead value 1.5")
+        self.assertIs(tt, engine.search.tt)
+        self.assertEqual(30, engine.overhead)
+        self.assertIn("info string invalid value 'abc' for hash", output.getvalue())
+        engine.handle("setoption name Move Overhead value -20")
+        self.assertEqual(0, engine.overhead)
+        engine.handle("setoption name Move Overhead value 99999")
+        self.assertEqual(5000, engine.overhead)
+        self.assertFalse(engine.handle("quit"))
+
+
+if __name__ == '__main__':
+    unittest.main()
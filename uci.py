@@ -0,0 +1,283 @@
+from Board_and_moves import BoardRep, move_to_uci
+from Search import Search, MoveOrdering, TranspositionTable, MATE, MAX_PLY
+from polyglot import PolyglotBook
+from bitbase import Bitbases
+import threading
+import time
+import sys
+
+ENGINE_NAME = "Python chess engine"
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+MOVE_OVERHEAD = 100  # ms kept in reserve per move for the GUI, pipes and the slow reaction time of the interpreter
+MOVES_TO_GO = 30  # Moves the remaining time is divided over when the time control does not say
+
+
+def allocate_time(time_left, increment=0, moves_to_go=None, overhead=MOVE_OVERHEAD):
+    """ Time to spend on a move
+
+    Parameters:
+    time_left -- Remaining time on the clock in ms
+    increment -- Increment per move in ms
+    moves_to_go -- Moves until the next time control (None = sudden death)
+    overhead -- ms that are lost per move outside the search
+
+    Returns:
+    (soft, hard) -- Seconds after which no new iteration is started and after which the search is stopped
+    """
+    available = max(time_left - overhead, 0)
+    soft = available / (moves_to_go or MOVES_TO_GO) + 0.75 * increment
+    hard = min(4 * soft, 0.8 * available)
+    return min(soft, hard) / 1000, hard / 1000
+
+
+def score_to_uci(score):
+    # 'cp <centipawns>' or 'mate <moves>' (negative when the side to move gets mated)
+    if score >= MATE - MAX_PLY:
+        return "mate {}".format((MATE - score + 1) // 2)
+    if score <= -MATE + MAX_PLY:
+        return "mate {}".format(-((MATE + score) // 2))
+    return "cp {}".format(score)
+
+
+class UCIEngine:
+    HASH_RANGE = (0, 1024)  # MB
+    OVERHEAD_RANGE = (0, 5000)  # ms
+    OPTIONS = ["option name Hash type spin default 16 min {} max {}".format(*HASH_RANGE),
+               "option name Move Overhead type spin default {} min {} max {}".format(MOVE_OVERHEAD, *OVERHEAD_RANGE),
+               "option name Ponder type check default false",
+               "option name Book type string default <empty>",
+               "option name Bitbases type string default <empty>"]
+
+    def __init__(self, input=sys.stdin, output=sys.stdout):
+        """ Universal Chess Interface on top of Search
+
+        The search runs on a thread of its own, so commands (stop, ponderhit, isready) are read and handled while it
+        runs. stop interrupts the search at its next node.
+
+        Parameters:
+        input -- Text stream with the commands of the GUI
+        output -- Text stream for the replies of the engine
+        """
+        self.input = input
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.overhead = MOVE_OVERHEAD
+        self.fen = START_FEN
+        self.moves = []  # Moves (in UCI notation) played on the board from fen
+        self.board = BoardRep.read_fen(START_FEN)
+        self.search = Search(self.board)
+        self.thread = None
+        self.release = threading.Event()  # Set when an infinite or ponder search may report its best move
+        self.pondering = False
+        self.ponder_limits = (None, None)
+        self.book = None  # PolyglotBook, moves in the book are played without searching
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self):
+        # Handle commands until quit or the end of the input
+        for line in iter(self.input.readline, ''):
+            if not self.handle(line):
+                break
+        self.stop_search()
+
+    def handle(self, line):
+        # Handles a single command, returns False on quit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send("id name " + ENGINE_NAME)
+            for option in self.OPTIONS:
+                self.send(option)
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.stop_search()
+            if self.search.tt is not None:
+                self.search.tt.clear()
+            self.search.ordering = MoveOrdering()
+            self.set_position(START_FEN, [])
+        elif command == 'position':
+            self.position(args)
+        elif command == 'go':
+            self.go(args)
+        elif command == 'stop':
+            self.stop_search()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'quit':
+            return False
+        return True
+
+    def set_option(self, args):
+        # setoption name <name> [value <value>] (names may contain spaces)
+        text = " ".join(args)
+        name, _, value = text.partition(" value ")
+        name = name.replace("name", "", 1).strip().lower()
+        if name in ('hash', 'move overhead'):
+            # Spin values: the setting is kept when the value is not a number, and clamped to the advertised range
+            try:
+                number = int(value)
+            except ValueError:
+                self.send("info string invalid value {!r} for {}".format(value, name))
+                return
+            low, high = self.HASH_RANGE if name == 'hash' else self.OVERHEAD_RANGE
+            number = min(max(number, low), high)
+            if name == 'hash':
+                self.stop_search()
+                self.search.tt = TranspositionTable(number) if number else None
+            else:
+                self.overhead = number
+        elif name == 'book':
+            if self.book is not None:
+                self.book.close()
+            self.book = PolyglotBook(value) if value and value != '<empty>' else None
+        elif name == 'bitbases':
+            self.stop_search()
+            if self.search.bitbases is not None:
+                self.search.bitbases.close()
+            self.search.bitbases = Bitbases(value) if value and value != '<empty>' else None
+
+    def position(self, args):
+        # position startpos [moves <move> ...] or position fen <fen> [moves <move> ...]
+        if 'moves' in args:
+            moves = args[args.index('moves') + 1:]
+            args = args[:args.index('moves')]
+        else:
+            moves = []
+        if args[:1] == ['startpos']:
+            fen = START_FEN
+        elif args[:1] == ['fen']:
+            fen = " ".join(args[1:])
+        else:
+            return
+        self.set_position(fen, moves)
+
+    def set_position(self, fen, moves):
+        """ Set up fen with moves played on it
+
+        GUIs send the whole game with every move, so when the fen is the same only the moves after the part that is
+        already on the board are played (and the moves that were taken back are unmade).
+        """
+        self.stop_search()
+        if fen != self.fen:
+            self.board = BoardRep.read_fen(fen)
+            self.search.board = self.board
+            self.fen = fen
+            self.moves = []
+
+        common = 0
+        while common < min(len(moves), len(self.moves)) and moves[common] == self.moves[common]:
+            common += 1
+        while len(self.moves) > common:
+            self.board.unmake_move()
+            self.moves.pop()
+        for uci in moves[common:]:
+            mv = self.board.move_from_uci(uci)
+            if mv is None:
+                self.send("info string illegal move " + uci)
+                break
+            self.board.make_move(mv)
+            self.moves.append(uci)
+        self.board.pseudolegal_moves = self.board.generate_pseudolegal_moves()
+
+    def go(self, args):
+        self.stop_search()
+        limits = {}
+        for i, token in enumerate(args):
+            if token in ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'depth', 'nodes', 'movetime') and \
+                    i + 1 < len(args):
+                try:
+                    limits[token] = int(args[i + 1])
+                except ValueError:
+                    self.send("info string invalid value {!r} for {}".format(args[i + 1], token))
+        ponder = 'ponder' in args
+        infinite = 'infinite' in args or ponder
+
+        depth = limits.get('depth')
+        nodes = limits.get('nodes')
+        soft = hard = None
+        if 'movetime' in limits:
+            hard = max(limits['movetime'] - self.overhead, 0) / 1000
+        else:
+            side = 'wb'[self.board.side_to_move]
+            if side + 'time' in limits:
+                soft, hard = allocate_time(limits[side + 'time'], limits.get(side + 'inc', 0),
+                                           limits.get('movestogo'), self.overhead)
+        if infinite and depth is None:
+            depth = MAX_PLY
+        elif self.book is not None:
+            mv = self.book.choose(self.board)
+            if mv is not None:
+                self.send("info string book move")
+                self.send("bestmove " + move_to_uci(mv))
+                return
+
+        # A ponder search runs without time limits until ponderhit, which starts the clock
+        self.pondering = ponder
+        self.ponder_limits = (soft, hard)
+        if ponder:
+            soft = hard = None
+
+        self.search.pending_limits = None  # Of a ponderhit that came after the previous search had finished
+        self.release.clear()
+        self.thread = threading.Thread(target=self._search, args=(depth, nodes, hard, soft, infinite), daemon=True)
+        self.thread.start()
+
+    def _search(self, depth, nodes, seconds, soft_seconds, wait):
+        start = time.time()
+
+        def info(result):
+            ms = int(1000 * (time.time() - start))
+            hashfull = self.search.tt.hashfull() if self.search.tt is not None else 0
+            self.send("info depth {} score {} nodes {} nps {} time {} hashfull {} pv {}".format(
+                result.depth, score_to_uci(result.score), result.nodes, int(result.nps), ms, hashfull,
+                " ".join(move_to_uci(mv) for mv in result.pv)))
+
+        result = self.search.search(depth, nodes, seconds, info=info, soft_seconds=soft_seconds)
+        if wait:
+            # Infinite and ponder searches report only after stop or ponderhit, even when they finish earlier
+            self.release.wait()
+        if result.best_move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv) > 1:
+            self.send("bestmove {} ponder {}".format(move_to_uci(result.best_move), move_to_uci(result.pv[1])))
+        else:
+            self.send("bestmove " + move_to_uci(result.best_move))
+
+    def ponderhit(self):
+        # The opponent played the expected move: the ponder search continues as a normal search from now on
+        if not self.pondering:
+            return
+        self.pondering = False
+        soft, hard = self.ponder_limits
+        self.search.set_time_limits(hard, soft)
+        self.release.set()
+
+    def stop_search(self):
+        # Stops the running search (it sends its best move) and waits for it
+        thread = self.thread
+        if thread is None:
+            return
+        self.pondering = False
+        self.release.set()
+        while thread.is_alive():
+            self.search.stop()
+            thread.join(0.01)
+        self.thread = None
+
+
+def main():
+    UCIEngine().run()
+
+
+if __name__ == '__main__':
+    main()